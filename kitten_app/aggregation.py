@@ -0,0 +1,80 @@
+"""
+Deferred rating aggregation (RATING_AGGREGATION = 'deferred').
+
+Rating writes queue a PendingRatingDelta row instead of updating the
+kitten. ``apply_pending()`` claims a batch of queued rows, sums them per
+kitten and applies each kitten's total with one UPDATE. The rating stats
+(histograms and daily counts) follow in one upsert each. A hundred votes on
+the same kitten therefore cost one row update, and writers never wait on
+that row. Several workers can drain the queue together: claimed rows are
+locked and skipped by the others.
+"""
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+
+from .models import Kitten, PendingRatingDelta, apply_rating_stats
+
+logger = logging.getLogger(__name__)
+
+
+def apply_pending(batch_size=None):
+    """Apply up to ``batch_size`` queued deltas; return how many were consumed."""
+    batch_size = batch_size or settings.RATING_AGGREGATION_BATCH_SIZE
+    with transaction.atomic():
+        rows = list(PendingRatingDelta.objects.select_for_update(skip_locked=True).order_by('id')[:batch_size])
+        if not rows:
+            return 0
+
+        totals = defaultdict(lambda: [0, 0])
+        for row in rows:
+            totals[row.kitten_id][0] += row.score_delta
+            totals[row.kitten_id][1] += row.count_delta
+        deltas = {pk: tuple(total) for pk, total in totals.items() if total != [0, 0]}
+
+        # Lock the kittens in id order, so workers with overlapping batches cannot deadlock
+        list(Kitten.objects.filter(pk__in=deltas).select_for_update().order_by('pk').values_list('pk', flat=True))
+        Kitten.objects.apply_rating_deltas(deltas)
+        apply_rating_stats([change for change in map(PendingRatingDelta.change, rows) if change is not None])
+        PendingRatingDelta.objects.filter(id__in=[row.id for row in rows]).delete()
+    return len(rows)
+
+
+def settle(batch_size=None):
+    """Drain the whole queue on this thread; return how many deltas were applied (for tests and deploys)."""
+    applied = 0
+    while True:
+        consumed = apply_pending(batch_size)
+        if not consumed:
+            return applied
+        applied += consumed
+
+
+class AggregationWorker(threading.Thread):
+    """Drains the queue until ``stop`` is set, sleeping ``interval`` seconds whenever it is empty."""
+
+    def __init__(self, stop, batch_size=None, interval=None):
+        super().__init__(daemon=True)
+        self.stop = stop
+        self.batch_size = batch_size
+        self.interval = settings.RATING_AGGREGATION_INTERVAL if interval is None else interval
+        self.applied = 0
+
+    def run(self):
+        try:
+            while not self.stop.is_set():
+                close_old_connections()  # Honour CONN_MAX_AGE and drop broken connections between batches
+                try:
+                    consumed = apply_pending(self.batch_size)
+                except DatabaseError:
+                    # The batch rolled back and stays queued; retry after the pause
+                    logger.exception('Applying queued rating changes failed')
+                    consumed = 0
+                self.applied += consumed
+                if not consumed:
+                    self.stop.wait(self.interval)
+        finally:
+            connection.close()
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class KittenAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'kitten_app'
+
+    def ready(self):
+        from . import checks, db, signals  # noqa: F401  Register the system checks, connection counter and model signal handlers
@@ -0,0 +1,208 @@
+"""
+Async variants of the read endpoints.
+
+They answer exactly like their DRF counterparts in kitten_app.views, but reach
+the database through the async ORM, so a worker running the ASGI application
+keeps many requests in flight instead of blocking a thread per request.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, filters, permissions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView, exception_handler
+from django_filters.rest_framework import DjangoFilterBackend
+
+from .authentication import CachedJWTAuthentication
+from .cache import acached_facet, akitten_list_key, asingle_flight
+from .encoders import kitten_encoder, rating_encoder
+from .conditional import acached_payload, add_validators, akitten_validators, aratings_validators, not_modified, page_variant
+from .fieldsets import KITTEN_FIELDS, LIST_DEFAULT_EXCLUDE, kitten_fields, only_kitten_fields
+from .filters import KittenFilter
+from .models import Kitten, Rating
+from .pagination import KeysetPagination, RatingPagination
+from .permissions import IsOwnerOrReadOnly
+from .query_budget import QueryBudgetMixin
+from .routers import reads_pinned
+from .serializers import KittenSerializer
+from .views import breed_facet, color_facet, facet_response
+
+
+class AsyncAPIView(View):
+    """
+    The slice of APIView the read endpoints need: JWT authentication,
+    permission checks, throttles, filter backends and DRF's error responses.
+    The permission and throttle checks are APIView's own methods; query
+    budgets come from QueryBudgetMixin, as for the synchronous views.
+
+    Handlers are coroutines that return data rendered with DRF's JSONRenderer
+    (or a ready HttpResponse), so the body is byte-for-byte what the
+    synchronous view sends.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    filter_backends = []
+
+    get_permissions = APIView.get_permissions
+    check_permissions = APIView.check_permissions
+    check_object_permissions = APIView.check_object_permissions
+    permission_denied = APIView.permission_denied
+    get_throttles = APIView.get_throttles
+    check_throttles = APIView.check_throttles
+    throttled = APIView.throttled
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Token authenticated like the DRF views, so no CSRF check
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(request, authenticators=[auth() for auth in self.authentication_classes])
+        self.request = request
+        try:
+            await self.initial(request)
+            if request.method.lower() in self.http_method_names and hasattr(self, request.method.lower()):
+                handler = getattr(self, request.method.lower())
+            else:
+                raise exceptions.MethodNotAllowed(request.method)
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            return self.handle_exception(exc)
+        if isinstance(response, HttpResponse):
+            return response
+        return self.render(response)
+
+    def render(self, data):
+        return HttpResponse(JSONRenderer().render(data), content_type='application/json')
+
+    async def initial(self, request):
+        user, auth = None, None
+        for authenticator in request.authenticators:
+            result = await authenticator.aauthenticate(request)
+            if result is not None:
+                request._authenticator = authenticator
+                user, auth = result
+                break
+        if user is None:
+            request._not_authenticated()
+        else:
+            request.user, request.auth = user, auth
+
+        self.check_permissions(request)
+        if self.throttle_classes:
+            # The buckets are read with the synchronous cache API; keep it off the event loop
+            await sync_to_async(self.check_throttles)(request)
+
+    def filter_queryset(self, queryset):
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(self.request, queryset, self)
+        return queryset
+
+    def get_serializer_context(self):
+        return {'request': self.request, 'view': self}
+
+    def handle_exception(self, exc):
+        # Same status codes, headers and bodies as APIView.handle_exception()
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            if self.authentication_classes:
+                exc.auth_header = self.authentication_classes[0]().authenticate_header(self.request)
+            else:
+                exc.status_code = 403
+        response = exception_handler(exc, {'view': self, 'request': self.request})
+        if response is None:
+            raise exc
+        http_response = HttpResponse(JSONRenderer().render(response.data), status=response.status_code,
+                                     content_type='application/json')
+        for header in ('WWW-Authenticate', 'Retry-After'):
+            if header in response:
+                http_response[header] = response[header]
+        return http_response
+
+
+class AsyncKittenListView(QueryBudgetMixin, AsyncAPIView):
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    ordering_fields = ['inserted_time']
+    filterset_class = KittenFilter
+    permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
+    query_budget = 3  # Cold auth caches add the user and revoked-token lookups
+
+    async def get(self, request):
+        encoder = kitten_encoder.only(kitten_fields(request, default_exclude=LIST_DEFAULT_EXCLUDE))
+        if reads_pinned():
+            # The caller just wrote, and a shared page may have been built from a lagging replica
+            return await self.page_data(encoder)
+        # Cached and coalesced like KittenListCreateView.list(); the cursor links make it a page of its own
+        return await asingle_flight(await akitten_list_key(request), lambda: self.page_data(encoder), settings.KITTEN_LIST_CACHE_TIMEOUT)
+
+    async def page_data(self, encoder):
+        queryset = self.filter_queryset(Kitten.objects.select_related('owner').order_by('-inserted_time'))
+        paginator = KeysetPagination()
+        page = await paginator.apaginate_queryset(encoder.rows(queryset, keys=('inserted_time', 'id')), self.request, self)
+        return paginator.get_paginated_response(encoder.encode(page)).data
+
+
+class AsyncKittenDetailView(QueryBudgetMixin, AsyncAPIView):
+    permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
+    query_budget = 4  # The validator and, on a payload cache miss, the kitten; cold auth caches add two
+
+    async def get(self, request, pk):
+        validators = await akitten_validators(pk)
+        if validators is None:
+            raise Http404('No Kitten matches the given query.')
+        fields = kitten_fields(request)
+        response = not_modified(request, validators)
+        if response is None:
+            variant = '' if fields == KITTEN_FIELDS else ':' + ','.join(fields)
+            response = self.render(await acached_payload(validators, lambda: self.kitten_data(pk, fields), variant))
+        return add_validators(response, validators)
+
+    async def kitten_data(self, pk, fields):
+        try:
+            kitten = await only_kitten_fields(Kitten.objects.select_related('owner'), fields).aget(pk=pk)
+        except Kitten.DoesNotExist:
+            raise Http404('No Kitten matches the given query.')
+        self.check_object_permissions(self.request, kitten)
+        return KittenSerializer(kitten, context=self.get_serializer_context(), fields=fields).data
+
+
+class AsyncRatingView(QueryBudgetMixin, AsyncAPIView):
+    filter_backends = [filters.OrderingFilter]  # Only read by the paginator
+    ordering_fields = ['created_at']
+    query_budget = 4  # The validator and, on a payload cache miss, the page; cold auth caches add two
+
+    async def get(self, request, kitten_id):
+        """Get a page of the ratings for a specific kitten."""
+        validators = await aratings_validators(kitten_id)
+        if validators is None:
+            raise Http404('No Kitten matches the given query.')
+        response = not_modified(request, validators)
+        if response is None:
+            response = self.render(await acached_payload(validators, lambda: self.ratings_page(kitten_id), page_variant(request)))
+        return add_validators(response, validators)
+
+    async def ratings_page(self, kitten_id):
+        ratings = rating_encoder.rows(Rating.objects.filter(kitten_id=kitten_id), keys=('created_at', 'id'))
+        paginator = RatingPagination()
+        page = await paginator.apaginate_queryset(ratings, self.request, self)
+        return paginator.get_paginated_response(rating_encoder.encode(page)).data
+
+
+class AsyncDistinctColorsView(QueryBudgetMixin, AsyncAPIView):
+    authentication_classes = []
+    query_budget = 2
+
+    async def get(self, request):
+        return facet_response(request, *await acached_facet('colors', color_facet))
+
+
+class AsyncDistinctBreedsView(QueryBudgetMixin, AsyncAPIView):
+    authentication_classes = []
+    query_budget = 2
+
+    async def get(self, request):
+        return facet_response(request, *await acached_facet('breeds', breed_facet))
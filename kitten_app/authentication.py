@@ -0,0 +1,230 @@
+import copy
+import datetime
+import heapq
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .instrumentation import timed
+from .routers import auser_pinned, pin_reads, user_pinned
+
+
+class UserCache:
+    """Per-process cache of authenticated users, each entry kept for AUTH_USER_CACHE_TTL seconds."""
+
+    def __init__(self):
+        self._users = {}
+
+    def get(self, user_id):
+        entry = self._users.get(user_id)
+        if entry is None or entry[1] < time.monotonic():
+            return None
+        return entry[0]
+
+    def set(self, user_id, user):
+        if len(self._users) >= settings.AUTH_USER_CACHE_SIZE:
+            self._users.clear()
+        self._users[user_id] = (user, time.monotonic() + settings.AUTH_USER_CACHE_TTL)
+
+    def discard(self, user_id):
+        self._users.pop(user_id, None)
+
+    def clear(self):
+        self._users.clear()
+
+
+class RevokedTokens:
+    """
+    Per-process set of blacklisted JTIs mirrored from the token_blacklist tables.
+
+    Revoking a token bumps a version key in the shared cache. Other processes
+    compare that version at most every AUTH_REVOCATION_CHECK_INTERVAL seconds
+    and, when it moved, read the rows blacklisted since their last sync, so a
+    lookup costs a dict membership test and no query. Token rotation bumps
+    the version on every refresh, so a sync must not re-read the whole
+    blacklist. It goes back AUTH_REVOCATION_SYNC_OVERLAP seconds before the
+    last one instead of fetching rows past the last seen id: rows from
+    concurrent logouts commit out of order, a while after their
+    blacklisted_at, and the hosts' clocks differ. Entries are kept with their
+    token's expiry and dropped once it passes, when the signature check
+    rejects the token anyway.
+    """
+    VERSION_KEY = 'jwt-revoked:version'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self._jtis = {}  # jti -> expiry, as a timestamp
+        self._expiries = []  # Heap of (expiry, jti), to drop entries as they expire
+        self._version = None
+        self._synced_at = None
+        self._checked_at = float('-inf')
+
+    def __contains__(self, jti):
+        self._sync()
+        return jti in self._jtis
+
+    async def acontains(self, jti):
+        """``jti in revoked_tokens`` for async code; only a due sync leaves the event loop."""
+        if self._sync_due():
+            await sync_to_async(self._sync)()
+        return jti in self._jtis
+
+    def add(self, jti, expires_at):
+        self._remember(jti, expires_at.timestamp())
+        try:
+            cache.incr(self.VERSION_KEY)
+        except ValueError:
+            cache.add(self.VERSION_KEY, time.time_ns(), timeout=None)
+
+    def _sync_due(self):
+        return time.monotonic() - self._checked_at >= settings.AUTH_REVOCATION_CHECK_INTERVAL
+
+    def _sync(self):
+        if not self._sync_due():
+            return
+        with self._lock:
+            self._checked_at = time.monotonic()
+            version = cache.get(self.VERSION_KEY)
+            if version is None:
+                cache.add(self.VERSION_KEY, time.time_ns(), timeout=None)
+                version = cache.get(self.VERSION_KEY)
+            if version == self._version:
+                return
+
+            now = timezone.now()
+            self._expire(now.timestamp())
+            rows = BlacklistedToken.objects.filter(token__expires_at__gt=now)
+            if self._synced_at is not None:
+                # See blacklisted_at_idx
+                overlap = datetime.timedelta(seconds=settings.AUTH_REVOCATION_SYNC_OVERLAP)
+                rows = rows.filter(blacklisted_at__gte=self._synced_at - overlap)
+            for jti, expires_at in rows.values_list('token__jti', 'token__expires_at'):
+                self._remember(jti, expires_at.timestamp())
+            self._synced_at = now
+            self._version = version
+
+    def _remember(self, jti, expiry):
+        if jti not in self._jtis:
+            self._jtis[jti] = expiry
+            heapq.heappush(self._expiries, (expiry, jti))
+
+    def _expire(self, now):
+        while self._expiries and self._expiries[0][0] <= now:
+            _, jti = heapq.heappop(self._expiries)
+            self._jtis.pop(jti, None)
+
+
+user_cache = UserCache()
+revoked_tokens = RevokedTokens()
+
+
+def revoke_token(token):
+    """Blacklist any token (access or refresh), the way BlacklistMixin.blacklist() does for refresh tokens."""
+    jti = token[api_settings.JTI_CLAIM]
+    outstanding, _ = OutstandingToken.objects.get_or_create(
+        jti=jti,
+        defaults={'token': str(token), 'expires_at': datetime_from_epoch(token['exp'])},
+    )
+    BlacklistedToken.objects.get_or_create(token=outstanding)
+    revoked_tokens.add(jti, outstanding.expires_at)
+
+
+class CachedRefreshToken(RefreshToken):
+    """RefreshToken whose blacklist check reads the in-process JTI set."""
+
+    def check_blacklist(self):
+        if self.payload[api_settings.JTI_CLAIM] in revoked_tokens:
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        result = super().blacklist()
+        revoked_tokens.add(self.payload[api_settings.JTI_CLAIM], datetime_from_epoch(self.payload['exp']))
+        return result
+
+
+class CachedTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = CachedRefreshToken
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication without per-request queries for a warm token.
+
+    Users come from ``user_cache`` (invalidated by the User signals in
+    kitten_app.signals) and revoked tokens are rejected through ``revoked_tokens``.
+    """
+
+    def authenticate(self, request):
+        with timed('auth'):
+            return super().authenticate(request)
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if validated_token.get(api_settings.JTI_CLAIM) in revoked_tokens:
+            raise InvalidToken(_('Token is blacklisted'))
+        return validated_token
+
+    async def aauthenticate(self, request):
+        """``authenticate()`` for async views: same checks, users are loaded through the async ORM."""
+        with timed('auth'):
+            return await self._aauthenticate(request)
+
+    async def _aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        # Signature and expiry checks are pure CPU; only the revocation sync may need the database
+        validated_token = super().get_validated_token(raw_token)
+        if await revoked_tokens.acontains(validated_token.get(api_settings.JTI_CLAIM)):
+            raise InvalidToken(_('Token is blacklisted'))
+        return await self.aget_user(validated_token), validated_token
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if settings.DATABASE_REPLICAS and user_pinned(user_id):
+            pin_reads()  # This user wrote moments ago; read their data from the primary
+        user = user_cache.get(user_id)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+        # Each request gets its own instance so nothing leaks between requests
+        return copy.copy(user)
+
+    async def aget_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        if settings.DATABASE_REPLICAS and await auser_pinned(user_id):
+            pin_reads()
+
+        user = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            if not user.is_active:
+                raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+            user_cache.set(user_id, user)
+        return copy.copy(user)
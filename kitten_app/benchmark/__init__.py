@@ -0,0 +1,8 @@
+"""
+In-process load testing for the exhibition API.
+
+``datagen`` fills the database with a realistic data set, ``runner`` drives
+the endpoints through Django's test client from several threads and
+collects latency, throughput and query counts. ``manage.py benchmark`` ties
+them together.
+"""
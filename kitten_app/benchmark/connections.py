@@ -0,0 +1,70 @@
+"""
+What getting a usable connection costs under each DB_CONN_MODE.
+
+Every round runs ``SELECT 1`` on a connection obtained the way a request
+would get it: a fresh PostgreSQL session (``none``), the session the thread
+already holds (``persistent``) or a checkout from a psycopg pool (``pool``).
+"""
+import time
+
+from django.db import connections
+
+from .runner import percentile
+
+
+def _summary(timings):
+    timings = sorted(timings)
+    return {
+        'rounds': len(timings),
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+    }
+
+
+def _timed(rounds, run):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return _summary(timings)
+
+
+def _select_one(conn):
+    cursor = conn.cursor()
+    cursor.execute('SELECT 1')
+    cursor.fetchone()
+    cursor.close()
+
+
+def handshake_cost(alias='default', rounds=50):
+    wrapper = connections[alias]
+    params = wrapper.get_connection_params()  # Drops the pool options; the driver connects directly
+    database = wrapper.Database
+
+    def connect_each_time():
+        conn = database.connect(**params)
+        _select_one(conn)
+        conn.close()
+
+    report = {'none': _timed(rounds, connect_each_time)}
+
+    conn = database.connect(**params)
+    try:
+        report['persistent'] = _timed(rounds, lambda: _select_one(conn))
+    finally:
+        conn.close()
+
+    try:
+        from psycopg_pool import ConnectionPool
+    except ImportError:
+        return report  # psycopg2 or no psycopg_pool: nothing to pool with
+    with ConnectionPool(kwargs={**params, 'autocommit': True}, min_size=1, max_size=1, open=True) as pool:
+        pool.wait()
+
+        def checkout():
+            with pool.connection() as pooled:
+                _select_one(pooled)
+
+        report['pool'] = _timed(rounds, checkout)
+    return report
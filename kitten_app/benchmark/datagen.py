@@ -0,0 +1,88 @@
+import bisect
+import itertools
+import random
+from collections import namedtuple
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from kitten_app.cache import invalidate_facets, invalidate_kitten_lists
+from kitten_app.models import Kitten, KittenFacetCount, KittenRatingHistogram, Rating, kitten_facet_deltas
+
+BENCH_PASSWORD = 'bench-password'
+
+BREEDS = ['Maine Coon', 'Persian', 'Siamese', 'Bengal', 'Ragdoll', 'Sphynx', 'British Shorthair',
+          'Abyssinian', 'Scottish Fold', 'Birman', 'Norwegian Forest', 'Russian Blue']
+COLORS = ['White', 'Black', 'Grey', 'Cream', 'Ginger', 'Tabby', 'Calico', 'Blue', 'Seal', 'Tortoiseshell']
+WORDS = ['fluffy', 'playful', 'calm', 'curious', 'grey', 'striped', 'sleepy', 'tiny', 'brave', 'gentle',
+         'loud', 'shy', 'long', 'haired', 'spotted', 'elegant', 'cuddly', 'quick', 'clever', 'sweet']
+
+Dataset = namedtuple('Dataset', ['owners', 'voters', 'kittens', 'prefix'])
+
+
+class ZipfSampler:
+    """Draws indexes in ``range(n)`` with P(i) proportional to 1 / (i + 1) ** s."""
+
+    def __init__(self, n, s, rng):
+        self.rng = rng
+        self.cumulative = list(itertools.accumulate(1 / (i + 1) ** s for i in range(n)))
+
+    def __call__(self):
+        return bisect.bisect_left(self.cumulative, self.rng.random() * self.cumulative[-1])
+
+
+def generate(users=50, kittens=1000, ratings=10000, voters=20, skew=1.1, seed=0, prefix='bench', batch_size=1000):
+    """
+    Create ``users`` kitten owners, ``kittens`` kittens and ``ratings`` ratings.
+
+    Breeds, colors and the kittens that get rated follow a Zipf-like skew, so a
+    few kittens collect most votes as in a real show. ``voters`` extra users own
+    nothing and have rated nothing; the benchmark uses them for rating writes.
+    All users share the password ``BENCH_PASSWORD``.
+    """
+    rng = random.Random(seed)
+    password = make_password(BENCH_PASSWORD)  # Hash once, the users share it
+
+    with transaction.atomic():
+        owners = User.objects.bulk_create(
+            [User(username=f'{prefix}-owner-{i}', password=password) for i in range(users)], batch_size=batch_size)
+        voter_users = User.objects.bulk_create(
+            [User(username=f'{prefix}-voter-{i}', password=password) for i in range(voters)], batch_size=batch_size)
+
+        breed = ZipfSampler(len(BREEDS), skew, rng)
+        color = ZipfSampler(len(COLORS), skew, rng)
+        created_kittens = Kitten.objects.bulk_create([
+            Kitten(
+                owner=rng.choice(owners),
+                name=f'{prefix} kitten {i}',
+                breed=BREEDS[breed()],
+                color=COLORS[color()],
+                age_months=rng.randint(1, 36),
+                description=' '.join(rng.sample(WORDS, 6)),
+            )
+            for i in range(kittens)
+        ], batch_size=batch_size)
+
+        popular = ZipfSampler(len(created_kittens), skew, rng)
+        seen, pending = set(), []
+        # Each (user, kitten) pair may rate once; stop early if the skew exhausts the pairs
+        for _ in range(ratings * 10):
+            if len(seen) >= ratings:
+                break
+            kitten = created_kittens[popular()]
+            user = rng.choice(owners)
+            if user.pk == kitten.owner_id or (user.pk, kitten.pk) in seen:
+                continue
+            seen.add((user.pk, kitten.pk))
+            pending.append(Rating(user=user, kitten=kitten, score=min(5, max(1, round(rng.gauss(3.6, 1))))))
+        Rating.objects.bulk_create(pending, batch_size=batch_size)
+
+        # bulk_create bypasses Rating.save() and the Kitten signals
+        KittenFacetCount.objects.apply_deltas(kitten_facet_deltas(created_kittens))
+        Kitten.objects.filter(name__startswith=f'{prefix} kitten ').recompute_rating_aggregates()
+        KittenRatingHistogram.objects.rebuild()
+    invalidate_facets()
+    invalidate_kitten_lists()
+
+    return Dataset(owners=owners, voters=voter_users, kittens=created_kittens, prefix=prefix)
@@ -0,0 +1,54 @@
+"""
+Bulk import throughput: ``import_kittens()`` over generated JSON Lines.
+
+The rows go through the same path as an upload (parse_rows, validation and
+the batched writes) and are rolled back afterwards, so the dataset the
+scenarios use is left as it was. The input is built in memory first and is
+not part of the timing.
+"""
+import json
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from kitten_app.bulk import import_kittens, parse_rows
+
+from .datagen import BREEDS, COLORS
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _lines(rows, seed):
+    rng = random.Random(seed)
+    return [
+        json.dumps({
+            'name': f'Imported kitten {i}',
+            'breed': rng.choice(BREEDS),
+            'color': rng.choice(COLORS),
+            'age_months': rng.randint(1, 60),
+            'description': f'Imported row {i}, a {rng.choice(["calm", "playful", "curious"])} kitten.',
+        }).encode('utf-8') + b'\n'
+        for i in range(rows)
+    ]
+
+
+def import_throughput(rows=20000, rounds=3, seed=0):
+    lines = _lines(rows, seed)
+    best = float('inf')
+    for _ in range(rounds):
+        try:
+            with transaction.atomic():
+                owner = User.objects.create_user(username='benchmark-importer')
+                started = time.perf_counter()
+                created, errors = import_kittens(parse_rows(lines, 'jsonl'), owner)
+                best = min(best, time.perf_counter() - started)
+                if created != rows or errors:
+                    raise AssertionError(f'Imported {created} of {rows} rows, {len(errors)} rejected.')
+                raise _Rollback
+        except _Rollback:
+            pass
+    return {'rows': rows, 'seconds': round(best, 3), 'rows_per_second': round(rows / best)}
@@ -0,0 +1,222 @@
+import asyncio
+import math
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from kitten_app.query_budget import QueryCounter
+
+from .datagen import BENCH_PASSWORD
+
+# ``request(client, i)`` issues the i-th request of the scenario and returns the response.
+# ``user(dataset, i)`` picks who sends it (None for anonymous).
+# ``asgi`` scenarios get an AsyncClient and ``request`` returns a coroutine.
+Scenario = namedtuple('Scenario', ['name', 'request', 'user', 'expected_status', 'asgi'], defaults=[False])
+
+# Suffix of the ASGI twin of a scenario, see asgi_speedup()
+ASGI_SUFFIX = '-asgi'
+
+# Lower bound on how far a run may drift from its baseline before it counts as a regression
+MIN_QUERY_SLACK = 0.5
+
+# A scenario repeats a few requests, so the list page and payload caches would answer nearly all of them,
+# and only for whichever path fills them. Runs keep them off; both paths share the facet cache.
+UNCACHED = {'KITTEN_LIST_CACHE_TIMEOUT': 0, 'PAYLOAD_CACHE_TIMEOUT': 0}
+
+
+def default_scenarios(dataset):
+    kittens, voters, owners = dataset.kittens, dataset.voters, dataset.owners
+    hot = kittens[0]  # The Zipf head: most ratings land here
+
+    def owner(ds, i):
+        return owners[i % len(owners)]
+
+    def voter(ds, i):
+        return voters[i % len(voters)]
+
+    def vote_target(i):
+        # Each voter rates a different kitten per round, so POSTs never collide
+        return kittens[(i // len(voters)) % len(kittens)]
+
+    return [
+        Scenario('login', lambda c, i: c.post(reverse('token_obtain_pair'), {
+            'username': owners[i % len(owners)].username, 'password': BENCH_PASSWORD}, format='json'), None, 200),
+        Scenario('kitten-list', lambda c, i: c.get(reverse('kitten-list')), owner, 200),
+        Scenario('kitten-list-filtered', lambda c, i: c.get(reverse('kitten-list'), {
+            'breed': kittens[i % len(kittens)].breed.lower(), 'min_age': 3, 'max_age': 24}), owner, 200),
+        Scenario('kitten-detail', lambda c, i: c.get(reverse('kitten-detail', args=[kittens[i % len(kittens)].pk])), owner, 200),
+        Scenario('kitten-colors', lambda c, i: c.get(reverse('kitten-colors')), None, 200),
+        Scenario('kitten-breeds', lambda c, i: c.get(reverse('kitten-breeds')), None, 200),
+        Scenario('rating-list', lambda c, i: c.get(reverse('rating-view', kwargs={'kitten_id': hot.pk})), owner, 200),
+        Scenario('rating-create', lambda c, i: c.post(reverse('rating-view', kwargs={'kitten_id': vote_target(i).pk}),
+                                                      {'score': i % 5 + 1}, format='json'), voter, 201),
+        Scenario('rating-update', lambda c, i: c.put(reverse('rating-view', kwargs={'kitten_id': vote_target(i).pk}),
+                                                     {'score': (i + 2) % 5 + 1}, format='json'), voter, 200),
+
+        # The same reads through the async views, to compare with the WSGI path above
+        Scenario('kitten-list' + ASGI_SUFFIX, lambda c, i: c.get(reverse('async-kitten-list')), owner, 200, True),
+        Scenario('kitten-list-filtered' + ASGI_SUFFIX, lambda c, i: c.get(reverse('async-kitten-list'), {
+            'breed': kittens[i % len(kittens)].breed.lower(), 'min_age': 3, 'max_age': 24}), owner, 200, True),
+        Scenario('kitten-detail' + ASGI_SUFFIX, lambda c, i: c.get(
+            reverse('async-kitten-detail', args=[kittens[i % len(kittens)].pk])), owner, 200, True),
+        Scenario('kitten-colors' + ASGI_SUFFIX, lambda c, i: c.get(reverse('async-kitten-colors')), None, 200, True),
+        Scenario('kitten-breeds' + ASGI_SUFFIX, lambda c, i: c.get(reverse('async-kitten-breeds')), None, 200, True),
+        Scenario('rating-list' + ASGI_SUFFIX, lambda c, i: c.get(
+            reverse('async-rating-view', kwargs={'kitten_id': hot.pk})), owner, 200, True),
+    ]
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, wall_time):
+    latencies = sorted(latency for latency, _, _ in samples)
+    count = len(samples)
+    return {
+        'requests': count,
+        'errors': sum(1 for _, _, ok in samples if not ok),
+        'requests_per_second': round(count / wall_time, 1) if wall_time else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'queries_per_request': round(sum(queries for _, queries, _ in samples) / count, 2) if count else 0.0,
+    }
+
+
+def _client_for(user):
+    client = APIClient()
+    if user is not None:
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+    return client
+
+
+class _AsyncClient(AsyncClient):
+    """AsyncClient sending ``auth_headers`` with every request (``AsyncClient(headers=...)`` never reaches the ASGI scope)."""
+
+    def __init__(self, auth_headers):
+        super().__init__()
+        self.auth_headers = auth_headers
+
+    def generic(self, *args, headers=None, **kwargs):
+        return super().generic(*args, headers={**self.auth_headers, **(headers or {})}, **kwargs)
+
+
+def _async_client_for(user):
+    if user is None:
+        return _AsyncClient({})
+    return _AsyncClient({'Authorization': f'Bearer {AccessToken.for_user(user)}'})
+
+
+def run_scenario(scenario, dataset, requests, concurrency):
+    """Send ``requests`` requests from ``concurrency`` threads; return the summary dict."""
+    if scenario.asgi:
+        return run_async_scenario(scenario, dataset, requests, concurrency)
+
+    def worker(indexes):
+        samples, clients = [], {}
+        try:
+            for i in indexes:
+                user = scenario.user(dataset, i) if scenario.user else None
+                client = clients.get(user) or clients.setdefault(user, _client_for(user))
+                counter = QueryCounter()
+                started = time.perf_counter()
+                with connection.execute_wrapper(counter):
+                    response = scenario.request(client, i)
+                samples.append((time.perf_counter() - started, counter.count,
+                                response.status_code == scenario.expected_status))
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
+        return samples
+
+    slices = [range(w, requests, concurrency) for w in range(concurrency)]
+    started = time.perf_counter()
+    if concurrency == 1:
+        # Stay on this thread (and its connection), e.g. inside a test transaction
+        samples = worker(slices[0])
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = [sample for chunk in pool.map(worker, slices) for sample in chunk]
+    return summarize(samples, time.perf_counter() - started)
+
+
+def run_async_scenario(scenario, dataset, requests, concurrency):
+    """
+    Keep ``concurrency`` requests in flight on one event loop, like a single ASGI worker.
+
+    Requests interleave, so queries can only be counted for the whole run and
+    are spread evenly over its requests.
+    """
+    async def worker(indexes):
+        samples, clients = [], {}
+        for i in indexes:
+            user = scenario.user(dataset, i) if scenario.user else None
+            client = clients.get(user) or clients.setdefault(user, _async_client_for(user))
+            started = time.perf_counter()
+            response = await scenario.request(client, i)
+            samples.append((time.perf_counter() - started, response.status_code == scenario.expected_status))
+        return samples
+
+    async def main():
+        chunks = await asyncio.gather(*(worker(range(w, requests, concurrency)) for w in range(concurrency)))
+        return [sample for chunk in chunks for sample in chunk]
+
+    counter = QueryCounter()
+    started = time.perf_counter()
+    # The async ORM runs thread-sensitive code on this thread, so its connection sees every query
+    with connection.execute_wrapper(counter):
+        samples = async_to_sync(main)()
+    wall_time = time.perf_counter() - started
+    queries = counter.count / len(samples) if samples else 0
+    return summarize([(latency, queries, ok) for latency, ok in samples], wall_time)
+
+
+def asgi_speedup(report):
+    """Requests/s of each ASGI scenario relative to its WSGI twin in the same report."""
+    speedup = {}
+    for name, result in report.items():
+        wsgi = report.get(name[:-len(ASGI_SUFFIX)]) if name.endswith(ASGI_SUFFIX) else None
+        if wsgi and wsgi['requests_per_second']:
+            speedup[name[:-len(ASGI_SUFFIX)]] = round(result['requests_per_second'] / wsgi['requests_per_second'], 2)
+    return speedup
+
+
+def run(dataset, requests=200, concurrency=8, scenarios=None, only=None):
+    report = {}
+    with override_settings(**UNCACHED):
+        for scenario in scenarios or default_scenarios(dataset):
+            if only and scenario.name not in only:
+                continue
+            report[scenario.name] = run_scenario(scenario, dataset, requests, concurrency)
+    return report
+
+
+def compare(report, baseline, tolerance):
+    """List the regressions of ``report`` against ``baseline`` (both ``run()`` results)."""
+    regressions = []
+    for name, current in report.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95_ms']}ms vs baseline {previous['p95_ms']}ms")
+        if current['requests_per_second'] < previous['requests_per_second'] * (1 - tolerance):
+            regressions.append(f"{name}: {current['requests_per_second']} req/s vs baseline {previous['requests_per_second']} req/s")
+        if current['queries_per_request'] > previous['queries_per_request'] + MIN_QUERY_SLACK:
+            regressions.append(f"{name}: {current['queries_per_request']} queries/request vs baseline {previous['queries_per_request']}")
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{name}: {current['errors']} errors vs baseline {previous['errors']}")
+    return regressions
@@ -0,0 +1,48 @@
+"""
+Kitten list serialization: KittenSerializer on model instances against
+kitten_encoder on values_list() rows.
+
+Both sides read the same kittens (every generated kitten, with the owner
+joined as the list view does) and render them with DRF's JSONRenderer; the
+timings include the query. The two bodies are compared first, so a faster
+encoder that renders something else fails the run instead of reporting.
+"""
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+from kitten_app.encoders import kitten_encoder
+from kitten_app.models import Kitten
+from kitten_app.serializers import KittenSerializer
+
+
+def _best(render, rounds):
+    best = float('inf')
+    for _ in range(rounds):
+        started = time.perf_counter()
+        render()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def encode_throughput(rounds=5):
+    queryset = Kitten.objects.select_related('owner').order_by('-inserted_time', '-id')
+    renderer = JSONRenderer()
+
+    def serialized():
+        return renderer.render(KittenSerializer(list(queryset), many=True).data)
+
+    def encoded():
+        return renderer.render(kitten_encoder.encode(list(kitten_encoder.rows(queryset))))
+
+    if serialized() != encoded():
+        raise AssertionError('kitten_encoder renders differently from KittenSerializer.')
+    rows = queryset.count()
+    serializer_seconds = _best(serialized, rounds)
+    encoder_seconds = _best(encoded, rounds)
+    return {
+        'rows': rows,
+        'serializer_rows_per_second': round(rows / serializer_seconds),
+        'encoder_rows_per_second': round(rows / encoder_seconds),
+        'speedup': round(serializer_seconds / encoder_seconds, 2),
+    }
@@ -0,0 +1,214 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+FACETS_VERSION_KEY = 'kitten-facets:version'
+KITTEN_LIST_VERSION_KEY = 'kitten-list:version'
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock so a version lost to eviction never reuses an old key
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def _invalidate(key):
+    _bump_version(key)
+    # A reader between this bump and COMMIT could cache the old rows under the new
+    # version, so bump once more when the change becomes visible.
+    transaction.on_commit(lambda: _bump_version(key))
+
+
+def facets_version():
+    """Current version of the cached facet lists (breeds, colors)."""
+    return _version(FACETS_VERSION_KEY)
+
+
+def invalidate_facets():
+    """Orphan every cached facet list by bumping the version."""
+    _invalidate(FACETS_VERSION_KEY)
+
+
+def invalidate_kitten_lists():
+    """Orphan every cached kitten list page (kittens or their rating aggregates changed)."""
+    _invalidate(KITTEN_LIST_VERSION_KEY)
+
+
+def kitten_list_key(request):
+    """Cache key of the list page ``request`` asks for; the page is the same for every user."""
+    return f'kitten-list:{_version(KITTEN_LIST_VERSION_KEY)}:{_url_hash(request)}'
+
+
+async def akitten_list_key(request):
+    return f'kitten-list:{await _aversion(KITTEN_LIST_VERSION_KEY)}:{_url_hash(request)}'
+
+
+def _url_hash(request):
+    return hashlib.md5(request.build_absolute_uri().encode('utf-8')).hexdigest()
+
+
+def cached_facet(name, build):
+    """
+    Return ``(body, etag)`` for the facet list ``name``.
+
+    ``build`` is only called on a miss; its result is stored as rendered JSON,
+    so a hit touches neither the database nor a serializer.
+    """
+    key = f'kitten-facets:{name}:{facets_version()}'
+    entry = cache.get(key)
+    if entry is None:
+        entry = _facet_entry(list(build()))
+        cache.set(key, entry, settings.FACET_CACHE_TIMEOUT)
+    return entry
+
+
+async def _aversion(key):
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+async def afacets_version():
+    return await _aversion(FACETS_VERSION_KEY)
+
+
+async def acached_facet(name, build):
+    """``cached_facet()`` for async views; ``build`` returns a queryset read with ``async for``."""
+    key = f'kitten-facets:{name}:{await afacets_version()}'
+    entry = await cache.aget(key)
+    if entry is None:
+        entry = _facet_entry([value async for value in build()])
+        await cache.aset(key, entry, settings.FACET_CACHE_TIMEOUT)
+    return entry
+
+
+def _facet_entry(values):
+    body = json.dumps(values, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return body, '"%s"' % hashlib.md5(body).hexdigest()
+
+
+class _Flight:
+    __slots__ = ('done', 'value')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def single_flight(key, build, timeout):
+    """
+    The cached value of ``key``, or ``build()``'s result cached for ``timeout`` seconds.
+
+    Concurrent misses on the same key are coalesced, so one cold hot key
+    costs one ``build()``, not one per request. Threads of this process wait
+    for the first one. Across processes, the first to ``cache.add()`` a lock
+    builds, and the others poll the cache for its result. A waiter that gets
+    nothing within SINGLE_FLIGHT_WAIT seconds (the builder failed or is
+    slow) builds for itself. ``build()`` must not return None.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        if flight.done.wait(settings.SINGLE_FLIGHT_WAIT) and flight.value is not None:
+            return flight.value
+        return build()
+    try:
+        flight.value = _build_once(key, build, timeout)
+        return flight.value
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
+
+def _build_once(key, build, timeout):
+    lock = f'{key}:building'
+    if not cache.add(lock, 1, settings.SINGLE_FLIGHT_WAIT):
+        deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.01)
+            value = cache.get(key)
+            if value is not None:
+                return value
+        return build()
+    try:
+        value = build()
+        cache.set(key, value, timeout)
+        return value
+    finally:
+        cache.delete(lock)
+
+
+_aflights = {}
+
+
+async def asingle_flight(key, build, timeout):
+    """
+    ``single_flight()`` for async views; ``build`` is a coroutine function.
+
+    Tasks of this process wait for the first one's future; other processes,
+    and this process's threads, coalesce through the same cache lock.
+    """
+    value = await cache.aget(key)
+    if value is not None:
+        return value
+    flight = _aflights.get(key)
+    if flight is not None:
+        done, _ = await asyncio.wait([flight], timeout=settings.SINGLE_FLIGHT_WAIT)
+        if done and flight.result() is not None:
+            return flight.result()
+        return await build()
+    flight = _aflights[key] = asyncio.get_running_loop().create_future()
+    value = None
+    try:
+        value = await _abuild_once(key, build, timeout)
+        return value
+    finally:
+        del _aflights[key]
+        flight.set_result(value)
+
+
+async def _abuild_once(key, build, timeout):
+    lock = f'{key}:building'
+    if not await cache.aadd(lock, 1, settings.SINGLE_FLIGHT_WAIT):
+        deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+            value = await cache.aget(key)
+            if value is not None:
+                return value
+        return await build()
+    try:
+        value = await build()
+        await cache.aset(key, value, timeout)
+        return value
+    finally:
+        await cache.adelete(lock)
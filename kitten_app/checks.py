@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+from django.db import DatabaseError, connections
+
+
+@register()
+def check_connection_mode(app_configs, **kwargs):
+    mode = settings.DB_CONN_MODE
+    if mode not in settings.DB_CONN_MODES:
+        return [Error(
+            f'DB_CONN_MODE is {mode!r}.',
+            hint=f"Use one of {', '.join(settings.DB_CONN_MODES)}.",
+            id='kitten_app.E001',
+        )]
+    if mode == 'pool':
+        try:
+            import psycopg  # noqa: F401
+            import psycopg_pool  # noqa: F401
+        except ImportError:
+            return [Error(
+                'DB_CONN_MODE=pool needs psycopg 3 and psycopg_pool.',
+                hint='pip install "psycopg[binary,pool]" or set DB_CONN_MODE=persistent.',
+                id='kitten_app.E002',
+            )]
+    return []
+
+
+@register()
+def check_rating_aggregation(app_configs, **kwargs):
+    if settings.RATING_AGGREGATION not in ('immediate', 'deferred'):
+        return [Error(
+            f'RATING_AGGREGATION is {settings.RATING_AGGREGATION!r}.',
+            hint="Use 'immediate' or 'deferred'.",
+            id='kitten_app.E004',
+        )]
+    return []
+
+
+@register(Tags.security)
+def check_metrics_token(app_configs, **kwargs):
+    if settings.METRICS and not settings.DEBUG and not settings.METRICS_TOKEN:
+        return [Warning(
+            'METRICS is on without a METRICS_TOKEN: anyone who can reach /metrics can read it.',
+            hint='Set METRICS_TOKEN and send it from the scrape job, or METRICS=0.',
+            id='kitten_app.W001',
+        )]
+    return []
+
+
+@register(Tags.database)
+def check_database_connection(app_configs, databases=None, **kwargs):
+    # Database checks only run for `migrate` and `check --database`, which the
+    # container runs before starting the server: wrong DB_* settings or an
+    # unreachable pool then stop the deploy instead of the first request.
+    errors = []
+    for alias in databases or []:
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError as e:
+            errors.append(Error(
+                f"Cannot connect to database '{alias}': {e}",
+                hint='Check the DB_* environment variables.',
+                id='kitten_app.E003',
+            ))
+    return errors
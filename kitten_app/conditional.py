@@ -0,0 +1,125 @@
+"""
+Conditional GETs for the kitten detail and ratings endpoints.
+
+Each resource has a validator that is cheap to read: the kitten's
+updated_at, or the kitten's stored rating_count and the latest updated_at of
+its ratings (the first entry of rating_kitten_updated_idx). Neither grows
+with the number of ratings. A client sending it back in If-None-Match gets
+a 304 before the resource is loaded or serialized. Neither resource carries
+Last-Modified: an HTTP date has one-second resolution, so a vote in the same
+second as the client's copy would still be answered with a 304, and deleting
+any rating but the newest leaves their latest updated_at where it was. The
+ETag holds the microseconds, and the ratings' count.
+The validator's tag also names the resource's entry in the payload cache,
+so a change simply makes new requests miss; nothing has to be deleted.
+
+With RATING_AGGREGATION=deferred, rating_count trails the votes, so a
+deleted rating shows once the aggregation worker has applied it.
+"""
+import hashlib
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .models import Kitten, Rating
+
+
+class Validators(namedtuple('Validators', ['tag'])):
+    __slots__ = ()
+
+    @property
+    def etag(self):
+        # Weak: the same version renders as JSON or as the browsable API
+        return f'W/"{self.tag}"'
+
+
+def _stamp(value):
+    return int(value.timestamp() * 1_000_000) if value else 0
+
+
+def _kitten_validators(pk, updated_at):
+    if updated_at is None:
+        return None
+    return Validators(f'kitten-{pk}-{_stamp(updated_at)}')
+
+
+def _ratings_validators(kitten_id, version):
+    if version is None:
+        return None
+    count, latest = version
+    return Validators(f'ratings-{kitten_id}-{count}-{_stamp(latest)}')
+
+
+def _kitten_version(pk):
+    return Kitten.objects.filter(pk=pk).values_list('updated_at', flat=True)
+
+
+def _ratings_version(kitten_id):
+    latest = Rating.objects.filter(kitten_id=OuterRef('pk')).order_by('-updated_at').values('updated_at')[:1]
+    return Kitten.objects.filter(pk=kitten_id).values_list('rating_count', Subquery(latest))
+
+
+def kitten_validators(pk):
+    """Validators of a kitten's detail, or None if there is no such kitten."""
+    return _kitten_validators(pk, _kitten_version(pk).first())
+
+
+def ratings_validators(kitten_id):
+    """Validators of a kitten's ratings, or None if there is no such kitten."""
+    return _ratings_validators(kitten_id, _ratings_version(kitten_id).first())
+
+
+async def akitten_validators(pk):
+    return _kitten_validators(pk, await _kitten_version(pk).afirst())
+
+
+async def aratings_validators(kitten_id):
+    return _ratings_validators(kitten_id, await _ratings_version(kitten_id).afirst())
+
+
+def not_modified(request, validators):
+    """A 304 response if the client's copy is current, else None."""
+    return get_conditional_response(request, etag=validators.etag)
+
+
+def add_validators(response, validators):
+    response['ETag'] = validators.etag
+    # Per user (the request carries a token) and always revalidated, so never stale
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def page_variant(request):
+    """``variant`` of a paginated resource: the page, its size and order, and the host its links point to."""
+    return ':' + hashlib.md5(request.build_absolute_uri().encode('utf-8')).hexdigest()
+
+
+def cached_payload(validators, build, variant=''):
+    """
+    The serialized data for ``validators``; ``build`` is only called on a miss.
+
+    ``variant`` tells apart representations of one version, such as sparse
+    fieldsets of a kitten.
+
+    ``build`` reads after the validators did, so an entry may hold a newer
+    version than its tag says, never an older one.
+    """
+    key = f'payload:{validators.tag}{variant}'
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, settings.PAYLOAD_CACHE_TIMEOUT)
+    return data
+
+
+async def acached_payload(validators, build, variant=''):
+    """``cached_payload()`` for async views; ``build`` is a coroutine function."""
+    key = f'payload:{validators.tag}{variant}'
+    data = await cache.aget(key)
+    if data is None:
+        data = await build()
+        await cache.aset(key, data, settings.PAYLOAD_CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,69 @@
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+class ConnectionCounter:
+    """
+    Per-process count of connections Django opened, by alias.
+
+    With DB_CONN_MODE=pool every count is a checkout from the pool rather than
+    a new PostgreSQL session; the pool reports its own sessions.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._opened = Counter()
+
+    def __call__(self, sender, connection, **kwargs):
+        with self._lock:
+            self._opened[connection.alias] += 1
+
+    def __getitem__(self, alias):
+        return self._opened[alias]
+
+
+connections_opened = ConnectionCounter()
+connection_created.connect(connections_opened, dispatch_uid='kitten_app.db.connections_opened')
+
+
+def database_stats(alias='default'):
+    """Connection reuse settings and counters of this process for ``alias``."""
+    connection = connections[alias]
+    stats = {
+        'mode': settings.DB_CONN_MODE,
+        'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+        'health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+        'connections_opened': connections_opened[alias],
+    }
+    pool = getattr(connection, 'pool', None)
+    if pool is not None:
+        stats['pool'] = pool_stats(pool)
+    return stats
+
+
+def pool_stats(pool):
+    """Size, waits and checkout latency of a psycopg_pool.ConnectionPool (counters absent from get_stats() are 0)."""
+    raw = pool.get_stats()
+    checkouts = raw.get('requests_num', 0)
+    waits = raw.get('requests_queued', 0)
+    wait_ms = raw.get('requests_wait_ms', 0)
+    sessions = raw.get('connections_num', 0)
+    return {
+        'min_size': raw.get('pool_min', pool.min_size),
+        'max_size': raw.get('pool_max', pool.max_size),
+        'size': raw.get('pool_size', 0),
+        'available': raw.get('pool_available', 0),
+        'waiting': raw.get('requests_waiting', 0),
+        'checkouts': checkouts,
+        'waits': waits,  # Checkouts that found no idle connection and had to queue
+        'timeouts': raw.get('requests_errors', 0),
+        'checkout_ms_avg': round(wait_ms / checkouts, 3) if checkouts else 0.0,
+        'wait_ms_avg': round(wait_ms / waits, 3) if waits else 0.0,
+        'sessions_opened': sessions,
+        'connect_ms_avg': round(raw.get('connections_ms', 0) / sessions, 3) if sessions else 0.0,
+        'sessions_lost': raw.get('connections_lost', 0),
+    }
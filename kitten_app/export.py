@@ -0,0 +1,127 @@
+import csv
+import datetime
+import io
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+# (column, ORM path) pairs; rows are fetched with values_list() so no model is built per row
+KITTEN_EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('owner', 'owner__username'),
+    ('name', 'name'),
+    ('breed', 'breed'),
+    ('color', 'color'),
+    ('age_months', 'age_months'),
+    ('description', 'description'),
+    ('average_rating', 'average_rating'),
+    ('rating_count', 'rating_count'),
+    ('inserted_time', 'inserted_time'),
+)
+
+RATING_EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('kitten', 'kitten_id'),
+    ('user', 'user_id'),
+    ('score', 'score'),
+    ('created_at', 'created_at'),
+)
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+
+def export_rows(queryset, columns):
+    """``queryset`` as tuples of the ``columns``' values; no model is built per row."""
+    return queryset.values_list(*[path for _, path in columns])
+
+
+def line_encoder(columns, fmt):
+    """``(header, encode)``: the export's first line ('' for NDJSON) and a function turning a row into its line."""
+    names = [name for name, _ in columns]
+    if fmt != 'csv':
+        encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+        return '', lambda row: encoder.encode(dict(zip(names, row))) + '\n'
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    return line(names), lambda row: line([_csv_value(value) for value in row])
+
+
+def _csv_value(value):
+    if isinstance(value, datetime.datetime):
+        # Same representation as the JSON API
+        value = value.isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return value
+
+
+class _Chunks:
+    """Lines gathered into UTF-8 chunks of roughly ``EXPORT_BUFFER_SIZE`` bytes."""
+
+    def __init__(self, header):
+        self.pending, self.size = [header], len(header)
+
+    def add(self, line):
+        """Add ``line``; return a chunk if one is full, else None."""
+        self.pending.append(line)
+        self.size += len(line)
+        if self.size >= settings.EXPORT_BUFFER_SIZE:
+            return self.flush()
+        return None
+
+    def flush(self):
+        chunk = ''.join(self.pending).encode('utf-8')
+        self.pending, self.size = [], 0
+        return chunk
+
+
+def export_chunks(queryset, columns, fmt, chunk_size=None):
+    """
+    Yield the export as UTF-8 byte chunks of roughly ``EXPORT_BUFFER_SIZE``.
+
+    Rows are read through a server-side cursor and encoded as they arrive,
+    so memory stays bounded and the first chunk is sent before the query has
+    been read to the end.
+    """
+    header, encode = line_encoder(columns, fmt)
+    chunks = _Chunks(header)
+    for row in export_rows(queryset, columns).iterator(chunk_size=chunk_size or settings.EXPORT_CHUNK_SIZE):
+        chunk = chunks.add(encode(row))
+        if chunk:
+            yield chunk
+    if chunks.size:
+        yield chunks.flush()
+
+
+async def aexport_chunks(queryset, columns, fmt, chunk_size=None):
+    """
+    ``export_chunks()`` as an async iterator, for responses served over ASGI.
+
+    Django serves a synchronous iterator there by reading it whole into a
+    list first; this one fetches the cursor a chunk at a time on the
+    request's database thread instead, so the export still streams in
+    bounded memory. (Not ``aiterator()``: for values_list() querysets it
+    runs the query in the event loop.)
+    """
+    header, encode = line_encoder(columns, fmt)
+    chunks = _Chunks(header)
+    size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    rows = export_rows(queryset, columns).iterator(chunk_size=size)
+    fetch = sync_to_async(lambda: list(islice(rows, size)))
+    while batch := await fetch():
+        for row in batch:
+            chunk = chunks.add(encode(row))
+            if chunk:
+                yield chunk
+    if chunks.size:
+        yield chunks.flush()
@@ -0,0 +1,102 @@
+"""
+Facet counts for the browse UI: kittens per breed, color and age bucket.
+
+Each facet counts the kittens matching the *other* active filters: with
+``?breed=persian`` the color and age counts are Persian kittens only, while
+the breed counts still show every breed, each narrowed by the color and age
+filters. The response also carries the number of kittens matching all the
+filters.
+
+The counts are sums over (breed, color, age bucket) cells. With no other
+filters, the cells come from the KittenFacetCount table, so the cost depends
+on the number of cells, not of kittens. The table cannot answer a ``?q=``
+search or an age range that does not start and end on bucket edges; then
+the matching kittens are grouped into cells on the fly.
+"""
+from collections import Counter
+
+from django.db.models import Count, Q
+from django.db.models.functions import Lower
+
+from .models import AGE_BUCKETS, Kitten, KittenFacetCount, age_bucket_expression
+
+
+def _aligned_buckets(min_age, max_age):
+    """Indexes of the AGE_BUCKETS that exactly cover ``min_age..max_age``, or None if the range cuts a bucket."""
+    lowest = 0 if min_age is None else next((i for i, (_, low, _) in enumerate(AGE_BUCKETS) if low == min_age), None)
+    highest = len(AGE_BUCKETS) - 1 if max_age is None else \
+        next((i for i, (_, _, high) in enumerate(AGE_BUCKETS) if high == max_age), None)
+    if lowest is None or highest is None:
+        return None
+    return set(range(lowest, highest + 1))
+
+
+def _stored_cells(breed, color):
+    cells = KittenFacetCount.objects.filter(kittens__gt=0)
+    if breed is not None and color is not None:
+        # The breed counts need this color's cells and the color counts this breed's; nothing else
+        cells = cells.filter(Q(breed=breed) | Q(color=color))
+    return cells.values_list('breed', 'color', 'age_bucket', 'kittens')
+
+
+def _live_cells(queryset):
+    return (
+        queryset.order_by()
+        .values_list(Lower('breed'), Lower('color'), age_bucket_expression())
+        .annotate(kittens=Count('id'))
+    )
+
+
+def facet_counts(filterset):
+    """
+    ``{'count', 'breed', 'color', 'age'}`` for the filters of a bound, valid KittenFilter.
+    """
+    params = filterset.form.cleaned_data
+    breed = params['breed'].lower() if params.get('breed') else None
+    color = params['color'].lower() if params.get('color') else None
+    min_age, max_age = params.get('min_age'), params.get('max_age')
+    buckets = _aligned_buckets(min_age, max_age)
+
+    if buckets is not None and not params.get('q'):
+        cells = _stored_cells(breed, color)
+    else:
+        queryset = Kitten.objects.all()
+        if params.get('q'):
+            queryset = filterset.filter_search(queryset, 'q', params['q'])
+        if buckets is None:
+            # Applies to every facet, age included: its buckets only count kittens in the range
+            if min_age is not None:
+                queryset = queryset.filter(age_months__gte=min_age)
+            if max_age is not None:
+                queryset = queryset.filter(age_months__lte=max_age)
+        cells = _live_cells(queryset)
+
+    total, breeds, colors, ages = 0, Counter(), Counter(), Counter()
+    for cell_breed, cell_color, bucket, kittens in cells:
+        in_breed = breed is None or cell_breed == breed
+        in_color = color is None or cell_color == color
+        in_age = buckets is None or bucket in buckets
+        if in_color and in_age:
+            breeds[cell_breed] += kittens
+        if in_breed and in_age:
+            colors[cell_color] += kittens
+        if in_breed and in_color:
+            ages[bucket] += kittens
+            if in_age:
+                total += kittens
+
+    return {
+        'count': total,
+        'breed': _values(breeds),
+        'color': _values(colors),
+        'age': [
+            {'value': label, 'min_age': low, 'max_age': high, 'count': ages[index]}
+            for index, (label, low, high) in enumerate(AGE_BUCKETS)
+        ],
+    }
+
+
+def _values(counts):
+    # Most kittens first, then alphabetically
+    return [{'value': value, 'count': count}
+            for value, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])) if count]
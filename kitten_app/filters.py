@@ -1,24 +1,23 @@
 import django_filters
+from django.db.models.functions import Lower
 from .models import Kitten
 
 class KittenFilter(django_filters.FilterSet):
     min_age = django_filters.NumberFilter(field_name='age_months', lookup_expr='gte', label='Minimum Age')
     max_age = django_filters.NumberFilter(field_name='age_months', lookup_expr='lte', label='Maximum Age')
-    breed = django_filters.CharFilter(field_name='breed', lookup_expr='exact')  # Exact match for breed
-    color = django_filters.CharFilter(field_name='color', lookup_expr='exact')  # Exact match for color
+    breed = django_filters.CharFilter(field_name='breed', method='filter_lower', label='Breed')  # Case-insensitive exact match
+    color = django_filters.CharFilter(field_name='color', method='filter_lower', label='Color')  # Case-insensitive exact match
+    q = django_filters.CharFilter(method='filter_search', label='Search')  # Full-text over name, breed, color and description
 
     class Meta:
         model = Kitten
-        fields = ['breed', 'color', 'min_age', 'max_age']
+        fields = ['breed', 'color', 'min_age', 'max_age', 'q']
 
-    def filter_queryset(self, queryset):
-        # Filter by exact age if min_age and max_age are the same
-        min_age = self.data.get('min_age')
-        max_age = self.data.get('max_age')
+    def filter_lower(self, queryset, name, value):
+        # Compare LOWER(column) rather than using __iexact (which compiles to UPPER())
+        # so the lower() functional indexes on Kitten can serve the lookup
+        return queryset.alias(**{f'{name}_lower': Lower(name)}).filter(**{f'{name}_lower': value.lower()})
 
-        if min_age and max_age and min_age == max_age:
-            queryset = queryset.filter(age_months=min_age)
-        else:
-            queryset = super().filter_queryset(queryset)
-
-        return queryset
+    def filter_search(self, queryset, name, value):
+        # Annotates search_rank, which KeysetPagination orders by unless ?ordering= is given
+        return queryset.search(value) if value.strip() else queryset
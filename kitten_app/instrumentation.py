@@ -0,0 +1,165 @@
+"""
+Per-request timings (settings.REQUEST_TIMING), see RequestTimingMiddleware.
+
+A request's RequestTimings lives in a context variable, so it follows the
+request into sync_to_async threads and stays apart from concurrent async
+requests. SQL is measured by an execute wrapper that every connection gets
+when it opens; code sections (authentication, serializers) wrap themselves
+in ``timed()``. Sections are inclusive: SQL run while serializing counts
+towards both.
+
+Statements slower than SLOW_QUERY_MS are logged to ``kitten_app.slow_sql``
+with a fingerprint of their normalized text, so the same query with other
+parameters groups together.
+"""
+import cProfile
+import hashlib
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('kitten_app.requests')
+slow_sql_logger = logging.getLogger('kitten_app.slow_sql')
+
+_current = ContextVar('kitten_app_request_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = perf_counter()
+        self.sql_count = 0
+        self.sections = {'sql': 0.0}
+
+    def add(self, name, seconds):
+        self.sections[name] = self.sections.get(name, 0.0) + seconds
+
+    def durations_ms(self):
+        """``{section: milliseconds}`` with ``total`` (until now) last."""
+        durations = {name: seconds * 1000 for name, seconds in self.sections.items()}
+        durations['total'] = (perf_counter() - self.started) * 1000
+        return durations
+
+
+def server_timing(durations, sql_count):
+    """A Server-Timing header value, e.g. ``sql;dur=3.10;desc="4 queries", total;dur=9.85``."""
+    return ', '.join(
+        f'{name};dur={ms:.2f}' + (f';desc="{sql_count} queries"' if name == 'sql' else '')
+        for name, ms in durations.items()
+    )
+
+
+def start_request():
+    """Begin timing the current request; pass the returned token to ``end_request()``."""
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current_timings():
+    return _current.get()
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to section ``name`` of the current request, if it is timed."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, perf_counter() - start)
+
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LISTS = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))+\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """``sql`` with literals and parameters replaced by ``?`` and IN lists of any length folded into ``(...)``."""
+    sql = _NUMBERS.sub('?', _STRINGS.sub('?', sql)).replace('%s', '?')
+    return _SPACES.sub(' ', _PLACEHOLDER_LISTS.sub('(...)', sql)).strip()
+
+
+def fingerprint(sql):
+    return _digest(normalize_sql(sql))
+
+
+def _digest(normalized):
+    return hashlib.md5(normalized.encode('utf-8')).hexdigest()[:12]
+
+
+def sql_timer(execute, sql, params, many, context):
+    """``connection.execute_wrapper`` hook feeding the current request's SQL section and the slow-query log."""
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = perf_counter() - start
+        timings = _current.get()
+        if timings is not None:
+            timings.sql_count += 1
+            timings.sections['sql'] += elapsed
+        if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+            normalized = normalize_sql(sql)
+            digest = _digest(normalized)
+            slow_sql_logger.warning(
+                'fingerprint=%s ms=%.1f alias=%s sql="%s"', digest, elapsed * 1000, context['connection'].alias, normalized,
+                extra={'fingerprint': digest, 'sql': normalized, 'duration_ms': elapsed * 1000},
+            )
+
+
+def install_sql_timer(sender, connection, **kwargs):
+    # The same DatabaseWrapper reconnects after CONN_MAX_AGE; wrap it once
+    if sql_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_timer)
+
+
+def enable():
+    """Time the SQL of this thread's open connections and of every connection opened from now on."""
+    connection_created.connect(install_sql_timer, dispatch_uid='kitten_app.instrumentation.install_sql_timer')
+    for connection in connections.all(initialized_only=True):
+        install_sql_timer(None, connection)
+
+
+def profiled(get_response, request):
+    """Run ``get_response(request)`` under cProfile and dump the stats to REQUEST_PROFILE_DIR."""
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(get_response, request)
+    finally:
+        os.makedirs(settings.REQUEST_PROFILE_DIR, exist_ok=True)
+        name = f'{time.strftime("%Y%m%d-%H%M%S")}-{route_name(request)}-{os.getpid()}-{time.perf_counter_ns()}.prof'
+        profiler.dump_stats(os.path.join(settings.REQUEST_PROFILE_DIR, name))
+
+
+def log_request(request, response, durations, sql_count):
+    """One logfmt line per request; the same values are attached to the record as ``timings``."""
+    fields = {
+        'method': request.method,
+        'route': route_name(request),
+        'status': response.status_code,
+        'sql_count': sql_count,
+        **{f'{name}_ms': round(ms, 2) for name, ms in durations.items()},
+    }
+    logger.info(' '.join(f'{key}={value}' for key, value in fields.items()), extra={'timings': fields})
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.url_name if match is not None and match.url_name else 'unmatched'
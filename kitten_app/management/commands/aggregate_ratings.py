@@ -0,0 +1,46 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from kitten_app.aggregation import AggregationWorker, settle
+
+
+class Command(BaseCommand):
+    help = 'Apply queued rating changes to the kitten aggregates (RATING_AGGREGATION=deferred).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Worker threads draining the queue.')
+        parser.add_argument('--batch-size', type=int, default=settings.RATING_AGGREGATION_BATCH_SIZE,
+                            help='Queued changes applied per transaction.')
+        parser.add_argument('--interval', type=float, default=settings.RATING_AGGREGATION_INTERVAL,
+                            help='Seconds an idle worker waits before polling again.')
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit.')
+
+    def handle(self, *args, **options):
+        if settings.RATING_AGGREGATION != 'deferred':
+            self.stderr.write(self.style.WARNING(
+                'RATING_AGGREGATION is not "deferred"; the web processes do not queue rating changes.'))
+
+        if options['once']:
+            applied = settle(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Applied {applied} queued rating change(s).'))
+            return
+
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *args: stop.set())
+        workers = [AggregationWorker(stop, options['batch_size'], options['interval']) for _ in range(options['workers'])]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f'Aggregating ratings with {len(workers)} worker(s); stop with Ctrl+C.')
+        try:
+            while any(worker.is_alive() for worker in workers):
+                stop.wait(1)
+        except KeyboardInterrupt:
+            pass
+        stop.set()
+        for worker in workers:
+            worker.join()
+        self.stdout.write(self.style.SUCCESS(
+            f'Applied {sum(worker.applied for worker in workers)} queued rating change(s).'))
@@ -0,0 +1,90 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from kitten_app.benchmark import connections, datagen, imports, metrics, runner, serialization
+
+
+class Command(BaseCommand):
+    help = 'Load-test the API in-process and report latency percentiles, throughput and queries per request as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help='Kitten owners to generate.')
+        parser.add_argument('--kittens', type=int, default=1000)
+        parser.add_argument('--ratings', type=int, default=10000)
+        parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent for breeds, colors and rated kittens.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Client threads per scenario.')
+        parser.add_argument('--scenario', action='append', dest='scenarios', help='Only run this scenario (repeatable).')
+        parser.add_argument('--output', '-o', help='Also write the report to this file.')
+        parser.add_argument('--baseline', help='Report to compare against; regressions make the command fail.')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative slowdown against the baseline.')
+        parser.add_argument('--connections', type=int, default=0, metavar='ROUNDS',
+                            help='Also time getting a connection without reuse, persistent and pooled.')
+        parser.add_argument('--metrics-overhead', type=int, default=0, metavar='ROUNDS',
+                            help='Also time what the metrics middleware adds to a request.')
+        parser.add_argument('--serialization', type=int, default=0, metavar='ROUNDS',
+                            help='Also compare the kitten list encoder with KittenSerializer over every generated kitten.')
+        parser.add_argument('--imports', type=int, default=0, metavar='ROWS',
+                            help='Also time importing this many JSON Lines rows with import_kittens (rolled back).')
+        parser.add_argument('--keep-db', action='store_true',
+                            help='Run against the configured database instead of a throwaway test database.')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)['scenarios']
+
+        setup_test_environment(debug=False)  # Allows the test client's host, no query logging
+        enforced, settings.QUERY_BUDGET_ENFORCED = settings.QUERY_BUDGET_ENFORCED, False
+        throttling, settings.THROTTLING = settings.THROTTLING, False  # All the load comes from a few users and one address
+        old_name = None
+        if not options['keep_db']:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            dataset = datagen.generate(
+                users=options['users'], kittens=options['kittens'], ratings=options['ratings'],
+                skew=options['skew'], seed=options['seed'],
+            )
+            scenarios = runner.run(dataset, options['requests'], options['concurrency'], only=options['scenarios'])
+            handshakes = connections.handshake_cost(rounds=options['connections']) if options['connections'] else None
+            overhead = metrics.middleware_overhead(rounds=options['metrics_overhead']) if options['metrics_overhead'] else None
+            encoding = serialization.encode_throughput(rounds=options['serialization']) if options['serialization'] else None
+            importing = imports.import_throughput(rows=options['imports'], seed=options['seed']) if options['imports'] else None
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            settings.QUERY_BUDGET_ENFORCED = enforced
+            settings.THROTTLING = throttling
+            teardown_test_environment()
+
+        report = {
+            'config': {key: options[key] for key in ('users', 'kittens', 'ratings', 'skew', 'seed', 'requests', 'concurrency')},
+            'scenarios': scenarios,
+            'asgi_speedup': runner.asgi_speedup(scenarios),
+        }
+        if handshakes is not None:
+            report['connections'] = handshakes
+        if overhead is not None:
+            report['metrics_overhead'] = overhead
+        if encoding is not None:
+            report['serialization'] = encoding
+        if importing is not None:
+            report['imports'] = importing
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
+
+        if baseline is not None:
+            regressions = runner.compare(scenarios, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Performance regressions:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
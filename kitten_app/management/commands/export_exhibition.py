@@ -0,0 +1,51 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from kitten_app.export import EXPORT_FORMATS, KITTEN_EXPORT_COLUMNS, RATING_EXPORT_COLUMNS, export_chunks
+from kitten_app.filters import KittenFilter
+from kitten_app.models import Kitten, Rating
+
+
+class Command(BaseCommand):
+    help = 'Stream a snapshot of the kittens (or their ratings) as NDJSON or CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('what', nargs='?', choices=['kittens', 'ratings'], default='kittens')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--output', '-o', default='-', help="Destination file, or '-' for standard output.")
+        parser.add_argument('--chunk-size', type=int, help='Rows fetched per cursor round trip.')
+        # Same filters as the kitten list endpoint; for ratings they select the rated kittens
+        parser.add_argument('--breed')
+        parser.add_argument('--color')
+        parser.add_argument('--min-age', type=int)
+        parser.add_argument('--max-age', type=int)
+
+    def handle(self, *args, **options):
+        params = {
+            name: options[name]
+            for name in ('breed', 'color', 'min_age', 'max_age')
+            if options[name] is not None
+        }
+        kitten_filter = KittenFilter(params, queryset=Kitten.objects.all())
+        if not kitten_filter.is_valid():
+            raise CommandError(kitten_filter.errors.as_text())
+        kittens = kitten_filter.qs
+
+        if options['what'] == 'ratings':
+            queryset = Rating.objects.order_by('id')
+            if params:
+                queryset = queryset.filter(kitten__in=kittens.values('id'))
+            columns = RATING_EXPORT_COLUMNS
+        else:
+            queryset, columns = kittens.order_by('id'), KITTEN_EXPORT_COLUMNS
+
+        out = sys.stdout.buffer if options['output'] == '-' else open(options['output'], 'wb')
+        try:
+            for chunk in export_chunks(queryset, columns, options['format'], options['chunk_size']):
+                out.write(chunk)
+        finally:
+            if out is sys.stdout.buffer:
+                out.flush()
+            else:
+                out.close()
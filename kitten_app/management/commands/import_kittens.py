@@ -0,0 +1,38 @@
+import sys
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from kitten_app.bulk import import_kittens, parse_rows
+
+
+class Command(BaseCommand):
+    help = 'Import kittens from a JSON Lines or CSV file with batched inserts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for standard input.")
+        parser.add_argument('--owner', required=True, help='Username that will own the imported kittens.')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='Input format (default: guessed from the file extension).')
+        parser.add_argument('--batch-size', type=int, default=settings.KITTEN_IMPORT_BATCH_SIZE, help='Rows per COPY batch.')
+
+    def handle(self, *args, **options):
+        try:
+            owner = User.objects.get(username=options['owner'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['owner']}' does not exist.")
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        stream = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        try:
+            created, errors = import_kittens(parse_rows(stream, fmt), owner, options['batch_size'])
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+
+        for error in errors:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(f'Imported {created} kitten(s), {len(errors)} row(s) rejected.'))
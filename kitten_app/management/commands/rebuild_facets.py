@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from kitten_app.models import KittenFacetCount
+
+
+class Command(BaseCommand):
+    help = 'Recount the kitten facet counts (breed, color, age bucket) from the kittens table.'
+
+    def handle(self, *args, **options):
+        cells = KittenFacetCount.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {cells} facet cell(s).'))
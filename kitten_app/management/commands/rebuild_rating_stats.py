@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from kitten_app.models import KittenRatingHistogram
+
+
+class Command(BaseCommand):
+    help = 'Recount the rating histograms and daily rating counts from the ratings table.'
+
+    def handle(self, *args, **options):
+        kittens = KittenRatingHistogram.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the rating stats of {kittens} kitten(s).'))
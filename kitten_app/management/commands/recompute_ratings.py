@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from kitten_app.models import Kitten
+
+
+class Command(BaseCommand):
+    help = 'Repair drift between the stored kitten rating aggregates and the ratings table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kitten_ids', nargs='*', type=int, help='Only check these kittens (default: all).')
+        parser.add_argument('--dry-run', action='store_true', help='Report drifted kittens without fixing them.')
+        parser.add_argument('--all', action='store_true', help='Recompute every kitten, e.g. after changing the rating prior.')
+
+    def handle(self, *args, **options):
+        kittens = Kitten.objects.all()
+        if options['kitten_ids']:
+            kittens = kittens.filter(id__in=options['kitten_ids'])
+
+        if options['all']:
+            updated = kittens.recompute_rating_aggregates()
+            self.stdout.write(self.style.SUCCESS(f'Recomputed rating aggregates for {updated} kitten(s).'))
+            return
+
+        drifted = list(kittens.rating_drift().values_list('id', flat=True))
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('Rating aggregates are consistent.'))
+            return
+
+        if options['dry_run']:
+            self.stdout.write(f'{len(drifted)} kitten(s) drifted: {", ".join(map(str, drifted))}')
+            return
+
+        Kitten.objects.filter(id__in=drifted).recompute_rating_aggregates()
+        self.stdout.write(self.style.SUCCESS(f'Recomputed rating aggregates for {len(drifted)} kitten(s).'))
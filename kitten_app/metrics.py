@@ -0,0 +1,271 @@
+"""
+Prometheus metrics shared by the worker processes (settings.METRICS), see
+MetricsMiddleware and the ``/metrics`` view.
+
+Every process adds to its own memory-mapped file in METRICS_DIR, named
+after its pid: an update is a dict lookup and an 8-byte write under a lock
+that no other process ever takes. A scrape reads all the files and adds
+them up. A scrape also folds the files of processes that have exited into
+one archive file, so totals stay monotonic when a worker is replaced while
+the number of files stays that of the live workers; empty METRICS_DIR when
+the whole service restarts.
+
+A file is a table of ``key -> float64`` entries appended behind a header
+holding the bytes in use. The writer fills an entry before it bumps the
+header, so a reader never sees half an entry.
+"""
+import fcntl
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from functools import cache
+
+from django.conf import settings
+
+# Upper bounds of the request latency buckets, in seconds; +Inf follows
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE'})
+
+FAMILIES = {
+    'kitten_http_requests_total': ('counter', 'Requests served, by URL name, method and status.'),
+    'kitten_http_request_duration_seconds': ('histogram', 'Time to produce the response, by URL name and method.'),
+    'kitten_db_queries_total': ('counter', 'SQL statements run by requests, by URL name.'),
+    'kitten_db_query_duration_seconds_total': ('counter', 'Time spent in SQL statements run by requests, by URL name.'),
+    'kitten_rating_writes_total': ('counter', 'Ratings created, changed or deleted.'),
+}
+
+_USED = struct.Struct('<Q')
+_LENGTH = struct.Struct('<I')
+_VALUE = struct.Struct('<d')
+INITIAL_SIZE = 1 << 16
+
+
+def _value_offset(start, key_length):
+    # Keeps every value 8-byte aligned, so it is written in one piece
+    return start + (_LENGTH.size + key_length + 7) // 8 * 8
+
+
+def _entries(buffer, used):
+    """``(key, value offset)`` for every entry in ``buffer[:used]``."""
+    position = _USED.size
+    while position < used:
+        (length,) = _LENGTH.unpack_from(buffer, position)
+        key = bytes(buffer[position + _LENGTH.size:position + _LENGTH.size + length]).decode('utf-8')
+        offset = _value_offset(position, length)
+        yield key, offset
+        position = offset + _VALUE.size
+
+
+class ValueFile:
+    """An append-only ``{key: float}`` table in a memory-mapped file. Only one process writes to a file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = os.fstat(self._fd).st_size
+        if size < INITIAL_SIZE:
+            os.ftruncate(self._fd, INITIAL_SIZE)
+            size = INITIAL_SIZE
+        self._map = mmap.mmap(self._fd, size)
+        (self._used,) = _USED.unpack_from(self._map, 0)
+        if not self._used:
+            self._used = _USED.size
+            _USED.pack_into(self._map, 0, self._used)
+        # A pid reused after a restart continues the file it finds
+        self._offsets = dict(_entries(self._map, self._used))
+
+    def add(self, key, amount):
+        offset = self._offsets.get(key)
+        if offset is None:
+            offset = self._append(key)
+        _VALUE.pack_into(self._map, offset, _VALUE.unpack_from(self._map, offset)[0] + amount)
+
+    def _append(self, key):
+        encoded = key.encode('utf-8')
+        offset = _value_offset(self._used, len(encoded))
+        end = offset + _VALUE.size
+        if end > len(self._map):
+            self._grow(end)
+        _LENGTH.pack_into(self._map, self._used, len(encoded))
+        self._map[self._used + _LENGTH.size:self._used + _LENGTH.size + len(encoded)] = encoded
+        _VALUE.pack_into(self._map, offset, 0.0)
+        _USED.pack_into(self._map, 0, end)
+        self._used = end
+        self._offsets[key] = offset
+        return offset
+
+    def _grow(self, needed):
+        size = len(self._map)
+        while size < needed:
+            size *= 2
+        self._map.close()
+        os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+
+def read_values(path):
+    """``{key: value}`` of one process's file, read without locking."""
+    with open(path, 'rb') as f:
+        buffer = f.read()
+    if len(buffer) < _USED.size:
+        return {}
+    (used,) = _USED.unpack_from(buffer, 0)
+    return {key: _VALUE.unpack_from(buffer, offset)[0] for key, offset in _entries(buffer, min(used, len(buffer)))}
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Someone else's process
+    return True
+
+
+class MetricStore:
+    """The metric files in ``directory``: this process writes its own and reads everyone's."""
+
+    ARCHIVE = 'archive.db'  # Totals of the processes that have exited
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = None
+
+    def _values(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            # First write, or a forked child that must not write to its parent's file
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = ValueFile(os.path.join(self.directory, f'{pid}.db'))
+            self._pid = pid
+        return self._file
+
+    def add(self, increments):
+        """Add each ``(key, amount)`` pair."""
+        with self._lock:
+            values = self._values()
+            for key, amount in increments:
+                values.add(key, amount)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = self._pid = None
+
+    def collect(self):
+        """``{key: value}`` summed over the files of all processes, dead or alive."""
+        totals = defaultdict(float)
+        if not os.path.isdir(self.directory):
+            return totals
+        # Scrapes take turns, so none reads a dead process's values both in its file and in the archive
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._fold_dead()
+            for name in os.listdir(self.directory):
+                if name.endswith('.db'):
+                    for key, value in read_values(os.path.join(self.directory, name)).items():
+                        totals[key] += value
+        return totals
+
+    def _fold_dead(self):
+        """Add the files of exited processes to the archive and remove them."""
+        dead = [name for name in os.listdir(self.directory)
+                if name.endswith('.db') and name[:-3].isdigit() and not _pid_alive(int(name[:-3]))]
+        if not dead:
+            return
+        archive = ValueFile(os.path.join(self.directory, self.ARCHIVE))
+        try:
+            for name in dead:
+                path = os.path.join(self.directory, name)
+                for key, value in read_values(path).items():
+                    archive.add(key, value)
+                os.unlink(path)
+        finally:
+            archive.close()
+
+
+store = MetricStore(settings.METRICS_DIR)
+
+
+class _RequestKeys:
+    __slots__ = ('requests', 'buckets', 'duration_sum', 'queries', 'query_seconds')
+
+
+@cache
+def _request_keys(route, method, status):
+    # Bounded: URL names come from urls.py, methods from METHODS and statuses from HTTP
+    route_label = f'route="{route}"'
+    keys = _RequestKeys()
+    keys.requests = f'kitten_http_requests_total{{{route_label},method="{method}",status="{status}"}}'
+    keys.buckets = tuple(
+        f'kitten_http_request_duration_seconds_bucket{{{route_label},method="{method}",le="{le}"}}'
+        for le in (*map(_number, BUCKETS), '+Inf')
+    )
+    keys.duration_sum = f'kitten_http_request_duration_seconds_sum{{{route_label},method="{method}"}}'
+    keys.queries = f'kitten_db_queries_total{{{route_label}}}'
+    keys.query_seconds = f'kitten_db_query_duration_seconds_total{{{route_label}}}'
+    return keys
+
+
+def observe_request(route, method, status, seconds, sql_count, sql_seconds):
+    keys = _request_keys(route, method if method in METHODS else 'other', status)
+    store.add((
+        (keys.requests, 1),
+        (keys.buckets[bisect_left(BUCKETS, seconds)], 1),
+        (keys.duration_sum, seconds),
+        (keys.queries, sql_count),
+        (keys.query_seconds, sql_seconds),
+    ))
+
+
+def count_rating_writes(created=0, updated=0, deleted=0):
+    store.add(
+        (f'kitten_rating_writes_total{{op="{op}"}}', count)
+        for op, count in (('created', created), ('updated', updated), ('deleted', deleted)) if count
+    )
+
+
+def _number(value):
+    return repr(int(value)) if value == int(value) else repr(value)
+
+
+def _histogram_lines(name, values):
+    # Buckets are stored per bucket; the exposition format wants them cumulative
+    prefix = f'{name}_bucket{{'
+    series = defaultdict(dict)
+    for key, value in values.items():
+        if key.startswith(prefix):
+            labels, le = key[len(prefix):-1].rsplit(',le="', 1)
+            series[labels][le[:-1]] = value
+    lines = []
+    for labels, buckets in sorted(series.items()):
+        total = 0
+        for le in (*map(_number, BUCKETS), '+Inf'):
+            total += buckets.get(le, 0)
+            lines.append(f'{prefix}{labels},le="{le}"}} {_number(total)}')
+        lines.append(f'{name}_sum{{{labels}}} {values.get(f"{name}_sum{{{labels}}}", 0.0)!r}')
+        lines.append(f'{name}_count{{{labels}}} {_number(total)}')
+    return lines
+
+
+def render(values):
+    """``values`` in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for name, (kind, help_text) in FAMILIES.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        if kind == 'histogram':
+            lines += _histogram_lines(name, values)
+        else:
+            lines += [f'{key} {_number(value)}' for key, value in sorted(values.items()) if key.startswith(f'{name}{{')]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,166 @@
+import random
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.functional import LazyObject
+
+from . import instrumentation, metrics
+from .routers import PIN_COOKIE, pin_user, pinned_reads
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaPinningMiddleware:
+    """
+    Read-your-writes on top of PrimaryReplicaRouter.
+
+    Writes and the reads they make run on the primary. After a successful
+    write, the writer's reads stay there for DB_REPLICA_STICKY_SECONDS, until
+    replication has caught up. The pin is kept in the shared cache for the
+    user (the JWT authentication checks it, see CachedJWTAuthentication)
+    and in a cookie for clients that keep cookies.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        with pinned_reads(self._starts_pinned(request)):
+            response = self.get_response(request)
+        return self._after(request, response)
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+        with pinned_reads(self._starts_pinned(request)):
+            response = await self.get_response(request)
+        return self._after(request, response)
+
+    def _starts_pinned(self, request):
+        return request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES
+
+    def _after(self, request, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400:
+            return response
+        # DRF replaces the session's lazy user with the token's user; never load a session here
+        user = request.__dict__.get('user')
+        if user is not None and not isinstance(user, LazyObject) and user.is_authenticated:
+            pin_user(user.pk)
+        response.set_cookie(PIN_COOKIE, '1', max_age=settings.DB_REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax')
+        return response
+
+
+class RequestTimingMiddleware:
+    """
+    Time each request (settings.REQUEST_TIMING): SQL count and time, authentication,
+    serializers and the total.
+
+    The timings go out as a Server-Timing header, which browser dev tools
+    show next to the request, and as one ``kitten_app.requests`` log line.
+    A REQUEST_PROFILE_RATE fraction of the synchronous requests also runs
+    under cProfile (see instrumentation.profiled). When REQUEST_TIMING is
+    off the middleware removes itself, so it costs nothing.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING:
+            raise MiddlewareNotUsed
+        instrumentation.enable()
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token = instrumentation.start_request()
+        try:
+            if settings.REQUEST_PROFILE_RATE and random.random() < settings.REQUEST_PROFILE_RATE:
+                response = instrumentation.profiled(self.get_response, request)
+            else:
+                response = self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        return self._after(request, response, timings)
+
+    async def __acall__(self, request):
+        # cProfile follows a thread, not a task, so async requests are never profiled
+        timings, token = instrumentation.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        return self._after(request, response, timings)
+
+    def _after(self, request, response, timings):
+        durations = timings.durations_ms()
+        response['Server-Timing'] = instrumentation.server_timing(durations, timings.sql_count)
+        instrumentation.log_request(request, response, durations, timings.sql_count)
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Count each request in the shared Prometheus metrics (settings.METRICS):
+    by URL name, method and status, with its latency and the SQL it ran.
+
+    SQL is counted through the request's RequestTimings: the one
+    RequestTimingMiddleware started, or one of its own when timing is off.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS:
+            raise MiddlewareNotUsed
+        instrumentation.enable()
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = perf_counter()
+        timings, token = self._timings()
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                instrumentation.end_request(token)
+        return self._after(request, response, started, timings)
+
+    async def __acall__(self, request):
+        started = perf_counter()
+        timings, token = self._timings()
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                instrumentation.end_request(token)
+        return self._after(request, response, started, timings)
+
+    def _timings(self):
+        timings = instrumentation.current_timings()
+        if timings is not None:
+            return timings, None
+        return instrumentation.start_request()
+
+    def _after(self, request, response, started, timings):
+        metrics.observe_request(
+            instrumentation.route_name(request), request.method, response.status_code,
+            perf_counter() - started, timings.sql_count, timings.sections['sql'],
+        )
+        return response
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:49
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_rating_aggregates(apps, schema_editor):
+    Kitten = apps.get_model('kitten_app', 'Kitten')
+    Rating = apps.get_model('kitten_app', 'Rating')
+    ratings = Rating.objects.filter(kitten=OuterRef('pk')).order_by().values('kitten')
+    Kitten.objects.update(
+        rating_sum=Coalesce(Subquery(ratings.annotate(total=Sum('score')).values('total')), 0),
+        rating_count=Coalesce(Subquery(ratings.annotate(count=Count('id')).values('count')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitten_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kitten',
+            name='rating_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='kitten',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(populate_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitten_app', '0002_kitten_rating_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='kitten',
+            index=models.Index(fields=['-inserted_time', '-id'], name='kitten_inserted_id_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:52
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitten_app', '0003_kitten_inserted_id_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='kitten',
+            index=models.Index(django.db.models.functions.text.Lower('breed'), name='kitten_breed_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kitten',
+            index=models.Index(django.db.models.functions.text.Lower('color'), name='kitten_color_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kitten',
+            index=models.Index(django.db.models.functions.text.Lower('breed'), django.db.models.functions.text.Lower('color'), models.F('age_months'), name='kitten_breed_color_age_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:59
+
+import django.db.models.functions.text
+import kitten_app.models
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast
+
+
+def populate_weighted_rating(apps, schema_editor):
+    Kitten = apps.get_model('kitten_app', 'Kitten')
+    prior_total = float(settings.RATING_PRIOR_WEIGHT * settings.RATING_PRIOR_MEAN)
+    Kitten.objects.update(weighted_rating=(
+        (Value(prior_total) + Cast(F('rating_sum'), FloatField())) / (Value(settings.RATING_PRIOR_WEIGHT) + F('rating_count'))
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitten_app', '0004_kitten_lower_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='kitten',
+            name='kitten_breed_lower_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='kitten',
+            name='kitten_color_lower_idx',
+        ),
+        migrations.AddField(
+            model_name='kitten',
+            name='weighted_rating',
+            field=models.FloatField(default=kitten_app.models.default_weighted_rating),
+        ),
+        migrations.RunPython(populate_weighted_rating, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='kitten',
+            index=models.Index(models.OrderBy(models.F('weighted_rating'), descending=True), models.F('id'), name='kitten_top_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kitten',
+            index=models.Index(django.db.models.functions.text.Lower('breed'), models.OrderBy(models.F('weighted_rating'), descending=True), models.F('id'), name='kitten_top_breed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kitten',
+            index=models.Index(django.db.models.functions.text.Lower('color'), models.OrderBy(models.F('weighted_rating'), descending=True), models.F('id'), name='kitten_top_color_idx'),
+        ),
+    ]
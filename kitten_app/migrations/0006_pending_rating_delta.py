@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 19:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitten_app', '0005_kitten_weighted_rating'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingRatingDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score_delta', models.IntegerField()),
+                ('count_delta', models.IntegerField()),
+                ('kitten', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_rating_deltas', to='kitten_app.kitten')),
+            ],
+        ),
+    ]
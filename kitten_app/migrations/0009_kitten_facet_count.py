@@ -0,0 +1,46 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:35
+
+from django.db import migrations, models
+from django.db.models import Case, Count, Value, When
+from django.db.models.functions import Lower
+
+
+def populate_facet_counts(apps, schema_editor):
+    # Same cells as KittenFacetCount.objects.rebuild(), with the age buckets of this migration
+    Kitten = apps.get_model('kitten_app', 'Kitten')
+    KittenFacetCount = apps.get_model('kitten_app', 'KittenFacetCount')
+    bucket = Case(*[When(age_months__lte=highest, then=Value(index)) for index, highest in enumerate((3, 6, 12, 24))],
+                  default=Value(4))
+    cells = (
+        Kitten.objects.order_by()
+        .values(cell_breed=Lower('breed'), cell_color=Lower('color'), cell_age=bucket)
+        .annotate(kittens=Count('id'))
+    )
+    KittenFacetCount.objects.bulk_create(
+        KittenFacetCount(breed=cell['cell_breed'], color=cell['cell_color'], age_bucket=cell['cell_age'], kittens=cell['kittens'])
+        for cell in cells
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitten_app', '0008_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KittenFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('breed', models.CharField(max_length=100)),
+                ('color', models.CharField(max_length=51)),
+                ('age_bucket', models.SmallIntegerField()),
+                ('kittens', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('breed', 'color', 'age_bucket'), name='kitten_facet_cell_uniq')],
+            },
+        ),
+        migrations.RunPython(populate_facet_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_rating_stats(apps, schema_editor):
+    # Same rows as KittenRatingHistogram.objects.rebuild(). Deltas queued before this migration carry no
+    # change, so the aggregation worker never adds them to the stats: every rating is counted here.
+    Rating = apps.get_model('kitten_app', 'Rating')
+    KittenRatingHistogram = apps.get_model('kitten_app', 'KittenRatingHistogram')
+    RatingDailyCount = apps.get_model('kitten_app', 'RatingDailyCount')
+    stars = [f'stars_{score}' for score in range(1, 6)]
+    histograms = Rating.objects.order_by().values('kitten').annotate(
+        **{name: Count('id', filter=Q(score=score)) for score, name in enumerate(stars, 1)})
+    KittenRatingHistogram.objects.bulk_create(
+        KittenRatingHistogram(kitten_id=row['kitten'], **{name: row[name] for name in stars}) for row in histograms
+    )
+    days = Rating.objects.order_by().values('kitten', day=TruncDate('created_at')).annotate(
+        ratings=Count('id'), score_sum=Sum('score'))
+    RatingDailyCount.objects.bulk_create(
+        RatingDailyCount(kitten_id=row['kitten'], day=row['day'], ratings=row['ratings'], score_sum=row['score_sum'])
+        for row in days
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitten_app', '0009_kitten_facet_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KittenRatingHistogram',
+            fields=[
+                ('kitten', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_histogram', serialize=False, to='kitten_app.kitten')),
+                ('stars_1', models.IntegerField(default=0)),
+                ('stars_2', models.IntegerField(default=0)),
+                ('stars_3', models.IntegerField(default=0)),
+                ('stars_4', models.IntegerField(default=0)),
+                ('stars_5', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='pendingratingdelta',
+            name='added_score',
+            field=models.SmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='pendingratingdelta',
+            name='day',
+            field=models.DateField(null=True),
+        ),
+        migrations.AddField(
+            model_name='pendingratingdelta',
+            name='removed_score',
+            field=models.SmallIntegerField(null=True),
+        ),
+        migrations.CreateModel(
+            name='RatingDailyCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('ratings', models.IntegerField(default=0)),
+                ('score_sum', models.IntegerField(default=0)),
+                ('kitten', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rating_days', to='kitten_app.kitten')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kitten', 'day'), name='rating_day_kitten_uniq')],
+            },
+        ),
+        migrations.RunPython(populate_rating_stats, migrations.RunPython.noop),
+    ]
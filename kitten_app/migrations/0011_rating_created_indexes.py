@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 21:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitten_app', '0010_rating_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['kitten', 'created_at', 'id'], name='rating_kitten_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='rating_user_created_idx'),
+        ),
+    ]
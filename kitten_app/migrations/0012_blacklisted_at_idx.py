@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitten_app', '0011_rating_created_indexes'),
+        ('token_blacklist', '0012_alter_outstandingtoken_user'),
+    ]
+
+    operations = [
+        # RevokedTokens syncs the rows blacklisted since its last read; the table is simplejwt's
+        migrations.RunSQL(
+            'CREATE INDEX blacklisted_at_idx ON token_blacklist_blacklistedtoken (blacklisted_at)',
+            'DROP INDEX blacklisted_at_idx',
+        ),
+    ]
@@ -1,6 +1,16 @@
-from django.db import models
+from collections import Counter, defaultdict, namedtuple
+
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, SearchVectorField
+from django.db import connection, models, transaction
+from django.db.models import Case, Count, Exists, ExpressionWrapper, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Lower, Now, TruncDate
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+from . import metrics
+from .cache import invalidate_kitten_lists
 
 def validate_age(value):
     if value < 0:
@@ -10,6 +20,162 @@ def validate_rating(value):
     if value < 1 or value > 5:
         raise ValidationError('Rating must be between 1 and 5.')
 
+def weighted_rating(total, count):
+    """
+    Bayesian average of a kitten's ratings.
+
+    Every kitten starts with RATING_PRIOR_WEIGHT imaginary votes of
+    RATING_PRIOR_MEAN, so a single 5-star vote cannot outrank hundreds of
+    4-star ones. Works on plain numbers and on query expressions alike.
+    """
+    prior_total = float(settings.RATING_PRIOR_WEIGHT * settings.RATING_PRIOR_MEAN)
+    if isinstance(total, int) and isinstance(count, int):
+        return (prior_total + total) / (settings.RATING_PRIOR_WEIGHT + count)
+    return ExpressionWrapper(
+        (Value(prior_total) + Cast(total, FloatField())) / (Value(settings.RATING_PRIOR_WEIGHT) + count),
+        output_field=FloatField(),
+    )
+
+# Text search configuration of Kitten.search_vector and the ?q= queries
+SEARCH_CONFIG = 'english'
+
+def default_weighted_rating():
+    return weighted_rating(0, 0)
+
+# Age facets: (label, min months, max months or None), see KittenFacetCount
+AGE_BUCKETS = (('0-3', 0, 3), ('4-6', 4, 6), ('7-12', 7, 12), ('13-24', 13, 24), ('25+', 25, None))
+
+def age_bucket(age_months):
+    """Index in AGE_BUCKETS of ``age_months``; ``age_bucket_expression()`` in SQL."""
+    for index, (_, _, highest) in enumerate(AGE_BUCKETS):
+        if highest is None or age_months <= highest:
+            return index
+
+def facet_cell(breed, color, age_months):
+    """The KittenFacetCount cell of a kitten with these values."""
+    return (breed.lower(), color.lower(), age_bucket(age_months))
+
+def age_bucket_expression(field='age_months'):
+    return Case(
+        *[When(**{f'{field}__lte': highest}, then=Value(index))
+          for index, (_, _, highest) in enumerate(AGE_BUCKETS) if highest is not None],
+        default=Value(len(AGE_BUCKETS) - 1),
+    )
+
+class KittenQuerySet(models.QuerySet):
+    def search(self, text):
+        """
+        Kittens matching a web-style query ("fluffy grey", "maine coon -persian"),
+        annotated with their relevance as ``search_rank``.
+
+        Matches come from the GIN index on search_vector; name words weigh
+        more than breed/color, which weigh more than the description.
+        Ranking reads every match, so only the newest SEARCH_MAX_CANDIDATES
+        matches (by id, not by relevance) are ranked: a query as broad as
+        "cat" stays fast, at the cost of possibly missing better, older
+        matches. Picking them by id keeps the set the same from one request
+        to the next, so cursor pages over the rank neither skip nor repeat
+        kittens. ``search_truncated`` tells whether matches were left out.
+        """
+        query = SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+        matches = self.filter(search_vector=query)
+        cap = settings.SEARCH_MAX_CANDIDATES
+        candidates = matches.order_by('-id').values('pk')[:cap]
+        # ts_rank() is a real; as a double it survives the round trip through a pagination cursor
+        rank = Cast(SearchRank(F('search_vector'), query), FloatField())
+        return self.filter(pk__in=candidates).annotate(
+            search_rank=rank,
+            # Not correlated with the row, so PostgreSQL evaluates it once per query
+            search_truncated=Exists(matches.order_by().values('pk')[cap:cap + 1]),
+        )
+
+    def apply_rating_delta(self, score_delta, count_delta):
+        """Shift the stored rating aggregates by the given deltas in a single UPDATE."""
+        new_sum = F('rating_sum') + score_delta
+        new_count = F('rating_count') + count_delta
+        invalidate_kitten_lists()  # The list pages show the aggregates
+        return self.update(
+            rating_sum=new_sum,
+            rating_count=new_count,
+            updated_at=Now(),
+            average_rating=Case(
+                When(rating_count__lte=-count_delta, then=Value(0.0)),
+                default=Cast(new_sum, FloatField()) / new_count,
+                output_field=FloatField(),
+            ),
+            weighted_rating=weighted_rating(new_sum, new_count),
+        )
+
+    def apply_rating_deltas(self, deltas):
+        """
+        Apply ``{kitten_id: (score_delta, count_delta)}`` to many kittens in a single UPDATE.
+
+        Call it in a transaction that already holds the kitten rows (see
+        kitten_app.aggregation.apply_pending), so concurrent callers lock them
+        in the same order.
+        """
+        if not deltas:
+            return 0
+        score_delta = Case(*[When(pk=pk, then=Value(score)) for pk, (score, _) in deltas.items()],
+                           default=Value(0), output_field=models.IntegerField())
+        count_delta = Case(*[When(pk=pk, then=Value(count)) for pk, (_, count) in deltas.items()],
+                           default=Value(0), output_field=models.IntegerField())
+        return self.filter(pk__in=deltas).apply_rating_delta(score_delta, count_delta)
+
+    def with_actual_ratings(self):
+        """Annotate the rating totals as they are in the ratings table, and the deltas still queued."""
+        ratings = Rating.objects.filter(kitten=OuterRef('pk')).order_by().values('kitten')
+        pending = PendingRatingDelta.objects.filter(kitten=OuterRef('pk')).order_by().values('kitten')
+        return self.annotate(
+            actual_sum=Coalesce(Subquery(ratings.annotate(total=Sum('score')).values('total')), 0),
+            actual_count=Coalesce(Subquery(ratings.annotate(count=Count('id')).values('count')), 0),
+            pending_sum=Coalesce(Subquery(pending.annotate(total=Sum('score_delta')).values('total')), 0),
+            pending_count=Coalesce(Subquery(pending.annotate(total=Sum('count_delta')).values('total')), 0),
+        )
+
+    def rating_drift(self):
+        """Kittens whose stored aggregates, once their queued deltas are applied, no longer match their ratings."""
+        return self.with_actual_ratings().exclude(
+            rating_sum=F('actual_sum') - F('pending_sum'),
+            rating_count=F('actual_count') - F('pending_count'),
+        )
+
+    def recompute_rating_aggregates(self):
+        """
+        Rebuild the stored aggregates from the ratings table.
+
+        Deltas still queued for the aggregation worker are left out, since it
+        applies them later. A rating and its delta are written in the same
+        transaction, so one statement sees both or neither.
+        """
+        ratings = Rating.objects.filter(kitten=OuterRef('pk')).order_by().values('kitten')
+        pending = PendingRatingDelta.objects.filter(kitten=OuterRef('pk')).order_by().values('kitten')
+        with transaction.atomic():
+            # Wait for in-flight aggregate updates first, so the snapshot below includes them
+            list(self.select_for_update().order_by('pk').values_list('pk', flat=True))
+            updated = self.update(
+                rating_sum=Coalesce(Subquery(ratings.annotate(total=Sum('score')).values('total')), 0)
+                - Coalesce(Subquery(pending.annotate(total=Sum('score_delta')).values('total')), 0),
+                rating_count=Coalesce(Subquery(ratings.annotate(count=Count('id')).values('count')), 0)
+                - Coalesce(Subquery(pending.annotate(total=Sum('count_delta')).values('total')), 0),
+                updated_at=Now(),
+            )
+            invalidate_kitten_lists()
+            self.update(
+                average_rating=Case(
+                    When(rating_count=0, then=Value(0.0)),
+                    default=Cast(F('rating_sum'), FloatField()) / F('rating_count'),
+                    output_field=FloatField(),
+                ),
+                weighted_rating=weighted_rating(F('rating_sum'), F('rating_count')),
+            )
+        return updated
+
+class KittenManager(models.Manager.from_queryset(KittenQuerySet)):
+    def get_queryset(self):
+        # Only the database reads the search document; don't ship it with every kitten
+        return super().get_queryset().defer('search_vector')
+
 class Kitten(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
@@ -18,13 +184,53 @@ class Kitten(models.Model):
     age_months = models.IntegerField(validators=[validate_age])
     description = models.TextField()
     average_rating = models.FloatField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    weighted_rating = models.FloatField(default=default_weighted_rating)  # Ranking score, see weighted_rating()
     inserted_time = models.DateTimeField(auto_now_add=True)
+    # Validator for conditional GETs (kitten_app.conditional). save() sets it; the rating
+    # aggregate UPDATEs set it too, since they change what the kitten renders as
+    updated_at = models.DateTimeField(auto_now=True)
+    # Full-text document for ?q= searches. PostgreSQL computes it on every write, bulk_create
+    # and update() included, so it is never stale; see KittenQuerySet.search()
+    search_vector = models.GeneratedField(
+        expression=SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('breed', 'color', weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = KittenManager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the kitten list (newest first)
+            models.Index(fields=['-inserted_time', '-id'], name='kitten_inserted_id_idx'),
+            # Case-insensitive breed/color filters
+            models.Index(Lower('breed'), Lower('color'), 'age_months', name='kitten_breed_color_age_idx'),
+            # Top-K leaderboards, overall and scoped to a breed or a color. The scoped ones lead
+            # with LOWER(breed)/LOWER(color), so they also serve the plain breed/color filters
+            # and the distinct breed/color lists.
+            models.Index(F('weighted_rating').desc(), 'id', name='kitten_top_idx'),
+            models.Index(Lower('breed'), F('weighted_rating').desc(), 'id', name='kitten_top_breed_idx'),
+            models.Index(Lower('color'), F('weighted_rating').desc(), 'id', name='kitten_top_color_idx'),
+            # Full-text search
+            GinIndex(fields=['search_vector'], name='kitten_search_idx'),
+        ]
+
+    def facet_cell(self):
+        return facet_cell(self.breed, self.color, self.age_months)
+
+    def save(self, *args, **kwargs):
+        # The facet counts change in the same transaction (see kitten_app.signals)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def update_average_rating(self):
-        total_rating = sum([rating.score for rating in self.ratings.all()])
-        rating_count = self.ratings.count()
-        self.average_rating = total_rating / rating_count if rating_count > 0 else 0
-        self.save()
+        """Recompute the rating aggregates from scratch (see the recompute_ratings command)."""
+        Kitten.objects.filter(pk=self.pk).recompute_rating_aggregates()
+        self.refresh_from_db(fields=['average_rating', 'rating_sum', 'rating_count', 'weighted_rating'])
 
     def __str__(self):
         return f'{self.name} ({self.breed})'
@@ -34,9 +240,304 @@ class Rating(models.Model):
     kitten = models.ForeignKey(Kitten, related_name='ratings', on_delete=models.CASCADE)
     score = models.IntegerField(validators=[validate_rating])
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('user', 'kitten')  # Each user can only rate a kitten once
+        indexes = [
+            # Validator of a kitten's ratings list (count and latest change), read from the index alone
+            models.Index(fields=['kitten', 'updated_at'], name='rating_kitten_updated_idx'),
+            # Keyset pages of a kitten's and of a user's ratings: (created_at, id) is the cursor
+            models.Index(fields=['kitten', 'created_at', 'id'], name='rating_kitten_created_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='rating_user_created_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored score so saves can apply a delta instead of a rescan
+        instance._stored_score = instance.__dict__.get('score')
+        return instance
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        stored_score, created_at = getattr(self, '_stored_score', None), self.created_at
+        if not adding and (stored_score is None or created_at is None):
+            stored_score, created_at = Rating.objects.filter(pk=self.pk).values_list('score', 'created_at').first() \
+                or (None, None)
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                record_rating_change(RatingChange.of(self, added=self.score))
+            elif stored_score is not None and stored_score != self.score:
+                record_rating_change(RatingChange(self.kitten_id, rating_day(created_at), self.score, stored_score))
+        self._stored_score = self.score
+
+    def delete(self, *args, **kwargs):
+        score = getattr(self, '_stored_score', None) or self.score
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            record_rating_change(RatingChange.of(self, removed=score))
+        return result
 
     def __str__(self):
         return f'{self.user.username} rated {self.kitten.name}:  {self.score}'
+
+class PendingRatingDelta(models.Model):
+    """
+    A rating change not yet applied to its kitten's aggregates.
+
+    Written instead of updating the kitten when RATING_AGGREGATION is
+    'deferred'; the aggregate_ratings worker sums them per kitten and
+    applies them in batches (kitten_app.aggregation).
+    """
+    kitten = models.ForeignKey(Kitten, related_name='pending_rating_deltas', on_delete=models.CASCADE)
+    score_delta = models.IntegerField()
+    count_delta = models.IntegerField()
+    # The change itself, for the rating stats; null in rows queued before they existed
+    day = models.DateField(null=True)
+    added_score = models.SmallIntegerField(null=True)
+    removed_score = models.SmallIntegerField(null=True)
+
+    def change(self):
+        """The RatingChange queued in this row, or None if it predates the rating stats."""
+        if self.day is None:
+            return None
+        return RatingChange(self.kitten_id, self.day, self.added_score, self.removed_score)
+
+
+def rating_day(created_at):
+    """The day a rating counts towards in RatingDailyCount: its creation date in TIME_ZONE."""
+    return timezone.localdate(created_at) if created_at is not None else None
+
+
+class RatingChange(namedtuple('RatingChange', ['kitten_id', 'day', 'added', 'removed'])):
+    """
+    One rating write: the score ``added`` and the score ``removed`` (None on
+    create and delete respectively). ``day`` is the rating's ``rating_day()``.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def of(cls, rating, added=None, removed=None):
+        return cls(rating.kitten_id, rating_day(rating.created_at), added, removed)
+
+    @property
+    def score_delta(self):
+        return (self.added or 0) - (self.removed or 0)
+
+    @property
+    def count_delta(self):
+        return (self.added is not None) - (self.removed is not None)
+
+
+_WRITE_OPS = {1: 'created', 0: 'updated', -1: 'deleted'}
+
+def record_rating_change(change):
+    """Apply a RatingChange to the kitten and its rating stats now, or queue it for the aggregation worker."""
+    record_rating_changes([change])
+
+def record_rating_changes(changes):
+    """
+    ``record_rating_change()`` for many changes, at most one per kitten.
+
+    With several kittens, the caller holds their rows already (see
+    apply_rating_deltas).
+    """
+    if not changes:
+        return
+    # Counted once the writes are, so a rolled back rating is not
+    writes = Counter(_WRITE_OPS[change.count_delta] for change in changes)
+    transaction.on_commit(lambda: metrics.count_rating_writes(**writes))
+    if settings.RATING_AGGREGATION == 'deferred':
+        # An INSERT takes no lock on the kitten row, however many judges rate it at once
+        PendingRatingDelta.objects.bulk_create([
+            PendingRatingDelta(kitten_id=change.kitten_id, score_delta=change.score_delta, count_delta=change.count_delta,
+                               day=change.day, added_score=change.added, removed_score=change.removed)
+            for change in changes
+        ])
+        return
+    if len(changes) == 1:
+        Kitten.objects.filter(pk=changes[0].kitten_id).apply_rating_delta(changes[0].score_delta, changes[0].count_delta)
+    else:
+        Kitten.objects.apply_rating_deltas({change.kitten_id: (change.score_delta, change.count_delta) for change in changes})
+    apply_rating_stats(changes)
+
+def apply_rating_stats(changes):
+    """Add RatingChanges to KittenRatingHistogram and RatingDailyCount in one statement."""
+    stars, days = defaultdict(lambda: [0] * 5), defaultdict(lambda: [0, 0])
+    for change in changes:
+        if change.added is not None:
+            stars[change.kitten_id][change.added - 1] += 1
+        if change.removed is not None:
+            stars[change.kitten_id][change.removed - 1] -= 1
+        if change.day is not None:
+            days[change.kitten_id, change.day][0] += change.count_delta
+            days[change.kitten_id, change.day][1] += change.score_delta
+    statements = [statement for statement in (
+        _upsert(KittenRatingHistogram, ['kitten_id'], list(STARS),
+                [(kitten_id, *delta) for kitten_id, delta in stars.items() if any(delta)]),
+        _upsert(RatingDailyCount, ['kitten_id', 'day'], ['ratings', 'score_sum'],
+                [(kitten_id, day, *delta) for (kitten_id, day), delta in days.items() if any(delta)]),
+    ) if statement is not None]
+    if not statements:
+        return
+    if len(statements) == 2:
+        # One round trip: PostgreSQL runs a data-modifying WITH to completion whether it is read or not
+        (histogram_sql, histogram_params), (days_sql, days_params) = statements
+        statements = [(f'WITH histogram AS ({histogram_sql}) {days_sql}', histogram_params + days_params)]
+    with connection.cursor() as cursor:
+        cursor.execute(*statements[0])
+
+
+class KittenFacetCountManager(models.Manager):
+    def apply_deltas(self, deltas):
+        """Add ``{(breed, color, age bucket): kittens}`` to the stored counts in one upsert."""
+        rows = sorted((cell, delta) for cell, delta in deltas.items() if delta)  # Same lock order in every writer
+        if not rows:
+            return
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (breed, color, age_bucket, kittens) VALUES '
+                + ', '.join(['(%s, %s, %s, %s)'] * len(rows))
+                + f' ON CONFLICT (breed, color, age_bucket) DO UPDATE SET kittens = {table}.kittens + EXCLUDED.kittens',
+                [value for (breed, color, bucket), delta in rows for value in (breed, color, bucket, delta)],
+            )
+
+    def rebuild(self):
+        """Recount every cell from the kittens table; return the number of cells."""
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                # Writers wait until the new counts are in; their deltas then apply on top of them
+                cursor.execute(f'LOCK TABLE {connection.ops.quote_name(self.model._meta.db_table)} IN EXCLUSIVE MODE')
+            self.all().delete()
+            cells = (
+                Kitten.objects.order_by()
+                .values(cell_breed=Lower('breed'), cell_color=Lower('color'), cell_age=age_bucket_expression())
+                .annotate(kittens=Count('id'))
+            )
+            return len(self.bulk_create(
+                self.model(breed=cell['cell_breed'], color=cell['cell_color'], age_bucket=cell['cell_age'], kittens=cell['kittens'])
+                for cell in cells
+            ))
+
+
+class KittenFacetCount(models.Model):
+    """
+    Kittens per (lower-cased breed, lower-cased color, age bucket), for the
+    facet counts (kitten_app.facets).
+
+    The Kitten signals move kittens between cells as they are saved and
+    deleted, so the counts never need a scan of the kittens table.
+    ``rebuild_facets`` recounts them from scratch.
+    """
+    breed = models.CharField(max_length=100)
+    color = models.CharField(max_length=51)
+    age_bucket = models.SmallIntegerField()  # Index in AGE_BUCKETS
+    kittens = models.IntegerField(default=0)  # Cells whose kittens are all gone stay at 0 until a rebuild
+
+    objects = KittenFacetCountManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['breed', 'color', 'age_bucket'], name='kitten_facet_cell_uniq'),
+        ]
+
+
+def kitten_facet_deltas(kittens):
+    """``{cell: count}`` of new kittens, for ``KittenFacetCount.objects.apply_deltas()``."""
+    return Counter(kitten.facet_cell() for kitten in kittens)
+
+
+def _upsert(model, conflict, columns, rows):
+    """
+    ``(sql, params)`` inserting ``rows`` into ``model``'s table and adding
+    their ``columns`` to those of existing ``conflict`` rows, or None.
+    """
+    rows = sorted(rows)  # Same lock order in every writer
+    if not rows:
+        return None
+    table = connection.ops.quote_name(model._meta.db_table)
+    sql = (
+        f'INSERT INTO {table} ({", ".join(conflict + columns)}) VALUES '
+        + ', '.join(['(' + ', '.join(['%s'] * len(conflict + columns)) + ')'] * len(rows))
+        + f' ON CONFLICT ({", ".join(conflict)}) DO UPDATE SET '
+        + ', '.join(f'{column} = {table}.{column} + EXCLUDED.{column}' for column in columns)
+    )
+    return sql, [value for row in rows for value in row]
+
+
+def _lock_rating_stats():
+    # Writers wait until the new counts are in; their changes then apply on top of them
+    with connection.cursor() as cursor:
+        cursor.execute('LOCK TABLE {}, {} IN EXCLUSIVE MODE'.format(
+            *(connection.ops.quote_name(model._meta.db_table) for model in (KittenRatingHistogram, RatingDailyCount))))
+
+
+def _queued_rating_changes():
+    # Queued changes are already in the ratings table but not yet applied: a rebuild leaves them out
+    return [change for change in map(PendingRatingDelta.change, PendingRatingDelta.objects.all()) if change is not None]
+
+
+STARS = ('stars_1', 'stars_2', 'stars_3', 'stars_4', 'stars_5')
+
+
+class KittenRatingHistogramManager(models.Manager):
+    def rebuild(self):
+        """Recount every histogram and daily count from the ratings table; return the number of histograms."""
+        with transaction.atomic():
+            _lock_rating_stats()
+            self.all().delete()
+            RatingDailyCount.objects.all().delete()
+            histograms = Rating.objects.order_by().values('kitten').annotate(
+                **{name: Count('id', filter=models.Q(score=score)) for score, name in enumerate(STARS, 1)})
+            self.bulk_create(self.model(kitten_id=row['kitten'], **{name: row[name] for name in STARS}) for row in histograms)
+            days = Rating.objects.order_by().values('kitten', day=TruncDate('created_at')).annotate(
+                ratings=Count('id'), score_sum=Sum('score'))
+            RatingDailyCount.objects.bulk_create(
+                RatingDailyCount(kitten_id=row['kitten'], day=row['day'], ratings=row['ratings'], score_sum=row['score_sum'])
+                for row in days
+            )
+            # Take back what is still queued: the aggregation worker applies it later
+            queued = _queued_rating_changes()
+            apply_rating_stats([RatingChange(change.kitten_id, change.day, change.removed, change.added) for change in queued])
+            return self.count()
+
+
+class KittenRatingHistogram(models.Model):
+    """
+    A kitten's ratings per score, kept in step with every rating write, so
+    the rating stats never count the ratings table. Kittens nobody has
+    rated have no row.
+    """
+    kitten = models.OneToOneField(Kitten, primary_key=True, related_name='rating_histogram', on_delete=models.CASCADE)
+    stars_1 = models.IntegerField(default=0)
+    stars_2 = models.IntegerField(default=0)
+    stars_3 = models.IntegerField(default=0)
+    stars_4 = models.IntegerField(default=0)
+    stars_5 = models.IntegerField(default=0)
+
+    objects = KittenRatingHistogramManager()
+
+    def counts(self):
+        return [getattr(self, name) for name in STARS]
+
+
+class RatingDailyCount(models.Model):
+    """
+    A kitten's ratings created on one day (in TIME_ZONE) and the sum of
+    their current scores, for the rating trend. Rebuilt together with
+    KittenRatingHistogram.
+    """
+    kitten = models.ForeignKey(Kitten, related_name='rating_days', on_delete=models.CASCADE)
+    day = models.DateField()
+    ratings = models.IntegerField(default=0)
+    score_sum = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also the index a kitten's date range is read from
+            models.UniqueConstraint(fields=['kitten', 'day'], name='rating_day_kitten_uniq'),
+        ]
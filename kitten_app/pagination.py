@@ -0,0 +1,159 @@
+from base64 import b64decode, b64encode
+from collections import OrderedDict, namedtuple
+from urllib import parse
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+Cursor = namedtuple('Cursor', ['reverse', 'value', 'pk'])
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination keyed on the full (ordering field, id) pair.
+
+    DRF's CursorPagination only stores the first ordering field in the cursor
+    and skips ties with an OFFSET. Carrying the tiebreaker in the cursor
+    turns every page, however deep, into one range scan over a
+    (field, id) index.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-inserted_time'
+    tiebreaker = 'id'
+    rank_annotation = 'search_rank'  # Relevance set by KittenFilter's ?q=; the default order when present
+    truncated_annotation = 'search_truncated'  # Set with it: some matches were left unranked
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset()`` for async views, reading the page through the async ORM."""
+        return self.set_page([obj async for obj in self.page_queryset(queryset, request, view)])
+
+    def page_queryset(self, queryset, request, view=None):
+        """Decode the cursor and return the (unevaluated) query for one page plus a look-ahead row."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.keys = self.get_ordering(request, queryset, view)
+        self.model = queryset.model
+        self.annotations = queryset.query.annotations
+        self.cursor = self.decode_cursor(request)
+
+        reverse = self.cursor is not None and self.cursor.reverse
+        ordering = [self._flip(field) for field in self.keys] if reverse else list(self.keys)
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(self.seek(ordering, self.cursor))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        reverse = self.cursor is not None and self.cursor.reverse
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+        for backend in getattr(view, 'filter_backends', []):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+        if not ordering and self.rank_annotation in queryset.query.annotations:
+            field = '-' + self.rank_annotation  # Most relevant first
+        else:
+            field = ordering[0] if ordering else self.ordering
+        tiebreaker = '-' + self.tiebreaker if field.startswith('-') else self.tiebreaker
+        return (field, tiebreaker)
+
+    def seek(self, ordering, cursor):
+        """Condition selecting the rows that come after the cursor in ``ordering``."""
+        field = ordering[0].lstrip('-')
+        after = 'lt' if ordering[0].startswith('-') else 'gt'
+        # The leading inclusive bound is what lets the planner use a range scan
+        return Q(**{f'{field}__{after}e': cursor.value}) & (
+            Q(**{f'{field}__{after}': cursor.value}) |
+            Q(**{field: cursor.value, f'{self.tiebreaker}__{after}': cursor.pk})
+        )
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(Cursor(reverse=False, **self._position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(reverse=True, **self._position(self.page[0])))
+
+    def get_paginated_response(self, data):
+        body = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+        if self.truncated_annotation in self.annotations:
+            # The same in every row; a page without rows has nothing left out of it
+            body['truncated'] = bool(self.page) and getattr(self.page[0], self.truncated_annotation)
+        return Response(body)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            tokens = parse.parse_qs(b64decode(encoded.encode('ascii')).decode('ascii'), keep_blank_values=True)
+            field = self._key_field()
+            cursor = Cursor(
+                reverse=bool(int(tokens.get('r', ['0'])[0])),
+                value=field.to_python(tokens['p'][0]),
+                pk=int(tokens['i'][0]),
+            )
+            if cursor.value is None:
+                raise ValueError('Cursor without a position.')
+            return cursor
+        except (TypeError, ValueError, KeyError, IndexError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, cursor):
+        tokens = {'p': cursor.value, 'i': cursor.pk}
+        if cursor.reverse:
+            tokens['r'] = '1'
+        encoded = b64encode(parse.urlencode(tokens, doseq=True).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _key_field(self):
+        name = self.keys[0].lstrip('-')
+        if name in self.annotations:
+            return self.annotations[name].output_field
+        return self.model._meta.get_field(name)
+
+    def _position(self, instance):
+        name = self.keys[0].lstrip('-')
+        if name in self.annotations:
+            value = str(getattr(instance, name))  # repr() of a float round-trips exactly
+        else:
+            value = self.model._meta.get_field(name).value_to_string(instance)
+        return {'value': value, 'pk': getattr(instance, self.tiebreaker)}
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+
+class RatingPagination(KeysetPagination):
+    """Newest ratings first, over rating_kitten_created_idx or rating_user_created_idx."""
+    ordering = '-created_at'
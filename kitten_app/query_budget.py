@@ -0,0 +1,68 @@
+from contextlib import ExitStack
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+    """``connection.execute_wrapper`` hook counting the statements that go through it."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMixin:
+    """
+    Fail a request that runs more than ``query_budget`` SQL statements.
+
+    Only enforced when ``settings.QUERY_BUDGET_ENFORCED`` is on (DEBUG and the
+    test suite), so an N+1 regression shows up as an error instead of a slow page.
+    Async views are counted too. Connections belong to a thread, so their
+    wrappers are installed on the thread the async ORM runs queries on.
+    """
+    query_budget = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.query_budget is None or not getattr(settings, 'QUERY_BUDGET_ENFORCED', False):
+            return super().dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+            return self._adispatch(request, *args, **kwargs)
+
+        counter = QueryCounter()
+        with self._counting(counter):
+            response = super().dispatch(request, *args, **kwargs)
+        self._check_budget(counter, request)
+        return response
+
+    async def _adispatch(self, request, *args, **kwargs):
+        counter = QueryCounter()
+        stack = await sync_to_async(self._counting)(counter)
+        try:
+            response = await super().dispatch(request, *args, **kwargs)
+        finally:
+            await sync_to_async(stack.close)()
+        self._check_budget(counter, request)
+        return response
+
+    def _counting(self, counter):
+        stack = ExitStack()
+        # Reads may be routed to a replica, so count every alias
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(counter))
+        return stack
+
+    def _check_budget(self, counter, request):
+        if counter.count > self.query_budget:
+            raise QueryBudgetExceeded(
+                f'{type(self).__name__} ran {counter.count} queries for {request.method} '
+                f'{request.path}, its budget is {self.query_budget}.'
+            )
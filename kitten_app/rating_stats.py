@@ -0,0 +1,68 @@
+"""
+Rating statistics of one kitten: how many ratings of each score, their
+count and mean, and the ratings created per day and per week.
+
+Nothing here reads the ratings table. The histogram, and from it the count
+and mean, is one KittenRatingHistogram row, so a kitten with 100k ratings
+costs the same as one with ten. The trend reads one RatingDailyCount row per
+day with ratings in the requested range, through the (kitten, day) unique
+index. Both are kept in step with every rating write (see
+``record_rating_changes()``); under RATING_AGGREGATION=deferred they trail
+the votes like the kitten's aggregates do.
+"""
+import datetime
+
+from django.utils import timezone
+
+from .models import Kitten, KittenRatingHistogram, RatingDailyCount
+
+
+def _bucket(key, name, ratings, score_sum):
+    return {key: name, 'count': ratings, 'mean': score_sum / ratings if ratings else None}
+
+
+def rating_stats(kitten_id, days=30, weeks=12, today=None):
+    """
+    The stats of kitten ``kitten_id``, or None if there is no such kitten.
+
+    ``days`` and ``weeks`` are how far back the trend goes, today and the
+    current week (from Monday) included. Days are in TIME_ZONE, oldest first.
+    """
+    histogram = KittenRatingHistogram.objects.filter(kitten_id=kitten_id).first()
+    if histogram is None and not Kitten.objects.filter(pk=kitten_id).exists():
+        return None
+    counts = histogram.counts() if histogram is not None else [0] * 5
+    count = sum(counts)
+
+    today = today or timezone.localdate()
+    first_day = today - datetime.timedelta(days=days - 1)
+    first_week = today - datetime.timedelta(days=today.weekday(), weeks=weeks - 1)
+    daily = {
+        day: (ratings, score_sum)
+        for day, ratings, score_sum in RatingDailyCount.objects.filter(
+            kitten_id=kitten_id, day__gte=min(first_day, first_week), day__lte=today,
+        ).values_list('day', 'ratings', 'score_sum')
+    }
+
+    weekly = {}
+    for day, (ratings, score_sum) in daily.items():
+        if day >= first_week:
+            monday = day - datetime.timedelta(days=day.weekday())
+            totals = weekly.setdefault(monday, [0, 0])
+            totals[0] += ratings
+            totals[1] += score_sum
+
+    return {
+        'kitten_id': kitten_id,
+        'count': count,
+        'mean': sum(score * n for score, n in enumerate(counts, 1)) / count if count else None,
+        'histogram': {score: n for score, n in enumerate(counts, 1)},
+        'days': [
+            _bucket('day', day, *daily.get(day, (0, 0)))
+            for day in (first_day + datetime.timedelta(days=offset) for offset in range(days))
+        ],
+        'weeks': [
+            _bucket('week', monday, *weekly.get(monday, (0, 0)))
+            for monday in (first_week + datetime.timedelta(weeks=offset) for offset in range(weeks))
+        ],
+    }
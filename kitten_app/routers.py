@@ -0,0 +1,72 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Set for the rest of a request whose reads must see the primary's latest writes
+_reads_pinned = ContextVar('kitten_app_reads_pinned', default=False)
+
+# Cookie telling the next requests of a browser to read from the primary
+PIN_COOKIE = 'db_primary'
+
+
+def pin_reads():
+    """Send the remaining reads of the current request (or task) to the primary."""
+    _reads_pinned.set(True)
+
+
+def reads_pinned():
+    return _reads_pinned.get()
+
+
+@contextmanager
+def pinned_reads(pinned=True):
+    """Scope a request: reads start pinned or not, and ``pin_reads()`` calls inside do not leak out."""
+    token = _reads_pinned.set(pinned)
+    try:
+        yield
+    finally:
+        _reads_pinned.reset(token)
+
+
+def _user_pin_key(user_id):
+    return f'db-pin:user:{user_id}'
+
+
+def pin_user(user_id):
+    """Read from the primary for ``user_id`` during the next DB_REPLICA_STICKY_SECONDS."""
+    cache.set(_user_pin_key(user_id), True, settings.DB_REPLICA_STICKY_SECONDS)
+
+
+def user_pinned(user_id):
+    return cache.get(_user_pin_key(user_id), False)
+
+
+async def auser_pinned(user_id):
+    return await cache.aget(_user_pin_key(user_id), False)
+
+
+class PrimaryReplicaRouter:
+    """
+    Reads go to a random alias in settings.DATABASE_REPLICAS, writes to the primary.
+
+    Reads stay on the primary while they are pinned (see
+    kitten_app.middleware.ReplicaPinningMiddleware) and inside a transaction
+    on the primary, which must see its own uncommitted rows.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or reads_pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same rows
+        return True
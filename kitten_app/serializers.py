@@ -1,15 +1,36 @@
 
 import re
 from rest_framework import serializers
-from .models import Kitten, Rating
+from .instrumentation import timed
+from .models import Kitten, Rating, validate_rating
 from django.contrib.auth.models import User
 
-class KittenSerializer(serializers.ModelSerializer):
+class TimedSerializerMixin:
+    """Count the time spent building ``.data`` towards the request's ``serialize`` timing."""
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
+
+class KittenSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     average_rating = serializers.FloatField(read_only=True)
     owner = serializers.ReadOnlyField(source='owner.username')  # Make owner read-only
     class Meta:
         model = Kitten
-        fields = '__all__'
+        exclude = ['search_vector']
+        list_serializer_class = TimedListSerializer
+        read_only_fields = ['rating_sum', 'rating_count', 'weighted_rating']
+
+    def __init__(self, *args, fields=None, **kwargs):
+        # fields: names to keep (?fields=/?exclude=, see kitten_app.fieldsets); the others are dropped
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields).difference(fields):
+                self.fields.pop(name)
 
     def validate_breed(self, value):
         if len(value) < 2:
@@ -39,24 +60,29 @@ class KittenSerializer(serializers.ModelSerializer):
             print(f"Error occurred: {e}", flush=True)
 
 
-class RatingSerializer(serializers.ModelSerializer):
+class RatingSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Rating
         fields = ['id', 'user', 'kitten', 'score', 'created_at']
+        list_serializer_class = TimedListSerializer
         read_only_fields = ['id', 'user','kitten', 'created_at']
 
     def create(self, validated_data):
-        rating = Rating.objects.create(**validated_data)
-        rating.kitten.update_average_rating()  # Update the kitten's average rating on create
-        return rating
+        # Rating.save() applies the score to the kitten's stored aggregates
+        return Rating.objects.create(**validated_data)
 
     def update(self, instance, validated_data):
         instance.score = validated_data.get('score', instance.score)
         instance.save()
-        instance.kitten.update_average_rating()  # Update the kitten's average rating on update
         return instance
 
 
+class RatingBatchItemSerializer(serializers.Serializer):
+    """One ``{kitten_id, score}`` entry of a judge's batch (see kitten_app.bulk.rate_kittens)."""
+    kitten_id = serializers.IntegerField()
+    score = serializers.IntegerField(validators=[validate_rating])
+
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, min_length=6)
 
@@ -0,0 +1,69 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .authentication import user_cache
+from .cache import invalidate_facets, invalidate_kitten_lists
+from .models import Kitten, KittenFacetCount
+
+FACET_FIELDS = frozenset({'breed', 'color', 'age_months'})
+
+
+@receiver(post_save, sender=Kitten)
+@receiver(post_delete, sender=Kitten)
+def kitten_changed(sender, instance, **kwargs):
+    # Signals (rather than overriding save/delete) also see cascade deletes from User
+    invalidate_facets()
+    invalidate_kitten_lists()
+
+
+def _moves_facets(update_fields):
+    return update_fields is None or not FACET_FIELDS.isdisjoint(update_fields)
+
+
+def _locked_cell(pk):
+    """The stored facet cell of kitten ``pk``, locking its row until the transaction ends; None if it is gone."""
+    stored = Kitten.objects.select_for_update().filter(pk=pk).values_list('breed', 'color', 'age_months').first()
+    return None if stored is None else Kitten(breed=stored[0], color=stored[1], age_months=stored[2]).facet_cell()
+
+
+# The cell a kitten leaves is read under a row lock inside the save's or delete's transaction
+# (Kitten.save() and the deletion collector both open one), never taken from the instance as it
+# was loaded: two concurrent edits would both leave the same cell, and the second one would
+# subtract from a cell the kitten already left.
+@receiver(pre_save, sender=Kitten)
+def kitten_saving(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is not None and _moves_facets(update_fields):
+        instance._stored_cell = _locked_cell(instance.pk)
+
+
+@receiver(post_save, sender=Kitten)
+def kitten_saved(sender, instance, created, update_fields=None, **kwargs):
+    if not _moves_facets(update_fields):
+        return
+    cell = instance.facet_cell()
+    stored = None if created else instance.__dict__.pop('_stored_cell', None)
+    if stored != cell:
+        deltas = {cell: 1}
+        if stored is not None:
+            deltas[stored] = -1
+        KittenFacetCount.objects.apply_deltas(deltas)
+
+
+@receiver(pre_delete, sender=Kitten)
+def kitten_deleting(sender, instance, **kwargs):
+    instance._stored_cell = _locked_cell(instance.pk)
+
+
+@receiver(post_delete, sender=Kitten)
+def kitten_deleted(sender, instance, **kwargs):
+    stored = instance.__dict__.pop('_stored_cell', None)
+    if stored is not None:  # None: a concurrent delete got there first
+        KittenFacetCount.objects.apply_deltas({stored: -1})
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    # Deactivated or deleted users must not stay authenticated from the cache
+    user_cache.discard(instance.pk)
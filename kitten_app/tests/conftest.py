@@ -0,0 +1,51 @@
+import pytest
+from django.core.cache import cache
+
+from kitten_app import metrics
+from kitten_app.authentication import revoked_tokens, user_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # The local-memory and per-process caches outlive each test's database rollback
+    cache.clear()
+    user_cache.clear()
+    revoked_tokens.clear()
+    yield
+    cache.clear()
+    user_cache.clear()
+    revoked_tokens.clear()
+
+
+@pytest.fixture(autouse=True)
+def metrics_store(tmp_path_factory):
+    # Requests and rating writes count into a directory of the test's own, not METRICS_DIR
+    previous, metrics.store = metrics.store, metrics.MetricStore(str(tmp_path_factory.mktemp('metrics')))
+    yield metrics.store
+    metrics.store.close()
+    metrics.store = previous
+
+
+@pytest.fixture(autouse=True)
+def enforce_query_budgets(settings):
+    # The test runner forces DEBUG off; keep the per-view query budgets checked
+    settings.QUERY_BUDGET_ENFORCED = True
+
+
+@pytest.fixture(autouse=True)
+def primary_only(settings):
+    # Tests run against the primary's test database; replica tests opt back in
+    settings.DATABASE_REPLICAS = []
+
+
+@pytest.fixture
+def query_budget(django_assert_max_num_queries):
+    """
+    Assert a block stays within a view's declared budget::
+
+        with query_budget(KittenListCreateView):
+            client.get(reverse('kitten-list'))
+    """
+    def _query_budget(view):
+        return django_assert_max_num_queries(view.query_budget)
+    return _query_budget
@@ -0,0 +1,142 @@
+# kitten_app/tests/test_async_views.py
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework.throttling import BaseThrottle
+from rest_framework_simplejwt.tokens import AccessToken
+from kitten_app.async_views import AsyncKittenDetailView, AsyncKittenListView
+from kitten_app.authentication import revoke_token
+from kitten_app.models import Kitten, Rating
+from kitten_app.query_budget import QueryBudgetExceeded
+
+@pytest.mark.django_db
+class TestAsyncReadViews:
+    @pytest.fixture
+    def user(self):
+        return get_user_model().objects.create_user(username='testuser', password='testpassword')
+
+    @pytest.fixture
+    def token(self, user):
+        return AccessToken.for_user(user)
+
+    @pytest.fixture
+    def kittens(self, user):
+        return [
+            Kitten.objects.create(name=f'Kitten {i}', age_months=i + 1, breed=['Persian', 'Siamese'][i % 2],
+                                  color='White', description='Calm', owner=user)
+            for i in range(5)
+        ]
+
+    def get(self, token, name, *args, data=None, **headers):
+        if token is not None:
+            headers['Authorization'] = f'Bearer {token}'
+        return async_to_sync(AsyncClient().get)(reverse(name, args=args), data, headers=headers)
+
+    def sync_get(self, token, name, *args, data=None):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client.get(reverse(name, args=args), data)
+
+    @pytest.mark.parametrize('name, data', [
+        ('kitten-list', None),
+        ('kitten-list', {'breed': 'persian', 'page_size': 2}),
+        ('kitten-list', {'ordering': 'inserted_time', 'page_size': 2}),
+        ('kitten-list', {'fields': 'name,owner', 'page_size': 2}),
+    ])
+    def test_list_matches_sync_view(self, token, kittens, name, data):
+        response = self.get(token, 'async-' + name, data=data)
+        assert response.status_code == status.HTTP_200_OK
+        # Byte-identical apart from the cursor links pointing back at the async URL
+        assert response.content.replace(b'/api/async/', b'/api/') == self.sync_get(token, name, data=data).content
+
+    def test_list_follows_cursor(self, token, kittens):
+        first = self.get(token, 'async-kitten-list', data={'page_size': 3}).json()
+        second = async_to_sync(AsyncClient().get)(first['next'], headers={'Authorization': f'Bearer {token}'}).json()
+
+        names = [k['name'] for k in first['results'] + second['results']]
+        assert names == [k.name for k in reversed(kittens)]
+        assert second['next'] is None
+
+    def test_detail_and_ratings_match_sync_views(self, token, kittens):
+        voter = get_user_model().objects.create_user(username='voter', password='testpassword')
+        Rating.objects.create(user=voter, kitten=kittens[0], score=4)
+
+        for name, args in [('kitten-detail', [kittens[0].pk]), ('rating-view', [kittens[0].pk])]:
+            response = self.get(token, 'async-' + name, *args)
+            assert response.status_code == status.HTTP_200_OK
+            assert response.content == self.sync_get(token, name, *args).content
+        other = get_user_model().objects.create_user(username='other', password='testpassword')
+        Rating.objects.create(user=other, kitten=kittens[0], score=2)
+        paged = {'page_size': 1}
+        response = self.get(token, 'async-rating-view', kittens[0].pk, data=paged)
+        assert response.json()['next'] is not None
+        assert response.content.replace(b'/api/async/', b'/api/') == self.sync_get(token, 'rating-view', kittens[0].pk, data=paged).content
+        sparse = {'exclude': 'description,owner'}
+        response = self.get(token, 'async-kitten-detail', kittens[0].pk, data=sparse)
+        assert response.content == self.sync_get(token, 'kitten-detail', kittens[0].pk, data=sparse).content
+
+    def test_detail_and_ratings_share_validators_with_sync_views(self, token, kittens):
+        for name, args in [('kitten-detail', [kittens[0].pk]), ('rating-view', [kittens[0].pk])]:
+            etag = self.sync_get(token, name, *args)['ETag']
+            response = self.get(token, 'async-' + name, *args, **{'If-None-Match': etag})
+            assert response.status_code == status.HTTP_304_NOT_MODIFIED
+            assert response['ETag'] == etag
+
+    def test_missing_kitten_is_404(self, token):
+        response = self.get(token, 'async-kitten-detail', 999)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json() == {'detail': 'No Kitten matches the given query.'}
+
+    def test_requires_valid_token(self, token, kittens):
+        assert self.get(None, 'async-kitten-list').status_code == status.HTTP_401_UNAUTHORIZED
+        assert self.get('not-a-token', 'async-kitten-list').status_code == status.HTTP_401_UNAUTHORIZED
+
+        revoke_token(token)
+        response = self.get(token, 'async-kitten-detail', kittens[0].pk)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert response['WWW-Authenticate'].startswith('Bearer')
+
+    def test_list_pages_are_cached_until_a_kitten_changes(self, token, user, kittens, settings, django_assert_num_queries):
+        settings.KITTEN_LIST_CACHE_TIMEOUT = 60  # Not the default 2 s, which a slow run could outlast
+        self.get(token, 'async-kitten-list')
+        with django_assert_num_queries(0):
+            assert self.get(token, 'async-kitten-list').json()['results'][0]['name'] == 'Kitten 4'
+
+        Kitten.objects.create(name='Tom', age_months=3, breed='Siamese', color='Black', owner=user)
+        assert self.get(token, 'async-kitten-list').json()['results'][0]['name'] == 'Tom'
+
+    def test_query_budget_is_enforced(self, token, kittens, monkeypatch):
+        monkeypatch.setattr(AsyncKittenDetailView, 'query_budget', 1)
+
+        with pytest.raises(QueryBudgetExceeded):
+            self.get(token, 'async-kitten-detail', kittens[0].pk)
+
+    def test_throttles_apply(self, token, kittens, monkeypatch):
+        class Closed(BaseThrottle):
+            def allow_request(self, request, view):
+                return False
+
+            def wait(self):
+                return 30
+
+        monkeypatch.setattr(AsyncKittenListView, 'throttle_classes', [Closed])
+        response = self.get(token, 'async-kitten-list')
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert response['Retry-After'] == '30'
+
+    def test_rejects_writes(self, token):
+        response = async_to_sync(AsyncClient().post)(
+            reverse('async-kitten-list'), {}, headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == status.HTTP_405_METHOD_NOT_ALLOWED
+
+    def test_facets_share_cache_and_etag(self, kittens):
+        response = self.get(None, 'async-kitten-breeds')
+        assert response.json() == ['persian', 'siamese']
+        assert response['ETag'] == APIClient().get(reverse('kitten-breeds'))['ETag']
+
+        not_modified = self.get(None, 'async-kitten-breeds', **{'If-None-Match': response['ETag']})
+        assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
@@ -1,9 +1,13 @@
+import datetime
 import pytest
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from kitten_app.authentication import revoked_tokens
 
 
 @pytest.mark.django_db
@@ -73,3 +77,89 @@ class TestAuthViews:
         # Assert
         assert response.status_code == status.HTTP_400_BAD_REQUEST
         assert 'error' in response.data
+
+    @pytest.fixture
+    def tokens(self, api_client, create_user):
+        create_user()
+        response = api_client.post(reverse('token_obtain_pair'), {
+            'username': 'testuser',
+            'password': 'password123',
+        }, format='json')
+        return response.data
+
+    def test_warm_token_needs_no_auth_queries(self, api_client, tokens, django_assert_num_queries):
+        api_client.credentials(HTTP_AUTHORIZATION='Bearer ' + tokens['access'])
+        api_client.get(reverse('kitten-list'))
+
+        with django_assert_num_queries(1):  # Only the kitten page itself (another one, the first is cached now)
+            response = api_client.get(reverse('kitten-list'), {'page_size': 5})
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_logout_revokes_access_and_refresh_tokens(self, api_client, tokens):
+        api_client.credentials(HTTP_AUTHORIZATION='Bearer ' + tokens['access'])
+        response = api_client.post(reverse('logout'), {'refresh_token': tokens['refresh']}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+
+        assert api_client.get(reverse('kitten-list')).status_code == status.HTTP_401_UNAUTHORIZED
+        api_client.credentials()
+        response = api_client.post(reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json')
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_rotated_refresh_token_is_rejected(self, api_client, tokens):
+        response = api_client.post(reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        response = api_client.post(reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json')
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_deactivated_user_is_dropped_from_cache(self, api_client, tokens):
+        api_client.credentials(HTTP_AUTHORIZATION='Bearer ' + tokens['access'])
+        assert api_client.get(reverse('kitten-list')).status_code == status.HTTP_200_OK
+
+        user = User.objects.get(username='testuser')
+        user.is_active = False
+        user.save()
+        assert api_client.get(reverse('kitten-list')).status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+class TestRevokedTokens:
+
+    def blacklist(self, jti, expires_in, **fields):
+        outstanding = OutstandingToken.objects.create(jti=jti, token='', expires_at=timezone.now() + datetime.timedelta(seconds=expires_in))
+        BlacklistedToken.objects.create(token=outstanding, **fields)
+        revoked_tokens.add(jti, outstanding.expires_at)  # What the revoking process does
+
+    def test_sync_sees_rows_committed_out_of_id_order(self, settings):
+        settings.AUTH_REVOCATION_CHECK_INTERVAL = 0
+        self.blacklist('later-id', 300, id=10_000)
+        assert 'later-id' in revoked_tokens
+
+        # Another process committed a lower id after this one synced past 10000
+        revoked_tokens.clear()
+        assert 'later-id' in revoked_tokens
+        self.blacklist('earlier-id', 300)
+        revoked_tokens._jtis.pop('earlier-id')  # Only the version bump reached this process
+        assert 'earlier-id' in revoked_tokens
+
+    def test_expired_tokens_are_pruned(self, settings):
+        settings.AUTH_REVOCATION_CHECK_INTERVAL = 0
+        self.blacklist('expired', -1)
+        self.blacklist('live', 300)
+        assert 'live' in revoked_tokens
+        assert 'expired' not in revoked_tokens._jtis
+
+    def test_sync_reads_only_rows_blacklisted_since_the_last_one(self, settings, django_assert_num_queries):
+        settings.AUTH_REVOCATION_CHECK_INTERVAL = 0
+        settings.AUTH_REVOCATION_SYNC_OVERLAP = 30
+        self.blacklist('old', 300)
+        assert 'old' in revoked_tokens
+        BlacklistedToken.objects.update(blacklisted_at=timezone.now() - datetime.timedelta(minutes=5))
+        revoked_tokens._synced_at = timezone.now()
+
+        # Committed late: stamped before the last sync, but within the overlap
+        self.blacklist('late', 300)
+        BlacklistedToken.objects.filter(token__jti='late').update(blacklisted_at=timezone.now() - datetime.timedelta(seconds=10))
+        revoked_tokens._jtis.clear()  # Only the version bump reached this process
+        with django_assert_num_queries(1):
+            assert 'late' in revoked_tokens
+        assert 'old' not in revoked_tokens._jtis  # Not read again
@@ -0,0 +1,57 @@
+import pytest
+from kitten_app.benchmark import datagen, imports, runner
+from kitten_app.models import Kitten, Rating
+
+@pytest.mark.django_db
+class TestBenchmark:
+    @pytest.fixture
+    def dataset(self):
+        return datagen.generate(users=20, kittens=30, ratings=100, voters=3, seed=1)
+
+    def test_generated_data_is_skewed_and_consistent(self, dataset):
+        assert Kitten.objects.count() == 30
+        assert Rating.objects.count() == 100
+        assert not Kitten.objects.rating_drift().exists()
+        # The Zipf head collects far more votes than an average kitten
+        assert dataset.kittens[0].ratings.count() > 100 / 30 * 2
+
+    def test_run_reports_latency_and_queries(self, dataset):
+        report = runner.run(dataset, requests=6, concurrency=1,
+                            only=['kitten-list', 'kitten-detail', 'rating-create', 'rating-update'])
+
+        assert set(report) == {'kitten-list', 'kitten-detail', 'rating-create', 'rating-update'}
+        for stats in report.values():
+            assert stats['requests'] == 6
+            assert stats['errors'] == 0
+            assert 0 < stats['p50_ms'] <= stats['p95_ms'] <= stats['p99_ms']
+            assert stats['queries_per_request'] >= 1
+
+    def test_compare_flags_regressions(self):
+        baseline = {'kitten-list': {'p95_ms': 10.0, 'requests_per_second': 100.0, 'queries_per_request': 2.0, 'errors': 0}}
+        same = {'kitten-list': dict(baseline['kitten-list'], p95_ms=11.0)}
+        slower = {'kitten-list': dict(baseline['kitten-list'], p95_ms=20.0, queries_per_request=12.0)}
+
+        assert runner.compare(same, baseline, tolerance=0.2) == []
+        assert len(runner.compare(slower, baseline, tolerance=0.2)) == 2
+
+    def test_asgi_scenarios_are_compared_with_wsgi(self, dataset):
+        # Worker threads would not see this test's transaction; the event loop stays on this thread
+        report = runner.run(dataset, requests=4, concurrency=1, only=['kitten-list'])
+        report.update(runner.run(dataset, requests=4, concurrency=2, only=['kitten-list-asgi']))
+
+        assert report['kitten-list-asgi']['errors'] == 0
+        assert report['kitten-list-asgi']['queries_per_request'] > 0  # Two identical requests in flight share a build
+        assert set(runner.asgi_speedup(report)) == {'kitten-list'}
+
+    def test_both_paths_run_uncached(self, dataset):
+        # Three rounds of the 20 owners, so the auth caches are warm for most requests
+        report = runner.run(dataset, requests=60, concurrency=1, only=['kitten-list', 'kitten-list-asgi', 'rating-list'])
+
+        # Each scenario repeats one page; from the cache, all but the first request would run no page query
+        for stats in report.values():
+            assert stats['queries_per_request'] >= 1
+
+    def test_import_throughput_leaves_no_kittens(self):
+        report = imports.import_throughput(rows=50, rounds=1)
+        assert report['rows'] == 50 and report['rows_per_second'] > 0
+        assert not Kitten.objects.exists()
@@ -0,0 +1,62 @@
+# kitten_app/tests/test_db.py
+import sys
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from kitten_app.checks import check_connection_mode, check_database_connection
+from kitten_app.db import pool_stats
+
+class TestConnectionChecks:
+    @override_settings(DB_CONN_MODE='bogus')
+    def test_unknown_mode(self):
+        assert [e.id for e in check_connection_mode(None)] == ['kitten_app.E001']
+
+    @override_settings(DB_CONN_MODE='pool')
+    def test_pool_needs_psycopg_pool(self, monkeypatch):
+        monkeypatch.setitem(sys.modules, 'psycopg_pool', None)
+        assert [e.id for e in check_connection_mode(None)] == ['kitten_app.E002']
+
+    @pytest.mark.django_db
+    def test_database_reachable(self):
+        assert check_database_connection(None, databases=['default']) == []
+
+
+@pytest.mark.django_db
+class TestDatabaseStats:
+    def client_for(self, **fields):
+        user = get_user_model().objects.create_user(username='someone', password='testpassword', **fields)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        return client
+
+    def test_staff_only(self):
+        assert self.client_for().get(reverse('db-stats')).status_code == status.HTTP_403_FORBIDDEN
+
+    def test_reports_connection_mode(self, settings):
+        response = self.client_for(is_staff=True).get(reverse('db-stats'))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['mode'] == settings.DB_CONN_MODE
+        assert response.data['connections_opened'] >= 0
+
+    def test_pool_counters(self):
+        psycopg_pool = pytest.importorskip('psycopg_pool')
+        if connection.vendor != 'postgresql' or connection.Database.__name__ != 'psycopg':
+            pytest.skip('Pooling needs psycopg 3')
+
+        params = {**connection.get_connection_params(), 'autocommit': True}
+        with psycopg_pool.ConnectionPool(kwargs=params, min_size=1, max_size=1) as pool:
+            for _ in range(3):
+                with pool.connection() as conn:
+                    conn.execute('SELECT 1')
+            stats = pool_stats(pool)
+
+        assert stats['checkouts'] == 3
+        assert stats['max_size'] == 1
+        assert stats['sessions_opened'] == 1
+        assert stats['timeouts'] == 0
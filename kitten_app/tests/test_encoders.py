@@ -0,0 +1,88 @@
+# kitten_app/tests/test_encoders.py
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from kitten_app.benchmark import serialization
+from kitten_app.encoders import RowEncoder, kitten_encoder, rating_encoder
+from kitten_app.models import Kitten, Rating
+from kitten_app.serializers import KittenSerializer, RatingSerializer
+
+def render(data):
+    return JSONRenderer().render(data)
+
+@pytest.mark.django_db
+class TestRowEncoders:
+    @pytest.fixture
+    def user(self):
+        return get_user_model().objects.create_user(username='testuser', password='testpassword')
+
+    @pytest.fixture
+    def client(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        return client
+
+    @pytest.fixture
+    def kittens(self, user):
+        kittens = [Kitten.objects.create(name=f'Kitten {i}', age_months=i + 1, breed='Persian', color='White', owner=user,
+                                         description='A fluffy kitten "with quotes" ü' if i % 2 else '')
+                   for i in range(5)]
+        for score, kitten in zip([5, 3], kittens):
+            Rating.objects.create(user=user, kitten=kitten, score=score)
+        return kittens
+
+    def test_kitten_rows_render_like_the_serializer(self, kittens):
+        queryset = Kitten.objects.select_related('owner').order_by('-inserted_time', '-id')
+        assert render(kitten_encoder.encode(kitten_encoder.rows(queryset))) == \
+            render(KittenSerializer(queryset, many=True).data)
+        with timezone.override('Asia/Kolkata'):  # Offsets other than Z
+            assert render(kitten_encoder.encode(kitten_encoder.rows(queryset))) == \
+                render(KittenSerializer(queryset, many=True).data)
+
+    def test_rating_rows_render_like_the_serializer(self, kittens):
+        queryset = Rating.objects.order_by('id')
+        assert render(rating_encoder.encode(rating_encoder.rows(queryset))) == \
+            render(RatingSerializer(queryset, many=True).data)
+
+    def test_list_pages_match_the_serializer(self, client, kittens):
+        def expected(ids):
+            # The list leaves out description unless asked for it
+            fields = [name for name in kitten_encoder.names if name != 'description']
+            return render([KittenSerializer(Kitten.objects.get(pk=pk), fields=fields).data for pk in ids])
+
+        first = client.get(reverse('kitten-list'), {'page_size': 3})
+        # The cursor is read from the rows' inserted_time and id
+        second = client.get(first.data['next'])
+        ids = [kitten['id'] for kitten in first.data['results'] + second.data['results']]
+        assert ids == [kitten.id for kitten in reversed(kittens)]
+        assert render(first.data['results']) == expected(ids[:3])
+        assert render(second.data['results']) == expected(ids[3:])
+
+        # Searches carry search_rank along, without rendering it
+        found = client.get(reverse('kitten-list'), {'q': 'fluffy', 'page_size': 1})
+        ranked = client.get(found.data['next'])
+        ids = [kitten['id'] for kitten in found.data['results'] + ranked.data['results']]
+        assert sorted(ids) == [kittens[1].id, kittens[3].id]
+        assert render(found.data['results'] + ranked.data['results']) == expected(ids)
+
+    def test_unknown_fields_are_refused_up_front(self):
+        class EmailSerializer(serializers.ModelSerializer):
+            address = serializers.EmailField(source='email')
+
+            class Meta:
+                model = get_user_model()
+                fields = ['id', 'address']
+
+        with pytest.raises(ImproperlyConfigured):
+            RowEncoder(EmailSerializer)
+
+    def test_benchmark_reports_both_paths(self, kittens):
+        report = serialization.encode_throughput(rounds=1)
+        assert report['rows'] == 5
+        assert report['serializer_rows_per_second'] > 0 and report['encoder_rows_per_second'] > 0
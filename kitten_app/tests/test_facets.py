@@ -0,0 +1,126 @@
+# kitten_app/tests/test_facets.py
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from kitten_app.models import Kitten, KittenFacetCount
+from kitten_app.views import KittenFacetsView
+
+def counts(facet):
+    return {entry['value']: entry['count'] for entry in facet if entry['count']}
+
+def stored_cells():
+    return {(cell.breed, cell.color, cell.age_bucket): cell.kittens
+            for cell in KittenFacetCount.objects.filter(kittens__gt=0)}
+
+def live_cells():
+    cells = {}
+    for kitten in Kitten.objects.all():
+        cells[kitten.facet_cell()] = cells.get(kitten.facet_cell(), 0) + 1
+    return cells
+
+@pytest.mark.django_db
+class TestKittenFacets:
+    @pytest.fixture
+    def user(self):
+        return get_user_model().objects.create_user(username='testuser', password='testpassword')
+
+    @pytest.fixture
+    def client(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        return client
+
+    @pytest.fixture
+    def kittens(self, user):
+        rows = [('Persian', 'White', 2), ('persian', 'Black', 5), ('Persian', 'white', 14),
+                ('Siamese', 'White', 3), ('Siamese', 'Cream', 30), ('Maine Coon', 'Black', 8)]
+        return [Kitten.objects.create(name=f'Kitten {i}', breed=breed, color=color, age_months=age, owner=user,
+                                      description='A fluffy kitten' if breed == 'Siamese' else 'A calm kitten')
+                for i, (breed, color, age) in enumerate(rows)]
+
+    def test_counts_without_filters(self, client, kittens, query_budget):
+        with query_budget(KittenFacetsView):
+            response = client.get(reverse('kitten-facets'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['count'] == 6
+        assert response.data['breed'] == [{'value': 'persian', 'count': 3}, {'value': 'siamese', 'count': 2},
+                                          {'value': 'maine coon', 'count': 1}]
+        assert counts(response.data['color']) == {'white': 3, 'black': 2, 'cream': 1}
+        assert [(age['value'], age['count']) for age in response.data['age']] == \
+            [('0-3', 2), ('4-6', 1), ('7-12', 1), ('13-24', 1), ('25+', 1)]
+
+    def test_each_facet_is_narrowed_by_the_other_filters(self, client, kittens):
+        response = client.get(reverse('kitten-facets'), {'breed': 'Persian', 'min_age': 0, 'max_age': 6})
+
+        assert response.data['count'] == 2
+        # Every breed stays listed, counted within the age range
+        assert counts(response.data['breed']) == {'persian': 2, 'siamese': 1}
+        assert counts(response.data['color']) == {'white': 1, 'black': 1}
+        # The age facet ignores its own range
+        assert counts(response.data['age']) == {'0-3': 1, '4-6': 1, '13-24': 1}
+
+    def test_bucket_aligned_filters_never_read_the_kittens(self, client, kittens):
+        with CaptureQueriesContext(connection) as captured:
+            client.get(reverse('kitten-facets'), {'breed': 'persian', 'color': 'white', 'min_age': 13})
+        assert not any('"kitten_app_kitten"' in query['sql'] for query in captured)
+
+    def test_search_and_unaligned_ages_are_counted_from_the_kittens(self, client, kittens):
+        response = client.get(reverse('kitten-facets'), {'q': 'fluffy'})
+        assert response.data['count'] == 2
+        assert counts(response.data['breed']) == {'siamese': 2}
+
+        response = client.get(reverse('kitten-facets'), {'min_age': 4, 'max_age': 10})
+        assert response.data['count'] == 2
+        assert counts(response.data['age']) == {'4-6': 1, '7-12': 1}
+        assert counts(response.data['breed']) == {'persian': 1, 'maine coon': 1}
+
+    def test_invalid_filters(self, client):
+        response = client.get(reverse('kitten-facets'), {'min_age': 'old'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'min_age' in response.data
+
+    def test_counts_follow_writes(self, client, user, kittens):
+        client.patch(reverse('kitten-detail', args=[kittens[0].pk]), {'breed': 'Siamese', 'age_months': 20}, format='json')
+        client.delete(reverse('kitten-detail', args=[kittens[1].pk]))
+        kitten = Kitten.objects.get(pk=kittens[3].pk)
+        kitten.color = 'CREAM'
+        kitten.save(update_fields=['color'])
+        Kitten(pk=kittens[4].pk, name='Renamed', breed='Bengal', color='Cream', age_months=30, owner=user, description='',
+               inserted_time=kittens[4].inserted_time).save()  # Not loaded from the database: the old cell is looked up
+        client.post(reverse('kitten-bulk'), '{"name": "Imported", "breed": "Bengal", "color": "Grey", "age_months": 1, "description": ""}\n',
+                    content_type='application/x-ndjson')
+        assert stored_cells() == live_cells()
+
+        # Deleting the owner cascades to their kittens
+        user.delete()
+        assert stored_cells() == {}
+
+    def test_stale_instances_leave_the_cell_the_kitten_is_in(self, kittens):
+        # Both loaded before either saved, like two concurrent PATCHes or DELETEs
+        first, second = Kitten.objects.get(pk=kittens[0].pk), Kitten.objects.get(pk=kittens[0].pk)
+        first.breed = 'Siamese'
+        first.save()
+        second.breed = 'Bengal'
+        second.save()
+        assert stored_cells() == live_cells()
+        assert not KittenFacetCount.objects.filter(kittens__lt=0).exists()
+
+        first, second = Kitten.objects.get(pk=kittens[1].pk), Kitten.objects.get(pk=kittens[1].pk)
+        first.delete()
+        second.delete()
+        assert stored_cells() == live_cells()
+        assert not KittenFacetCount.objects.filter(kittens__lt=0).exists()
+
+    def test_rebuild_command_repairs_drift(self, kittens):
+        KittenFacetCount.objects.filter(breed='persian').update(kittens=99)
+        KittenFacetCount.objects.create(breed='ghost', color='grey', age_bucket=0, kittens=3)
+
+        call_command('rebuild_facets')
+        assert stored_cells() == live_cells()
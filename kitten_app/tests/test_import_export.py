@@ -0,0 +1,159 @@
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+from kitten_app.bulk import KittenCopy, import_kittens
+from kitten_app.models import Kitten
+
+@pytest.mark.django_db
+class TestBulkImport:
+    @pytest.fixture
+    def client(self):
+        return APIClient()
+
+    @pytest.fixture
+    def user(self):
+        User = get_user_model()
+        return User.objects.create_user(username='breeder', password='testpassword')
+
+    @pytest.fixture
+    def jwt_token(self, client, user):
+        response = client.post(reverse('token_obtain_pair'), {
+            'username': 'breeder',
+            'password': 'testpassword'
+        })
+        return response.data['access']
+
+    def test_import_json_lines(self, client, jwt_token, user):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        rows = [
+            {'name': f'Kitten {i}', 'breed': 'Maine Coon', 'color': 'Grey', 'age_months': i, 'description': 'Fluffy'}
+            for i in range(5)
+        ]
+        rows.insert(2, {'name': 'Bad', 'breed': 'M41ne', 'color': 'Grey', 'age_months': -1, 'description': 'x'})
+        body = '\n'.join(json.dumps(row) for row in rows) + '\n{not json\n'
+
+        response = client.post(reverse('kitten-bulk') + '?batch_size=2', body, content_type='application/x-ndjson')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['created'] == 5
+        assert [error['row'] for error in response.data['errors']] == [3, 7]
+        assert set(response.data['errors'][0]['errors']) == {'breed', 'age_months'}
+        assert Kitten.objects.filter(owner=user).count() == 5
+
+    def test_import_csv(self, client, jwt_token, user):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        body = (
+            'name,breed,color,age_months,description\n'
+            'Tom,Siamese,Cream,4,"Loud, friendly"\n'
+            'Felix,Bengal,Spotted,,Missing age\n'
+        )
+
+        response = client.post(reverse('kitten-bulk'), body, content_type='text/csv')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['created'] == 1
+        assert response.data['errors'] == [{'row': 3, 'errors': {'age_months': ['This field is required.']}}]
+        assert Kitten.objects.get(owner=user).description == 'Loud, friendly'
+
+    def test_import_rejects_unknown_content_type(self, client, jwt_token):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        response = client.post(reverse('kitten-bulk'), '<kittens/>', content_type='application/xml')
+        assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+
+    def test_import_kittens_command(self, user, tmp_path):
+        path = tmp_path / 'kittens.csv'
+        path.write_text('name,breed,color,age_months,description\nTom,Siamese,Cream,4,Calm\nLeo,Bengal,Gold,3,Quick\n')
+
+        call_command('import_kittens', str(path), owner='breeder', batch_size=1)
+
+        assert sorted(Kitten.objects.filter(owner=user).values_list('name', flat=True)) == ['Leo', 'Tom']
+
+    def test_copied_rows_match_bulk_create(self, user, monkeypatch):
+        row = {'name': 'Tom', 'breed': 'Siamese', 'color': 'Cream', 'age_months': 4, 'description': 'Calm'}
+        import_kittens([(1, row)], user)
+        monkeypatch.setattr(KittenCopy, 'supported', staticmethod(lambda: False))
+        import_kittens([(1, row)], user)
+
+        copied, created = Kitten.objects.filter(owner=user).order_by('id')
+        ignored = {'_state', 'id', 'inserted_time', 'updated_at'}
+        assert {k: v for k, v in vars(copied).items() if k not in ignored} == \
+            {k: v for k, v in vars(created).items() if k not in ignored}
+        assert copied.inserted_time is not None and copied.updated_at is not None
+        assert Kitten.objects.search('tom').count() == 2
+
+
+@pytest.mark.django_db
+class TestExport:
+    @pytest.fixture
+    def client(self):
+        return APIClient()
+
+    @pytest.fixture
+    def user(self):
+        User = get_user_model()
+        return User.objects.create_user(username='breeder', password='testpassword')
+
+    @pytest.fixture
+    def jwt_token(self, client, user):
+        response = client.post(reverse('token_obtain_pair'), {
+            'username': 'breeder',
+            'password': 'testpassword'
+        })
+        return response.data['access']
+
+    @pytest.fixture
+    def kittens(self, user):
+        return [
+            Kitten.objects.create(name='Tom', age_months=4, breed='Siamese', color='Cream', description='Loud', owner=user),
+            Kitten.objects.create(name='Leo', age_months=9, breed='siamese', color='Seal', description='Calm', owner=user),
+            Kitten.objects.create(name='Mia', age_months=3, breed='Bengal', color='Gold', description='Quick', owner=user),
+        ]
+
+    def test_export_kittens_ndjson_honours_filters(self, client, jwt_token, kittens):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        response = client.get(reverse('kitten-export'), {'breed': 'SIAMESE', 'max_age': 6})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        assert response['Content-Type'] == 'application/x-ndjson'
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        assert [(row['id'], row['name'], row['owner']) for row in rows] == [(kittens[0].id, 'Tom', 'breeder')]
+        assert rows[0]['inserted_time'].endswith('Z')
+
+    def test_export_ratings_csv(self, client, jwt_token, kittens):
+        User = get_user_model()
+        judge = User.objects.create(username='judge')
+        kittens[0].ratings.create(user=judge, score=4)
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+
+        response = client.get(reverse('rating-export', kwargs={'kitten_id': kittens[0].id}), {'format': 'csv'})
+
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        assert response['Content-Type'] == 'text/csv; charset=utf-8'
+        assert lines[0] == 'id,kitten,user,score,created_at'
+        assert lines[1].split(',')[1:4] == [str(kittens[0].id), str(judge.id), '4']
+
+    def test_export_streams_under_asgi(self, jwt_token, kittens, settings):
+        settings.EXPORT_BUFFER_SIZE = 1  # A chunk per row
+
+        async def export():
+            response = await AsyncClient().get(reverse('kitten-export'), headers={'Authorization': f'Bearer {jwt_token}'})
+            return response, [chunk async for chunk in response.streaming_content]
+
+        response, chunks = async_to_sync(export)()
+        # Served from an async iterator, which Django does not read into a list first
+        assert response.is_async
+        assert len(chunks) == len(kittens)
+        assert [json.loads(chunk)['name'] for chunk in chunks] == ['Tom', 'Leo', 'Mia']
+
+    def test_export_exhibition_command(self, kittens, tmp_path):
+        path = tmp_path / 'kittens.csv'
+        call_command('export_exhibition', 'kittens', format='csv', output=str(path), breed='bengal', chunk_size=1)
+        assert path.read_text().splitlines()[1].split(',')[2] == 'Mia'
@@ -0,0 +1,102 @@
+# kitten_app/tests/test_instrumentation.py
+import logging
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from kitten_app.instrumentation import fingerprint, normalize_sql
+from kitten_app.models import Kitten
+
+def timings(response):
+    """``{name: (duration, desc)}`` from a Server-Timing header."""
+    parsed = {}
+    for metric in response['Server-Timing'].split(', '):
+        name, *params = metric.split(';')
+        params = dict(param.split('=', 1) for param in params)
+        parsed[name] = (float(params['dur']), params.get('desc'))
+    return parsed
+
+@pytest.mark.django_db
+class TestRequestTiming:
+    @pytest.fixture(autouse=True)
+    def enabled(self, settings):
+        settings.REQUEST_TIMING = True
+
+    @pytest.fixture
+    def user(self):
+        return get_user_model().objects.create_user(username='testuser', password='testpassword')
+
+    @pytest.fixture
+    def client(self, user):
+        # Created after the settings change: the middleware reads REQUEST_TIMING when it is loaded
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        return client
+
+    @pytest.fixture
+    def kittens(self, user):
+        return [Kitten.objects.create(name=f'Kitten {i}', age_months=2, breed='Persian', color='White', owner=user)
+                for i in range(3)]
+
+    def test_server_timing_header(self, client, kittens):
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get(reverse('kitten-list'))
+
+        metrics = timings(response)
+        assert list(metrics) == ['sql', 'auth', 'serialize', 'total']
+        assert metrics['sql'][1] == f'"{len(captured)} queries"'
+        assert metrics['total'][0] >= max(metrics['sql'][0], metrics['auth'][0], metrics['serialize'][0])
+
+    def test_request_log_line(self, client, kittens, caplog):
+        with caplog.at_level(logging.INFO, logger='kitten_app.requests'):
+            client.get(reverse('kitten-detail', args=[kittens[0].pk]))
+            client.get('/api/no-such-page/')
+
+        detail, missing = [record.timings for record in caplog.records if record.name == 'kitten_app.requests']
+        assert (detail['method'], detail['route'], detail['status']) == ('GET', 'kitten-detail', 200)
+        assert detail['sql_count'] >= 1
+        assert (missing['route'], missing['status']) == ('unmatched', 404)
+        assert caplog.records[0].getMessage().startswith('method=GET route=kitten-detail status=200 ')
+
+    def test_slow_queries_are_logged_by_fingerprint(self, client, kittens, settings, caplog):
+        settings.SLOW_QUERY_MS = 0
+        with caplog.at_level(logging.WARNING, logger='kitten_app.slow_sql'):
+            client.get(reverse('kitten-list'), {'breed': 'persian'})
+
+        records = [record for record in caplog.records if record.name == 'kitten_app.slow_sql']
+        page = next(record for record in records if 'kitten_app_kitten' in record.sql)
+        assert 'persian' not in page.sql and '%s' not in page.sql
+        assert page.fingerprint == fingerprint(page.sql)
+
+    def test_fingerprints_ignore_parameters(self):
+        assert normalize_sql("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'Tom'  LIMIT 21") == \
+            'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?'
+        assert fingerprint('SELECT * FROM t WHERE id IN (%s, %s) LIMIT 5') == \
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s, %s)\n LIMIT 100')
+        assert fingerprint('SELECT * FROM t U0') != fingerprint('SELECT * FROM u U0')
+
+    def test_sampled_requests_are_profiled(self, client, kittens, settings, tmp_path):
+        settings.REQUEST_PROFILE_RATE = 1
+        settings.REQUEST_PROFILE_DIR = str(tmp_path)
+        client.get(reverse('kitten-list'))
+
+        [profile] = tmp_path.iterdir()
+        assert profile.name.endswith('.prof') and '-kitten-list-' in profile.name
+
+    def test_async_views_are_timed(self, user, kittens):
+        response = async_to_sync(AsyncClient().get)(
+            reverse('async-kitten-list'), headers={'Authorization': f'Bearer {AccessToken.for_user(user)}'})
+        metrics = timings(response)
+        assert list(metrics) == ['sql', 'auth', 'serialize', 'total']
+        assert metrics['sql'][1] != '"0 queries"'
+
+    def test_disabled_middleware_is_not_loaded(self, user, settings):
+        settings.REQUEST_TIMING = False
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        assert 'Server-Timing' not in client.get(reverse('kitten-list'))
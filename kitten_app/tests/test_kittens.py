@@ -1,10 +1,19 @@
 # kitten_app/tests/test_kittens.py
+import time
+
 import pytest
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 from django.contrib.auth import get_user_model
-from kitten_app.models import Kitten
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+from django.db.models.functions import Lower
+from kitten_app.filters import KittenFilter
+from kitten_app.models import Kitten, Rating
+from kitten_app.query_budget import QueryBudgetExceeded
+from kitten_app.views import KittenDetailView, KittenListCreateView
 
 @pytest.mark.django_db
 class TestKittens:
@@ -61,6 +70,48 @@ class TestKittens:
         assert response.status_code == status.HTTP_200_OK
         assert response.data['name'] == 'Fluffy Updated'
 
+    def test_get_kitten_is_conditional(self, client, jwt_token, user, django_assert_num_queries):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        kitten = Kitten.objects.create(name='Fluffy', age_months=2, breed='Persian', color='White', owner=user)
+        url = reverse('kitten-detail', args=[kitten.id])
+        first = client.get(url)
+        assert first['Cache-Control'] == 'private, no-cache'
+        assert 'Last-Modified' not in first
+
+        with django_assert_num_queries(2):  # Just the validator: no kitten row, no serializer
+            not_modified = client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            cached = client.get(url)
+        assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+        assert not_modified['ETag'] == first['ETag']
+        assert cached.content == first.content
+
+        client.patch(url, {'name': 'Snowball'})
+        changed = client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        assert changed.status_code == status.HTTP_200_OK
+        assert changed.data['name'] == 'Snowball'
+
+        # Rating aggregates are part of the kitten too
+        voter = get_user_model().objects.create_user(username='voter', password='testpassword')
+        Rating.objects.create(kitten=kitten, score=5, user=voter)
+        rated = client.get(url, HTTP_IF_NONE_MATCH=changed['ETag'])
+        assert rated.status_code == status.HTTP_200_OK
+        assert rated.data['rating_count'] == 1
+
+    def test_vote_in_the_same_second_is_never_answered_by_a_stale_date(self, client, jwt_token, user):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        kitten = Kitten.objects.create(name='Fluffy', age_months=2, breed='Persian', color='White', owner=user)
+        url = reverse('kitten-detail', args=[kitten.id])
+        first = client.get(url)
+        voter = get_user_model().objects.create_user(username='voter', password='testpassword')
+        Rating.objects.create(kitten=kitten, score=4, user=voter)
+
+        # A date from the same second would still match an HTTP date
+        since = client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 1))
+        assert since.status_code == status.HTTP_200_OK
+        assert since.data['rating_count'] == 1
+        stale = client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        assert stale.status_code == status.HTTP_200_OK
+
     def test_delete_kitten(self, client, jwt_token, user):
         client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
         kitten = Kitten.objects.create(name='Fluffy', age_months=2, breed='Persian', color='White', owner=user)
@@ -68,3 +119,269 @@ class TestKittens:
         response = client.delete(reverse('kitten-detail', args=[kitten.id]))
         assert response.status_code == status.HTTP_204_NO_CONTENT
         assert not Kitten.objects.filter(id=kitten.id).exists()
+
+    def test_list_kittens_is_keyset_paginated(self, client, jwt_token, user):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        for i in range(5):
+            Kitten.objects.create(name=f'Kitten {i}', age_months=i + 1, breed='Persian', color='White', owner=user)
+        # Identical timestamps must still page deterministically via the id tiebreaker
+        Kitten.objects.update(inserted_time=Kitten.objects.first().inserted_time)
+
+        response = client.get(reverse('kitten-list'), {'page_size': 2})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['previous'] is None
+        seen = [kitten['name'] for kitten in response.data['results']]
+
+        while response.data['next']:
+            response = client.get(response.data['next'])
+            seen += [kitten['name'] for kitten in response.data['results']]
+        assert seen == [f'Kitten {i}' for i in reversed(range(5))]
+
+        response = client.get(response.data['previous'])
+        assert [kitten['name'] for kitten in response.data['results']] == ['Kitten 2', 'Kitten 1']
+
+    def test_list_kittens_pagination_keeps_filters(self, client, jwt_token, user):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        for i in range(4):
+            Kitten.objects.create(name=f'Persian {i}', age_months=2, breed='Persian', color='White', owner=user)
+            Kitten.objects.create(name=f'Siamese {i}', age_months=2, breed='Siamese', color='Cream', owner=user)
+
+        response = client.get(reverse('kitten-list'), {'breed': 'persian', 'page_size': 3})
+        names = [kitten['name'] for kitten in response.data['results']]
+        response = client.get(response.data['next'])
+        names += [kitten['name'] for kitten in response.data['results']]
+        assert names == [f'Persian {i}' for i in reversed(range(4))]
+        assert response.data['next'] is None
+
+    def test_list_kittens_rejects_bad_cursor(self, client, jwt_token):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        response = client.get(reverse('kitten-list'), {'cursor': 'not-a-cursor'})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_list_kittens_filters_ignore_case(self, client, jwt_token, user):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        Kitten.objects.create(name='Fluffy', age_months=2, breed='Maine Coon', color='Grey', owner=user)
+        Kitten.objects.create(name='Tom', age_months=9, breed='maine coon', color='GREY', owner=user)
+        Kitten.objects.create(name='Felix', age_months=4, breed='Persian', color='Grey', owner=user)
+
+        response = client.get(reverse('kitten-list'), {'breed': 'MAINE COON', 'color': 'grey', 'max_age': 6})
+        assert [kitten['name'] for kitten in response.data['results']] == ['Fluffy']
+
+    def test_search_matches_name_breed_and_description(self, client, jwt_token, user):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        Kitten.objects.create(name='Whiskers', age_months=2, breed='Persian', color='White', owner=user)
+        Kitten.objects.create(name='Tom', age_months=3, breed='Siamese', color='Cream',
+                              description='Loves chasing whiskers of other cats', owner=user)
+        Kitten.objects.create(name='Felix', age_months=4, breed='Bengal', color='Brown', owner=user)
+
+        response = client.get(reverse('kitten-list'), {'q': 'whisker'})
+        # The name match outranks the description match
+        assert [kitten['name'] for kitten in response.data['results']] == ['Whiskers', 'Tom']
+        assert 'search_vector' not in response.data['results'][0]
+
+        response = client.get(reverse('kitten-list'), {'q': 'bengal -persian'})
+        assert [kitten['name'] for kitten in response.data['results']] == ['Felix']
+
+    def test_search_follows_edits_and_bulk_updates(self, client, jwt_token, user):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        kitten = Kitten.objects.create(name='Fluffy', age_months=2, breed='Persian', color='White', owner=user)
+        kitten.name = 'Snowball'
+        kitten.save()
+        assert [k['name'] for k in client.get(reverse('kitten-list'), {'q': 'snowball'}).data['results']] == ['Snowball']
+
+        Kitten.objects.update(breed='Ragdoll')
+        assert [k['name'] for k in client.get(reverse('kitten-list'), {'q': 'ragdoll'}).data['results']] == ['Snowball']
+        assert client.get(reverse('kitten-list'), {'q': 'persian'}).data['results'] == []
+
+    def test_search_pages_by_rank(self, client, jwt_token, user):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        for i in range(5):
+            # Equal ranks, so pages rely on the id tiebreaker
+            Kitten.objects.create(name=f'Ginger {i}', age_months=2, breed='Persian', color='Red', owner=user)
+        Kitten.objects.create(name='Ginger Ginger', age_months=2, breed='Persian', color='Ginger', owner=user)
+
+        response = client.get(reverse('kitten-list'), {'q': 'ginger', 'page_size': 2})
+        seen = [kitten['name'] for kitten in response.data['results']]
+        while response.data['next']:
+            response = client.get(response.data['next'])
+            seen += [kitten['name'] for kitten in response.data['results']]
+        assert seen == ['Ginger Ginger'] + [f'Ginger {i}' for i in reversed(range(5))]
+
+        response = client.get(response.data['previous'])
+        assert [kitten['name'] for kitten in response.data['results']] == ['Ginger 3', 'Ginger 2']
+
+    def test_search_ordering_param_overrides_rank(self, client, jwt_token, user):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        Kitten.objects.create(name='Ginger Ginger', age_months=9, breed='Persian', color='Ginger', owner=user)
+        Kitten.objects.create(name='Ginger', age_months=2, breed='Persian', color='Red', owner=user)
+
+        response = client.get(reverse('kitten-list'), {'q': 'ginger', 'ordering': 'inserted_time'})
+        assert [kitten['name'] for kitten in response.data['results']] == ['Ginger Ginger', 'Ginger']
+        response = client.get(reverse('kitten-list'), {'q': 'ginger', 'ordering': '-inserted_time'})
+        assert [kitten['name'] for kitten in response.data['results']] == ['Ginger', 'Ginger Ginger']
+
+    def test_search_ranks_a_capped_candidate_set(self, client, jwt_token, user, settings):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        settings.SEARCH_MAX_CANDIDATES = 2
+        for i in range(4):
+            Kitten.objects.create(name=f'Ginger {i}', age_months=2, breed='Persian', color='Red', owner=user)
+        # The newest matches, whatever order the index returns them in
+        assert sorted(Kitten.objects.search('ginger').values_list('name', flat=True)) == ['Ginger 2', 'Ginger 3']
+
+        response = client.get(reverse('kitten-list'), {'q': 'ginger', 'page_size': 1})
+        assert response.data['truncated'] is True
+        following = client.get(response.data['next'])
+        assert [kitten['name'] for kitten in response.data['results'] + following.data['results']] in \
+            (['Ginger 2', 'Ginger 3'], ['Ginger 3', 'Ginger 2'])
+        assert client.get(reverse('kitten-list'), {'q': 'ginger 3'}).data['truncated'] is False
+        assert 'truncated' not in client.get(reverse('kitten-list')).data
+
+    def test_distinct_breeds_and_colors(self, client, user):
+        Kitten.objects.create(name='Fluffy', age_months=2, breed='Siamese', color='White', owner=user)
+        Kitten.objects.create(name='Tom', age_months=9, breed='siamese', color='Black', owner=user)
+        Kitten.objects.create(name='Felix', age_months=4, breed='Bengal', color='WHITE', owner=user)
+
+        assert client.get(reverse('kitten-breeds')).json() == ['bengal', 'siamese']
+        assert client.get(reverse('kitten-colors')).json() == ['black', 'white']
+
+    def test_distinct_lists_are_cached_until_kittens_change(self, client, user, django_assert_num_queries):
+        kitten = Kitten.objects.create(name='Fluffy', age_months=2, breed='Siamese', color='White', owner=user)
+        first = client.get(reverse('kitten-colors'))
+        assert first['Cache-Control'] == 'no-cache'
+
+        with django_assert_num_queries(0):
+            cached = client.get(reverse('kitten-colors'))
+            not_modified = client.get(reverse('kitten-colors'), HTTP_IF_NONE_MATCH=first['ETag'])
+        assert cached.content == first.content
+        assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+
+        kitten.color = 'Black'
+        kitten.save()
+        changed = client.get(reverse('kitten-colors'), HTTP_IF_NONE_MATCH=first['ETag'])
+        assert changed.status_code == status.HTTP_200_OK
+        assert changed.json() == ['black']
+        assert changed['ETag'] != first['ETag']
+
+        kitten.delete()
+        assert client.get(reverse('kitten-colors')).json() == []
+
+
+    def test_list_kittens_query_count_is_flat(self, client, jwt_token, user, query_budget):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        User = get_user_model()
+        for i in range(10):
+            owner = User.objects.create(username=f'breeder{i}')
+            Kitten.objects.create(name=f'Kitten {i}', age_months=2, breed='Persian', color='White', owner=owner)
+
+        with query_budget(KittenListCreateView):
+            response = client.get(reverse('kitten-list'))
+        assert [kitten['owner'] for kitten in response.data['results']] == [f'breeder{i}' for i in reversed(range(10))]
+
+    def test_query_budget_is_enforced(self, client, jwt_token, user, monkeypatch):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        kitten = Kitten.objects.create(name='Fluffy', age_months=2, breed='Persian', color='White', owner=user)
+        monkeypatch.setattr(KittenDetailView, 'query_budget', 1)
+
+        with pytest.raises(QueryBudgetExceeded):
+            client.get(reverse('kitten-detail', args=[kitten.id]))
+
+    def test_list_leaves_out_description_unless_asked(self, client, jwt_token, user):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        for i in range(3):
+            Kitten.objects.create(name=f'Kitten {i}', age_months=2, breed='Persian', color='White', owner=user,
+                                  description='A very long story ' * 100)
+
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get(reverse('kitten-list'))
+        assert 'description' not in response.data['results'][0] and 'name' in response.data['results'][0]
+        assert not any('"description"' in query['sql'] for query in captured)
+
+        response = client.get(reverse('kitten-list'), {'fields': 'description,name'})
+        assert list(response.data['results'][0]) == ['name', 'description']  # Always in serializer order
+        response = client.get(reverse('kitten-list'), {'exclude': ''})
+        assert 'description' in response.data['results'][0]
+        response = client.get(reverse('kitten-list'), {'fields': 'id,name,owner', 'exclude': 'owner'})
+        assert list(response.data['results'][0]) == ['id', 'name']
+
+    def test_list_fields_keep_the_cursor(self, client, jwt_token, user):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        for i in range(3):
+            Kitten.objects.create(name=f'Kitten {i}', age_months=2, breed='Persian', color='White', owner=user)
+
+        # Neither inserted_time nor id is selected, but the cursor is made of them
+        first = client.get(reverse('kitten-list'), {'fields': 'name', 'page_size': 2})
+        second = client.get(first.data['next'])
+        assert [k['name'] for k in first.data['results'] + second.data['results']] == ['Kitten 2', 'Kitten 1', 'Kitten 0']
+        assert second.data['results'] == [{'name': 'Kitten 0'}]
+
+    def test_detail_fields_narrow_the_query(self, client, jwt_token, user):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        kitten = Kitten.objects.create(name='Fluffy', age_months=2, breed='Persian', color='White', owner=user,
+                                       description='Calm')
+        url = reverse('kitten-detail', args=[kitten.id])
+        assert client.get(url).data['description'] == 'Calm'
+
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get(url, {'fields': 'name,breed'})
+        assert response.data == {'name': 'Fluffy', 'breed': 'Persian'}
+        kitten_query = next(query['sql'] for query in captured if '"kitten_app_kitten"."name"' in query['sql'])
+        assert '"description"' not in kitten_query and 'auth_user' not in kitten_query
+
+        assert client.get(url, {'exclude': 'description,average_rating'}).data['owner'] == 'testuser'
+        # Each selection is cached apart from the full kitten
+        assert 'description' in client.get(url).data
+
+    def test_unknown_fields_are_rejected(self, client, jwt_token, user):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        kitten = Kitten.objects.create(name='Fluffy', age_months=2, breed='Persian', color='White', owner=user)
+
+        response = client.get(reverse('kitten-list'), {'fields': 'name,search_vector'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'search_vector' in response.data['fields'][0]
+        response = client.get(reverse('kitten-detail', args=[kitten.id]), {'exclude': 'nope'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        response = client.get(reverse('kitten-detail', args=[kitten.id]), {'fields': 'name', 'exclude': 'name'})
+        assert response.data == {'fields': ['Select at least one field.']}
+
+@pytest.mark.django_db
+@pytest.mark.skipif(connection.vendor != 'postgresql', reason='EXPLAIN output is PostgreSQL specific')
+class TestKittenIndexes:
+    @pytest.fixture(autouse=True)
+    def no_seqscan(self):
+        # With a handful of rows a sequential scan, or a sort of whatever any index returns,
+        # is always cheapest; take them off the table
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_sort = off')
+
+    @pytest.fixture
+    def kitten_filter(self):
+        def _filter(**params):
+            return KittenFilter(params, queryset=Kitten.objects.all()).qs
+        return _filter
+
+    def test_breed_filter_uses_lower_index(self, kitten_filter):
+        plan = kitten_filter(breed='Persian').explain()
+        assert 'kitten_top_breed_idx' in plan or 'kitten_breed_color_age_idx' in plan
+
+    def test_color_filter_uses_lower_index(self, kitten_filter):
+        assert 'kitten_top_color_idx' in kitten_filter(color='White').explain()
+
+    def test_combined_filter_uses_composite_index(self, kitten_filter):
+        plan = kitten_filter(breed='Persian', color='White', min_age=2, max_age=6).explain()
+        assert 'kitten_breed_color_age_idx' in plan
+
+    def test_distinct_lists_use_lower_indexes(self):
+        breeds = Kitten.objects.annotate(breed_lower=Lower('breed')).order_by('breed_lower').values_list('breed_lower', flat=True).distinct()
+        colors = Kitten.objects.annotate(color_lower=Lower('color')).order_by('color_lower').values_list('color_lower', flat=True).distinct()
+        assert 'kitten_top_breed_idx' in breeds.explain() or 'kitten_breed_color_age_idx' in breeds.explain()
+        assert 'kitten_top_color_idx' in colors.explain()
+
+    def test_top_kittens_read_the_ranked_indexes(self):
+        top = Kitten.objects.order_by('-weighted_rating', 'id')[:10]
+        assert 'kitten_top_idx' in top.explain()
+        top_breed = KittenFilter({'breed': 'Persian'}, queryset=Kitten.objects.order_by('-weighted_rating', 'id')).qs[:10]
+        assert 'kitten_top_breed_idx' in top_breed.explain()
+
+    def test_search_uses_gin_index(self):
+        assert 'kitten_search_idx' in KittenFilter({'q': 'fluffy grey'}, queryset=Kitten.objects.all()).qs.explain()
@@ -0,0 +1,128 @@
+# kitten_app/tests/test_metrics.py
+import os
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, transaction
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from kitten_app import metrics
+from kitten_app.checks import check_metrics_token
+from kitten_app.benchmark.metrics import middleware_overhead
+from kitten_app.models import Kitten, Rating
+
+def scrape(client, **kwargs):
+    """``{sample: value}`` from the /metrics page."""
+    response = client.get(reverse('metrics'), **kwargs)
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    return {line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1])
+            for line in response.content.decode().splitlines() if not line.startswith('#')}
+
+@pytest.mark.django_db
+class TestMetrics:
+    @pytest.fixture
+    def owner(self):
+        return get_user_model().objects.create_user(username='owner', password='testpassword')
+
+    @pytest.fixture
+    def judge(self):
+        return get_user_model().objects.create_user(username='judge', password='testpassword')
+
+    @pytest.fixture
+    def kittens(self, owner):
+        return [Kitten.objects.create(name=f'Kitten {i}', age_months=2, breed='Persian', color='White', owner=owner)
+                for i in range(3)]
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        return client
+
+    def test_requests_are_counted_by_route(self, owner, kittens):
+        client = self.client_for(owner)
+        client.get(reverse('kitten-list'))
+        client.get(reverse('kitten-list'))
+        client.get('/api/no-such-page/')
+
+        samples = scrape(client)
+        assert samples['kitten_http_requests_total{route="kitten-list",method="GET",status="200"}'] == 2
+        assert samples['kitten_http_requests_total{route="unmatched",method="GET",status="404"}'] == 1
+        assert samples['kitten_http_request_duration_seconds_count{route="kitten-list",method="GET"}'] == 2
+        assert samples['kitten_http_request_duration_seconds_bucket{route="kitten-list",method="GET",le="+Inf"}'] == 2
+        assert samples['kitten_http_request_duration_seconds_sum{route="kitten-list",method="GET"}'] > 0
+        assert samples['kitten_db_queries_total{route="kitten-list"}'] >= 2
+
+        buckets = [value for sample, value in samples.items()
+                   if sample.startswith('kitten_http_request_duration_seconds_bucket{route="kitten-list"')]
+        assert len(buckets) == len(metrics.BUCKETS) + 1 and buckets == sorted(buckets)
+
+    def test_async_requests_are_counted(self, owner, kittens):
+        async_to_sync(AsyncClient().get)(
+            reverse('async-kitten-list'), headers={'Authorization': f'Bearer {AccessToken.for_user(owner)}'})
+
+        samples = scrape(APIClient())
+        assert samples['kitten_http_requests_total{route="async-kitten-list",method="GET",status="200"}'] == 1
+        assert samples['kitten_db_queries_total{route="async-kitten-list"}'] >= 1
+
+    def test_rating_writes_are_counted(self, judge, kittens, django_capture_on_commit_callbacks):
+        client = self.client_for(judge)
+        url = reverse('rating-view', kwargs={'kitten_id': kittens[0].id})
+        with django_capture_on_commit_callbacks(execute=True):
+            client.post(url, {'score': 4})
+            client.put(url, {'score': 5})
+            client.delete(url)
+            client.post(reverse('rating-batch'), [{'kitten_id': kitten.id, 'score': 3} for kitten in kittens[1:]],
+                        format='json')
+            with pytest.raises(DatabaseError), transaction.atomic():
+                Rating.objects.create(kitten=kittens[0], score=1, user=judge)
+                raise DatabaseError('Rolled back')
+
+        samples = scrape(client)
+        assert samples['kitten_rating_writes_total{op="created"}'] == 3
+        assert samples['kitten_rating_writes_total{op="updated"}'] == 1
+        assert samples['kitten_rating_writes_total{op="deleted"}'] == 1
+
+    def test_files_of_all_processes_are_summed(self, metrics_store, monkeypatch):
+        store, directory = metrics_store, metrics_store.directory
+        alive = {os.getpid(), 999999}
+        monkeypatch.setattr(metrics, '_pid_alive', lambda pid: pid in alive)
+        store.add([('kitten_rating_writes_total{op="created"}', 1)])
+        other = metrics.ValueFile(os.path.join(directory, '999999.db'))
+        other.add('kitten_rating_writes_total{op="created"}', 2)
+        for i in range(5000):  # Outgrows the initial mapping
+            other.add(f'kitten_db_queries_total{{route="route-{i}"}}', i)
+        other.close()
+
+        totals = store.collect()
+        assert totals['kitten_rating_writes_total{op="created"}'] == 3
+        assert totals['kitten_db_queries_total{route="route-4999"}'] == 4999
+
+        # The other process exits: its totals move to the archive and its file goes
+        alive.discard(999999)
+        assert store.collect()['kitten_rating_writes_total{op="created"}'] == 3
+        assert sorted(os.listdir(directory)) == ['.lock', f'{os.getpid()}.db', 'archive.db']
+
+        reopened = metrics.ValueFile(os.path.join(directory, '999999.db'))  # The pid came back after a restart
+        reopened.add('kitten_rating_writes_total{op="created"}', 1)
+        reopened.close()
+        assert store.collect()['kitten_rating_writes_total{op="created"}'] == 4
+        assert store.collect()['kitten_db_queries_total{route="route-4999"}'] == 4999
+
+    def test_scrapes_can_require_a_token(self, settings):
+        settings.METRICS_TOKEN = 'secret'
+        client = APIClient()
+        assert client.get(reverse('metrics')).status_code == 401
+        assert client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code == 401
+        scrape(client, HTTP_AUTHORIZATION='Bearer secret')
+
+    def test_a_public_scrape_target_is_flagged(self, settings):
+        settings.DEBUG, settings.METRICS_TOKEN = False, ''
+        assert [warning.id for warning in check_metrics_token(None)] == ['kitten_app.W001']
+        settings.METRICS_TOKEN = 'secret'
+        assert check_metrics_token(None) == []
+
+    def test_middleware_overhead_is_small(self):
+        assert middleware_overhead(rounds=2000)['overhead_us'] < 50
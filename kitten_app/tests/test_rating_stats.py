@@ -0,0 +1,126 @@
+# kitten_app/tests/test_rating_stats.py
+import datetime
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from kitten_app.aggregation import settle
+from kitten_app.models import Kitten, KittenRatingHistogram, Rating, RatingDailyCount
+from kitten_app.rating_stats import rating_stats
+from kitten_app.views import RatingStatsView
+
+def stored_stats(kitten):
+    histogram = KittenRatingHistogram.objects.filter(kitten=kitten).first()
+    days = {(row.day, row.ratings, row.score_sum) for row in RatingDailyCount.objects.filter(kitten=kitten) if row.ratings}
+    return (histogram.counts() if histogram else [0] * 5), days
+
+def live_stats(kitten):
+    ratings = list(Rating.objects.filter(kitten=kitten))
+    counts = [sum(1 for rating in ratings if rating.score == score) for score in range(1, 6)]
+    days = {}
+    for rating in ratings:
+        day = timezone.localdate(rating.created_at)
+        ratings_that_day, score_sum = days.get(day, (0, 0))
+        days[day] = (ratings_that_day + 1, score_sum + rating.score)
+    return counts, {(day, *totals) for day, totals in days.items()}
+
+@pytest.mark.django_db
+class TestRatingStats:
+    @pytest.fixture
+    def kitten(self):
+        owner = get_user_model().objects.create_user(username='owner', password='testpassword')
+        return Kitten.objects.create(name='Fluffy', age_months=2, breed='Persian', color='White', owner=owner)
+
+    @pytest.fixture
+    def voters(self):
+        User = get_user_model()
+        return [User.objects.create_user(username=f'voter{i}', password='testpassword') for i in range(5)]
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_stats_follow_writes(self, kitten, voters):
+        url = reverse('rating-view', kwargs={'kitten_id': kitten.id})
+        for i, voter in enumerate(voters):
+            self.client_for(voter).post(url, {'score': i + 1})
+        self.client_for(voters[0]).put(url, {'score': 5})
+        self.client_for(voters[1]).delete(url)
+        self.client_for(voters[2]).post(reverse('rating-batch'), [{'kitten_id': kitten.id, 'score': 1}], format='json')
+        rating = Rating.objects.get(user=voters[3])
+        rating.score = 2
+        rating.save()
+
+        assert stored_stats(kitten) == live_stats(kitten)
+        response = self.client_for(voters[0]).get(reverse('rating-stats', kwargs={'kitten_id': kitten.id}))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['histogram'] == {1: 1, 2: 1, 3: 0, 4: 0, 5: 2}
+        assert (response.data['count'], response.data['mean']) == (4, 3.25)
+        today = response.data['days'][-1]
+        assert (today['day'], today['count'], today['mean']) == (timezone.localdate(), 4, 3.25)
+        assert response.data['weeks'][-1]['count'] == 4
+
+    def test_stats_are_read_without_the_ratings(self, kitten, voters, query_budget):
+        for voter in voters:
+            Rating.objects.create(kitten=kitten, score=4, user=voter)
+
+        with query_budget(RatingStatsView), CaptureQueriesContext(connection) as captured:
+            response = self.client_for(voters[0]).get(reverse('rating-stats', kwargs={'kitten_id': kitten.id}))
+        assert response.data['count'] == 5
+        assert not any('"kitten_app_rating"' in query['sql'] for query in captured)
+
+    def test_trend_buckets_by_day_and_week(self, kitten, voters):
+        today = datetime.date(2026, 10, 15)  # A Thursday
+        for voter, (days_ago, score) in zip(voters, [(0, 5), (0, 3), (2, 4), (9, 1), (40, 2)]):
+            rating = Rating.objects.create(kitten=kitten, score=score, user=voter)
+            created_at = timezone.make_aware(datetime.datetime.combine(today - datetime.timedelta(days=days_ago), datetime.time(12)))
+            Rating.objects.filter(pk=rating.pk).update(created_at=created_at)
+        call_command('rebuild_rating_stats')
+
+        stats = rating_stats(kitten.id, days=10, weeks=3, today=today)
+        assert [(bucket['day'].day, bucket['count']) for bucket in stats['days'] if bucket['count']] == [(6, 1), (13, 1), (15, 2)]
+        assert stats['days'][-1]['mean'] == 4.0 and stats['days'][1]['mean'] is None
+        # Weeks start on Monday; the rating 40 days ago is outside both ranges
+        assert [(bucket['week'], bucket['count']) for bucket in stats['weeks']] == \
+            [(datetime.date(2026, 9, 28), 0), (datetime.date(2026, 10, 5), 1), (datetime.date(2026, 10, 12), 3)]
+        assert stats['count'] == 5
+
+    def test_unrated_and_missing_kittens(self, kitten, voters):
+        client = self.client_for(voters[0])
+        response = client.get(reverse('rating-stats', kwargs={'kitten_id': kitten.id}), {'days': 7, 'weeks': 1})
+        assert (response.data['count'], response.data['mean']) == (0, None)
+        assert len(response.data['days']) == 7 and len(response.data['weeks']) == 1
+
+        assert client.get(reverse('rating-stats', kwargs={'kitten_id': kitten.id + 1})).status_code == status.HTTP_404_NOT_FOUND
+        for params in ({'days': 'many'}, {'days': 0}, {'weeks': 54}):
+            response = client.get(reverse('rating-stats', kwargs={'kitten_id': kitten.id}), params)
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_deferred_stats_trail_like_the_aggregates(self, kitten, voters, settings):
+        settings.RATING_AGGREGATION = 'deferred'
+        url = reverse('rating-view', kwargs={'kitten_id': kitten.id})
+        for voter in voters[:3]:
+            self.client_for(voter).post(url, {'score': 5})
+        self.client_for(voters[0]).delete(url)
+        assert stored_stats(kitten) == ([0] * 5, set())
+
+        # A rebuild counts the ratings but leaves the queued changes to the worker
+        call_command('rebuild_rating_stats')
+        settle()
+        assert stored_stats(kitten) == live_stats(kitten)
+        assert stored_stats(kitten)[0] == [0, 0, 0, 0, 2]
+
+    def test_rebuild_repairs_drift(self, kitten, voters):
+        for voter in voters:
+            Rating.objects.create(kitten=kitten, score=3, user=voter)
+        KittenRatingHistogram.objects.filter(kitten=kitten).update(stars_3=99, stars_1=4)
+        RatingDailyCount.objects.filter(kitten=kitten).delete()
+
+        call_command('rebuild_rating_stats')
+        assert stored_stats(kitten) == live_stats(kitten)
@@ -1,10 +1,19 @@
 # kitten_app/tests/test_ratings.py
+import threading
+import time
 import pytest
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 from django.contrib.auth import get_user_model
-from kitten_app.models import Kitten, Rating
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from django.utils.http import http_date
+from kitten_app.aggregation import apply_pending, settle
+from kitten_app.bulk import rate_kittens
+from kitten_app.models import Kitten, PendingRatingDelta, Rating
+from kitten_app.views import RatingBatchView, RatingView, UserRatingsView
 
 @pytest.mark.django_db
 class TestRatings:
@@ -72,7 +81,89 @@ class TestRatings:
         rating = Rating.objects.create(kitten=kitten, score=5, user=user2)
         response = client.get(reverse('rating-view', kwargs={'kitten_id': kitten.id}))
         assert response.status_code == status.HTTP_200_OK
-        assert response.data[0]['score'] == 5
+        assert response.data['results'][0]['score'] == 5
+
+    def test_get_ratings_is_conditional(self, client2, jwt_token2, kitten, user2, django_assert_num_queries):
+        client2.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token2)
+        url = reverse('rating-view', kwargs={'kitten_id': kitten.id})
+        empty = client2.get(url)
+        assert empty.data['results'] == []
+
+        client2.post(url, {'score': 5})
+        created = client2.get(url, HTTP_IF_NONE_MATCH=empty['ETag'])
+        assert created.status_code == status.HTTP_200_OK
+        assert 'Last-Modified' not in created
+
+        client2.put(url, {'score': 3})
+        updated = client2.get(url, HTTP_IF_NONE_MATCH=created['ETag'])
+        assert updated.status_code == status.HTTP_200_OK
+        assert updated.data['results'][0]['score'] == 3
+
+        with django_assert_num_queries(2):  # One validator read each
+            not_modified = client2.get(url, HTTP_IF_NONE_MATCH=updated['ETag'])
+            cached = client2.get(url)
+        assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+        assert cached.content == updated.content
+
+        # Back to no ratings: the empty list's ETag is current again
+        client2.delete(url)
+        assert client2.get(url, HTTP_IF_NONE_MATCH=updated['ETag']).data['results'] == []
+        assert client2.get(url, HTTP_IF_NONE_MATCH=empty['ETag']).status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_deleting_an_older_rating_is_never_answered_by_a_stale_date(self, client, jwt_token, kitten):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        url = reverse('rating-view', kwargs={'kitten_id': kitten.id})
+        User = get_user_model()
+        older, _ = [Rating.objects.create(kitten=kitten, score=score, user=User.objects.create(username=f'voter{score}'))
+                    for score in (4, 2)]
+        both = client.get(url)
+
+        older.delete()  # The newest updated_at does not move
+        since = client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        assert since.status_code == status.HTTP_200_OK
+        assert [rating['score'] for rating in since.data['results']] == [2]
+        assert client.get(url, HTTP_IF_NONE_MATCH=both['ETag']).status_code == status.HTTP_200_OK
+
+    def test_ratings_are_paginated_by_creation(self, client, jwt_token, kitten, query_budget):
+        User = get_user_model()
+        ratings = [Rating.objects.create(kitten=kitten, score=(i % 5) + 1, user=User.objects.create(username=f'voter{i}'))
+                   for i in range(5)]
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        url = reverse('rating-view', kwargs={'kitten_id': kitten.id})
+
+        with query_budget(RatingView):
+            first = client.get(url, {'page_size': 2})
+        pages = [first.data]
+        while pages[-1]['next']:
+            pages.append(client.get(pages[-1]['next']).data)
+        assert [r['id'] for page in pages for r in page['results']] == [r.id for r in reversed(ratings)]
+        assert len(pages) == 3 and pages[0]['previous'] is None
+
+        # Each page is cached on its own; previous walks back
+        assert client.get(pages[1]['previous']).data['results'] == pages[0]['results']
+        oldest = client.get(url, {'page_size': 2, 'ordering': 'created_at'})
+        assert [r['id'] for r in oldest.data['results']] == [ratings[0].id, ratings[1].id]
+
+    def test_ratings_of_a_missing_kitten(self, client, jwt_token, kitten):
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        response = client.get(reverse('rating-view', kwargs={'kitten_id': kitten.id + 1}))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert client.get(reverse('rating-view', kwargs={'kitten_id': kitten.id}), {'cursor': 'bogus'}).status_code \
+            == status.HTTP_404_NOT_FOUND
+
+    def test_users_list_the_ratings_they_gave(self, client, jwt_token, user, user2, query_budget):
+        kittens = [Kitten.objects.create(name=f'Kitten {i}', age_months=2, breed='Persian', color='White', owner=user2)
+                   for i in range(3)]
+        mine = [Rating.objects.create(kitten=kitten, score=4, user=user) for kitten in kittens]
+        Rating.objects.create(kitten=kittens[0], score=1, user=get_user_model().objects.create(username='other'))
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+
+        with query_budget(UserRatingsView):
+            first = client.get(reverse('user-ratings'), {'page_size': 2})
+        second = client.get(first.data['next'])
+        assert [r['id'] for r in first.data['results'] + second.data['results']] == [r.id for r in reversed(mine)]
+        assert {r['user'] for r in first.data['results'] + second.data['results']} == {user.id}
+        assert APIClient().get(reverse('user-ratings')).status_code == status.HTTP_401_UNAUTHORIZED
 
     def test_update_rating(self, client2, jwt_token2, kitten, user2):
         client2.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token2)
@@ -92,3 +183,246 @@ class TestRatings:
         response = client2.delete(reverse('rating-view', kwargs={'kitten_id': kitten.id}))
         assert response.status_code == status.HTTP_204_NO_CONTENT
         assert not Rating.objects.filter(id=rating.id).exists()
+
+    def test_rating_aggregates_follow_writes(self, client2, jwt_token2, kitten):
+        url = reverse('rating-view', kwargs={'kitten_id': kitten.id})
+        client2.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token2)
+
+        client2.post(url, {'score': 5})
+        kitten.refresh_from_db()
+        assert (kitten.rating_sum, kitten.rating_count, kitten.average_rating) == (5, 1, 5.0)
+
+        client2.put(url, {'score': 2})
+        kitten.refresh_from_db()
+        assert (kitten.rating_sum, kitten.rating_count, kitten.average_rating) == (2, 1, 2.0)
+
+        client2.delete(url)
+        kitten.refresh_from_db()
+        assert (kitten.rating_sum, kitten.rating_count, kitten.average_rating) == (0, 0, 0)
+
+    def test_rating_cost_does_not_grow_with_rating_count(self, client2, jwt_token2, kitten,
+                                                         django_assert_max_num_queries):
+        User = get_user_model()
+        for i in range(50):
+            voter = User.objects.create(username=f'voter{i}')
+            Rating.objects.create(kitten=kitten, score=(i % 5) + 1, user=voter)
+
+        client2.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token2)
+        with django_assert_max_num_queries(9):
+            response = client2.post(reverse('rating-view', kwargs={'kitten_id': kitten.id}), {'score': 4})
+        assert response.status_code == status.HTTP_201_CREATED
+
+        kitten.refresh_from_db()
+        assert kitten.rating_count == 51
+        assert kitten.rating_sum == 150 + 4
+
+    def test_recompute_ratings_repairs_drift(self, kitten, user2):
+        Rating.objects.create(kitten=kitten, score=3, user=user2)
+        Kitten.objects.filter(pk=kitten.pk).update(rating_sum=40, rating_count=9, average_rating=1.0)
+
+        call_command('recompute_ratings')
+
+        kitten.refresh_from_db()
+        assert (kitten.rating_sum, kitten.rating_count, kitten.average_rating) == (3, 1, 3.0)
+        assert not Kitten.objects.rating_drift().exists()
+
+    def test_top_kittens_prefer_many_good_votes_over_one_perfect_vote(self, client, jwt_token, user, kitten):
+        User = get_user_model()
+        popular = Kitten.objects.create(name='Popular', age_months=5, breed='Persian', color='Grey', owner=user)
+        other = Kitten.objects.create(name='Other', age_months=5, breed='Bengal', color='Grey', owner=user)
+        for i in range(40):
+            Rating.objects.create(kitten=popular, score=4, user=User.objects.create(username=f'fan{i}'))
+        Rating.objects.create(kitten=kitten, score=5, user=User.objects.create(username='lucky'))
+        Rating.objects.create(kitten=other, score=1, user=User.objects.create(username='grumpy'))
+
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + jwt_token)
+        response = client.get(reverse('kitten-top'))
+        assert [k['name'] for k in response.data] == ['Popular', 'Fluffy', 'Other']
+        popular.refresh_from_db()
+        assert popular.weighted_rating == pytest.approx((10 * 3.0 + 160) / 50)
+
+        response = client.get(reverse('kitten-top'), {'breed': 'persian', 'limit': 1})
+        assert [k['name'] for k in response.data] == ['Popular']
+
+
+@pytest.mark.django_db
+class TestRatingBatch:
+    @pytest.fixture
+    def judge(self):
+        return get_user_model().objects.create_user(username='judge', password='testpassword')
+
+    @pytest.fixture
+    def client(self, judge):
+        client = APIClient()
+        client.force_authenticate(judge)
+        return client
+
+    @pytest.fixture
+    def kittens(self):
+        owner = get_user_model().objects.create_user(username='owner', password='testpassword')
+        return Kitten.objects.bulk_create([
+            Kitten(name=f'Kitten {i}', age_months=2, breed='Persian', color='White', owner=owner) for i in range(3)
+        ])
+
+    def test_batch_creates_updates_and_reports(self, client, judge, kittens):
+        own = Kitten.objects.create(name='Mine', age_months=2, breed='Persian', color='White', owner=judge)
+        Rating.objects.create(kitten=kittens[0], score=1, user=judge)
+        Rating.objects.create(kitten=kittens[1], score=2, user=judge)
+
+        response = client.post(reverse('rating-batch'), [
+            {'kitten_id': kittens[0].id, 'score': 5},  # Updated
+            {'kitten_id': kittens[1].id, 'score': 2},  # Unchanged
+            {'kitten_id': kittens[2].id, 'score': 4},  # Created
+            {'kitten_id': kittens[2].id, 'score': 1},
+            {'kitten_id': own.id, 'score': 5},
+            {'kitten_id': 999999, 'score': 5},
+            {'kitten_id': kittens[0].id, 'score': 9},
+            'not an object',
+        ], format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert (response.data['created'], response.data['updated']) == (1, 1)
+        assert [(e['item'], list(e['errors'])) for e in response.data['errors']] == [
+            (3, ['kitten_id']), (4, ['kitten_id']), (5, ['kitten_id']), (6, ['score']), (7, ['non_field_errors']),
+        ]
+        assert dict(Rating.objects.filter(user=judge).values_list('kitten_id', 'score')) == {
+            kittens[0].id: 5, kittens[1].id: 2, kittens[2].id: 4,
+        }
+        assert not Kitten.objects.rating_drift().exists()
+
+    def test_batch_cost_does_not_grow_with_batch_size(self, client, judge, query_budget):
+        owner = get_user_model().objects.create_user(username='owner', password='testpassword')
+        kittens = Kitten.objects.bulk_create([
+            Kitten(name=f'Kitten {i}', age_months=2, breed='Persian', color='White', owner=owner) for i in range(200)
+        ])
+        Rating.objects.bulk_create([Rating(kitten=kitten, score=1, user=judge) for kitten in kittens[:100]])
+        Kitten.objects.filter(pk__in=[kitten.pk for kitten in kittens[:100]]).recompute_rating_aggregates()
+
+        with query_budget(RatingBatchView):
+            response = client.post(reverse('rating-batch'), [
+                {'kitten_id': kitten.id, 'score': i % 5 + 1} for i, kitten in enumerate(kittens)
+            ], format='json')
+        assert (response.data['created'], response.data['updated']) == (100, 80)  # Every 5th score stays 1
+        assert not Kitten.objects.rating_drift().exists()
+
+    def test_batch_rejects_bad_bodies(self, client, kittens, settings):
+        assert client.post(reverse('rating-batch'), {'kitten_id': kittens[0].id, 'score': 5},
+                           format='json').status_code == status.HTTP_400_BAD_REQUEST
+
+        settings.RATING_BATCH_MAX_ITEMS = 1
+        response = client.post(reverse('rating-batch'), [{'kitten_id': kitten.id, 'score': 5} for kitten in kittens],
+                               format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not Rating.objects.exists()
+
+        settings.RATING_BATCH_MAX_ITEMS = 10
+        response = client.post(reverse('rating-batch'), [{'kitten_id': 999999, 'score': 5}], format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestDeferredAggregation:
+    @pytest.fixture(autouse=True)
+    def deferred(self, settings):
+        settings.RATING_AGGREGATION = 'deferred'
+
+    @pytest.fixture
+    def kitten(self):
+        owner = get_user_model().objects.create_user(username='owner', password='testpassword')
+        return Kitten.objects.create(name='Fluffy', age_months=2, breed='Persian', color='White', owner=owner)
+
+    @pytest.fixture
+    def voters(self):
+        User = get_user_model()
+        return [User.objects.create_user(username=f'voter{i}', password='testpassword') for i in range(5)]
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_writes_are_queued_until_settled(self, kitten, voters):
+        url = reverse('rating-view', kwargs={'kitten_id': kitten.id})
+        for i, voter in enumerate(voters):
+            assert self.client_for(voter).post(url, {'score': i + 1}).status_code == status.HTTP_201_CREATED
+        self.client_for(voters[0]).put(url, {'score': 5})
+        self.client_for(voters[1]).delete(url)
+
+        kitten.refresh_from_db()
+        assert (kitten.rating_sum, kitten.rating_count) == (0, 0)
+        assert PendingRatingDelta.objects.count() == 7
+        assert not Kitten.objects.rating_drift().exists()  # Queued deltas are not drift
+
+        assert settle() == 7
+        kitten.refresh_from_db()
+        assert (kitten.rating_sum, kitten.rating_count, kitten.average_rating) == (17, 4, 4.25)
+        assert not PendingRatingDelta.objects.exists()
+
+    def test_rating_batches_are_queued_too(self, kitten, voters):
+        Rating.objects.create(kitten=kitten, score=1, user=voters[0])
+        for score, voter in [(5, voters[0]), (3, voters[1])]:
+            response = self.client_for(voter).post(reverse('rating-batch'), [{'kitten_id': kitten.id, 'score': score}],
+                                                   format='json')
+            assert response.status_code == status.HTTP_200_OK
+
+        assert settle() == 3
+        kitten.refresh_from_db()
+        assert (kitten.rating_sum, kitten.rating_count) == (8, 2)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_concurrent_batches_of_one_judge_queue_one_new_rating(self, kitten, voters):
+        items = [{'kitten_id': kitten.id, 'score': 5}]
+
+        def retry():
+            try:
+                rate_kittens(voters[0], items)
+            finally:
+                connections.close_all()
+
+        with transaction.atomic():
+            assert rate_kittens(voters[0], items)[0] == 1
+            other = threading.Thread(target=retry)
+            other.start()
+            other.join(0.5)
+            assert other.is_alive()  # Waiting for the first batch
+        other.join()
+
+        settle()
+        kitten.refresh_from_db()
+        assert (kitten.rating_sum, kitten.rating_count) == (5, 1)
+        assert not Kitten.objects.rating_drift().exists()
+
+    def test_batch_updates_each_kitten_once(self, kitten, voters, django_assert_num_queries):
+        for voter in voters:
+            Rating.objects.create(kitten=kitten, score=4, user=voter)
+
+        with django_assert_num_queries(7) as captured:  # Claim, lock, update, stats upsert, delete and the test's savepoint
+            assert apply_pending() == 5
+        assert sum(q['sql'].startswith('UPDATE "kitten_app_kitten"') for q in captured.captured_queries) == 1
+
+    def test_recompute_leaves_queued_deltas_to_the_worker(self, kitten, voters):
+        for voter in voters[:3]:
+            Rating.objects.create(kitten=kitten, score=5, user=voter)
+
+        call_command('recompute_ratings', '--all')
+        call_command('aggregate_ratings', '--once')
+
+        kitten.refresh_from_db()
+        assert (kitten.rating_sum, kitten.rating_count) == (15, 3)
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(connection.vendor != 'postgresql', reason='EXPLAIN output is PostgreSQL specific')
+class TestRatingIndexes:
+    @pytest.fixture(autouse=True)
+    def no_seqscan(self):
+        # With a handful of rows a sequential scan, or a sort, is always cheapest; take them off the table
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_sort = off')
+
+    def test_kitten_and_user_pages_read_the_created_indexes(self):
+        kitten_page = Rating.objects.filter(kitten_id=1).order_by('-created_at', '-id')[:21]
+        assert 'rating_kitten_created_idx' in kitten_page.explain()
+        user_page = Rating.objects.filter(user_id=1, created_at__lt=timezone.now()).order_by('-created_at', '-id')[:21]
+        assert 'rating_user_created_idx' in user_page.explain()
@@ -0,0 +1,102 @@
+# kitten_app/tests/test_replicas.py
+import pytest
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from kitten_app.models import Kitten
+from kitten_app.routers import PIN_COOKIE, PrimaryReplicaRouter, pinned_reads, user_pinned
+
+# Without a real replica the assertions below only hold for the primary
+REPLICA = 'replica1'
+
+def client_for(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+    return client
+
+# Outside TestCase's wrapping transaction, so reads are free to leave the primary
+@pytest.mark.django_db(transaction=True)
+class TestPrimaryReplicaRouter:
+    @pytest.fixture(autouse=True)
+    def replicas(self, settings):
+        settings.DATABASE_REPLICAS = [REPLICA]
+
+    def test_reads_go_to_replicas_writes_to_primary(self):
+        router = PrimaryReplicaRouter()
+        assert router.db_for_read(Kitten) == REPLICA
+        assert router.db_for_write(Kitten) == 'default'
+
+    def test_pinned_reads_and_transactions_stay_on_primary(self):
+        router = PrimaryReplicaRouter()
+        with pinned_reads():
+            assert router.db_for_read(Kitten) == 'default'
+        with transaction.atomic():
+            assert router.db_for_read(Kitten) == 'default'
+        assert router.db_for_read(Kitten) == REPLICA
+
+    def test_write_pins_the_writer(self):
+        user = get_user_model().objects.create_user(username='writer', password='testpassword')
+        response = client_for(user).post(reverse('kitten-list'), {
+            'name': 'Fluffy', 'age_months': 2, 'breed': 'Persian', 'color': 'White', 'description': 'Calm',
+        })
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.cookies[PIN_COOKIE]['max-age'] == settings.DB_REPLICA_STICKY_SECONDS
+        assert user_pinned(user.pk)
+
+    def test_failed_write_does_not_pin(self):
+        user = get_user_model().objects.create_user(username='writer', password='testpassword')
+        response = client_for(user).post(reverse('kitten-list'), {'name': 'Fluffy'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert PIN_COOKIE not in response.cookies
+        assert not user_pinned(user.pk)
+
+
+# A second, separately migrated database stands in for the replica, e.g.
+#   DB_REPLICA_HOSTS=localhost DB_REPLICA_NAME=kitten_replica_db pytest
+# It never receives the primary's writes, so a read shows where it was routed.
+@pytest.mark.skipif(REPLICA not in settings.DATABASES, reason='DB_REPLICA_HOSTS is not set')
+@pytest.mark.django_db(transaction=True, databases=['default', REPLICA])
+class TestReadYourWrites:
+    @pytest.fixture(autouse=True)
+    def replicas(self, settings):
+        settings.DATABASE_REPLICAS = [REPLICA]
+
+    @pytest.fixture
+    def users(self):
+        writer = get_user_model().objects.create_user(username='writer', password='testpassword')
+        reader = get_user_model().objects.create_user(username='reader', password='testpassword')
+        for user in (writer, reader):
+            user.save(using=REPLICA, force_insert=True)  # "Replicated" so tokens authenticate on both
+        return writer, reader
+
+    def names(self, client):
+        response = client.get(reverse('kitten-list'))
+        assert response.status_code == status.HTTP_200_OK
+        return [kitten['name'] for kitten in response.data['results']]
+
+    def test_writer_reads_own_write_others_read_replica(self, users):
+        writer, reader = users
+        writer_client = client_for(writer)
+        writer_client.post(reverse('kitten-list'), {
+            'name': 'Fluffy', 'age_months': 2, 'breed': 'Persian', 'color': 'White', 'description': 'Calm',
+        })
+
+        assert self.names(writer_client) == ['Fluffy']     # Cookie
+        assert self.names(client_for(writer)) == ['Fluffy']  # Token, no cookie
+        assert self.names(client_for(reader)) == []         # Replica has not caught up
+
+    def test_pin_expires(self, users):
+        writer, _ = users
+        client_for(writer).post(reverse('kitten-list'), {
+            'name': 'Fluffy', 'age_months': 2, 'breed': 'Persian', 'color': 'White', 'description': 'Calm',
+        })
+        cache.clear()
+
+        assert self.names(client_for(writer)) == []
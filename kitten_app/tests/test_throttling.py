@@ -0,0 +1,182 @@
+# kitten_app/tests/test_throttling.py
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from kitten_app.cache import single_flight
+from kitten_app.models import Kitten
+from kitten_app import throttling
+from kitten_app.throttling import take_token
+
+@pytest.mark.django_db
+class TestThrottling:
+    @pytest.fixture(autouse=True)
+    def frozen_clock(self, monkeypatch):
+        # No refill mid-test: with a real clock, crossing a refill tick hands out an extra token
+        monkeypatch.setattr(throttling, 'time', SimpleNamespace(time=lambda: 1_000_000.0))
+
+    @pytest.fixture
+    def user(self):
+        return get_user_model().objects.create_user(username='testuser', password='testpassword')
+
+    @pytest.fixture
+    def judge(self):
+        return get_user_model().objects.create_user(username='judge', password='testpassword')
+
+    @pytest.fixture
+    def kitten(self, user):
+        return Kitten.objects.create(name='Fluffy', age_months=2, breed='Persian', color='White', owner=user)
+
+    def client_for(self, user, **defaults):
+        client = APIClient(**defaults)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        return client
+
+    def test_bucket_bursts_then_refills(self):
+        # 2 tokens, refilled at 1 per second
+        assert take_token('bucket', 2, 1, now=1000.0) == 0
+        assert take_token('bucket', 2, 1, now=1000.1) == 0
+        assert take_token('bucket', 2, 1, now=1000.2) == pytest.approx(0.8)
+        assert take_token('bucket', 2, 1, now=1001.0) == 0
+        # Idle for long: the bucket is full again, but holds no more than 2
+        assert [take_token('bucket', 2, 1, now=2000.0) for _ in range(3)] == [0, 0, pytest.approx(1.0)]
+
+    def test_login_attempts_are_throttled_per_username(self, user, settings):
+        settings.THROTTLE_RATES = {**settings.THROTTLE_RATES, 'login.username': '3/min'}
+        client = APIClient()
+        for _ in range(3):
+            assert client.post(reverse('token_obtain_pair'), {'username': 'testuser', 'password': 'wrong'}).status_code \
+                == status.HTTP_401_UNAUTHORIZED
+
+        response = client.post(reverse('token_obtain_pair'), {'username': 'TestUser', 'password': 'testpassword'})
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert 0 < int(response['Retry-After']) <= 20
+        # Another account from the same address is not affected
+        get_user_model().objects.create_user(username='other', password='testpassword')
+        assert client.post(reverse('token_obtain_pair'), {'username': 'other', 'password': 'testpassword'}).status_code \
+            == status.HTTP_200_OK
+
+    def test_registration_is_throttled_per_ip(self, settings):
+        settings.THROTTLE_RATES = {**settings.THROTTLE_RATES, 'register.ip': '2/hour'}
+        codes = [APIClient().post(reverse('register'), {'username': f'new{i}', 'password': 'secret123', 'email': f'new{i}@example.com'}).status_code
+                 for i in range(3)]
+        assert codes[2] == status.HTTP_429_TOO_MANY_REQUESTS
+        response = APIClient(REMOTE_ADDR='10.0.0.2').post(reverse('register'), {'username': 'new3', 'password': 'secret123', 'email': 'new3@example.com'})
+        assert response.status_code != status.HTTP_429_TOO_MANY_REQUESTS
+
+    def test_rating_writes_are_throttled_per_user(self, judge, kitten, settings):
+        settings.THROTTLE_RATES = {**settings.THROTTLE_RATES, 'rating.user': '2/min'}
+        client = self.client_for(judge)
+        url = reverse('rating-view', kwargs={'kitten_id': kitten.id})
+        assert client.post(url, {'score': 4}).status_code == status.HTTP_201_CREATED
+        assert client.put(url, {'score': 5}).status_code == status.HTTP_200_OK
+        assert client.put(url, {'score': 3}).status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert client.post(reverse('rating-batch'), [{'kitten_id': kitten.id, 'score': 3}], format='json').status_code \
+            == status.HTTP_429_TOO_MANY_REQUESTS
+        # Reads are never throttled
+        assert client.get(url).status_code == status.HTTP_200_OK
+
+    def test_throttling_can_be_switched_off(self, judge, kitten, settings):
+        settings.THROTTLING = False
+        settings.THROTTLE_RATES = {**settings.THROTTLE_RATES, 'rating.user': '1/min'}
+        client = self.client_for(judge)
+        url = reverse('rating-view', kwargs={'kitten_id': kitten.id})
+        assert client.post(url, {'score': 4}).status_code == status.HTTP_201_CREATED
+        assert client.put(url, {'score': 5}).status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+class TestKittenListCache:
+    @pytest.fixture(autouse=True)
+    def cache_timeout(self, settings):
+        settings.KITTEN_LIST_CACHE_TIMEOUT = 60  # Not the default 2 s, which a slow run could outlast
+
+    @pytest.fixture
+    def user(self):
+        return get_user_model().objects.create_user(username='testuser', password='testpassword')
+
+    @pytest.fixture
+    def client(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        return client
+
+    @pytest.fixture
+    def kitten(self, user):
+        return Kitten.objects.create(name='Fluffy', age_months=2, breed='Persian', color='White', owner=user)
+
+    def test_pages_are_cached_until_a_kitten_changes(self, client, user, kitten, django_assert_num_queries):
+        client.get(reverse('kitten-list'))
+        with django_assert_num_queries(0):
+            assert [k['name'] for k in client.get(reverse('kitten-list')).data['results']] == ['Fluffy']
+
+        Kitten.objects.create(name='Tom', age_months=3, breed='Siamese', color='Black', owner=user)
+        assert [k['name'] for k in client.get(reverse('kitten-list')).data['results']] == ['Tom', 'Fluffy']
+        # Other query strings are other pages
+        assert [k['name'] for k in client.get(reverse('kitten-list'), {'breed': 'persian'}).data['results']] == ['Fluffy']
+
+    def test_rating_changes_show_in_cached_pages(self, client, kitten):
+        judge = get_user_model().objects.create_user(username='judge', password='testpassword')
+        client.get(reverse('kitten-list'))
+        judge_client = APIClient()
+        judge_client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(judge)}')
+        judge_client.post(reverse('rating-view', kwargs={'kitten_id': kitten.id}), {'score': 4})
+
+        assert client.get(reverse('kitten-list')).data['results'][0]['average_rating'] == 4.0
+
+    def test_pinned_reads_skip_the_cache(self, client, kitten, settings, django_assert_num_queries):
+        settings.DATABASE_REPLICAS = ['default']  # Turns pinning on; the "replica" is the primary itself
+        client.get(reverse('kitten-list'))
+        client.patch(reverse('kitten-detail', args=[kitten.id]), {'name': 'Snowball'})  # Pins the writer
+        client.get(reverse('kitten-list'))
+
+        with django_assert_num_queries(1):  # The page itself, however warm the cache
+            assert client.get(reverse('kitten-list')).data['results'][0]['name'] == 'Snowball'
+
+
+class TestSingleFlight:
+    def test_concurrent_misses_build_once(self):
+        builds = []
+        start = threading.Barrier(8)
+        results = []
+
+        def build():
+            builds.append(1)
+            time.sleep(0.1)
+            return {'page': 1}
+
+        def request():
+            start.wait()
+            results.append(single_flight('single-flight-test', build, 60))
+
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(builds) == 1
+        assert results == [{'page': 1}] * 8
+
+    def test_waiters_build_themselves_when_the_first_build_fails(self):
+        calls = []
+
+        def failing():
+            calls.append('failing')
+            time.sleep(0.05)
+            raise RuntimeError('database went away')
+
+        def working():
+            calls.append('working')
+            return 'page'
+
+        first = threading.Thread(target=lambda: pytest.raises(RuntimeError, single_flight, 'single-flight-fail', failing, 60))
+        first.start()
+        time.sleep(0.01)
+        assert single_flight('single-flight-fail', working, 60) == 'page'
+        first.join()
+        assert calls == ['failing', 'working']
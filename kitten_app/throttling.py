@@ -0,0 +1,108 @@
+"""
+Token-bucket throttles for the expensive or abusable endpoints (login,
+registration, rating writes), see settings.THROTTLE_RATES.
+
+A rate of ``'5/min'`` is a bucket of 5 tokens that refills at 5 per minute:
+a client may burst 5 requests, then gets one every 12 seconds. A view names
+its ``throttle_scope``, and each throttle class keeps one bucket per scope
+and identity (IP address, user or login name).
+
+Buckets live in the default cache, so processes sharing a cache backend
+share them. Taking a token is one ``cache.incr()``, which is atomic in the
+local-memory, Redis and Memcached backends, so concurrent requests cannot
+both take the last token. The refill is computed from the clock: the
+counter is the number of tokens taken since the bucket's base tick, and the
+bucket allows ``capacity + ticks since base`` of them.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """``(capacity, tokens per second)`` of a rate such as ``'5/min'``."""
+    count, period = rate.split('/')
+    return int(count), int(count) / PERIODS[period[0]]
+
+
+def take_token(key, capacity, per_second, now=None):
+    """Take a token from bucket ``key``; return 0 if there was one, else the seconds until there is."""
+    now = time.time() if now is None else now
+    tick = int(now * per_second)  # Tokens refilled since the epoch
+    base_key = f'{key}:base'
+    base = cache.get(base_key)
+    if base is None:
+        cache.add(base_key, tick, settings.THROTTLE_BUCKET_TTL)
+        base = cache.get(base_key, tick)
+    taken_key = f'{key}:{base}'
+    try:
+        taken = cache.incr(taken_key)
+    except ValueError:
+        cache.add(taken_key, 0, settings.THROTTLE_BUCKET_TTL)
+        taken = cache.incr(taken_key)
+
+    allowed = capacity + tick - base
+    if taken > allowed:
+        cache.decr(taken_key)  # A refused request takes nothing
+        return (tick + taken - allowed) / per_second - now
+    if allowed - taken >= capacity:
+        # Idle long enough to overflow: start a full bucket from this tick, less this request's token.
+        # A request still counting against the old base may slip through once.
+        cache.set(f'{key}:{tick}', 1, settings.THROTTLE_BUCKET_TTL)
+        cache.set(base_key, tick, settings.THROTTLE_BUCKET_TTL)
+    return 0
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """One bucket per view ``throttle_scope`` and ``identity()``; the rate is THROTTLE_RATES['<scope>.<kind>']."""
+    kind = None
+
+    def identity(self, request):
+        """Whose bucket ``request`` takes from, or None to let it through."""
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self.delay = 0
+        if not settings.THROTTLING:
+            return True
+        scope = getattr(view, 'throttle_scope', None)
+        rate = settings.THROTTLE_RATES.get(f'{scope}.{self.kind}')
+        identity = self.identity(request) if rate else None
+        if identity is None:
+            return True
+        capacity, per_second = parse_rate(rate)
+        self.delay = take_token(f'throttle:{scope}:{self.kind}:{identity}', capacity, per_second)
+        return not self.delay
+
+    def wait(self):
+        return self.delay
+
+
+class IPThrottle(TokenBucketThrottle):
+    kind = 'ip'
+
+    def identity(self, request):
+        return self.get_ident(request)  # REMOTE_ADDR, or X-Forwarded-For behind NUM_PROXIES
+
+
+class UserThrottle(TokenBucketThrottle):
+    kind = 'user'
+
+    def identity(self, request):
+        return request.user.pk if request.user.is_authenticated else None
+
+
+class UsernameThrottle(TokenBucketThrottle):
+    """Per attempted login name: guessing one account's password from many addresses stays slow."""
+    kind = 'username'
+
+    def identity(self, request):
+        username = request.data.get('username')
+        if not isinstance(username, str) or not username:
+            return None
+        return hashlib.md5(username.lower().encode('utf-8')).hexdigest()
@@ -1,11 +1,12 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from .views import RegisterView, LogoutView, KittenListCreateView, KittenDetailView,  DistinctColorsView, DistinctBreedsView, RatingView
+from rest_framework_simplejwt.views import TokenRefreshView
+from .async_views import AsyncKittenListView, AsyncKittenDetailView, AsyncDistinctColorsView, AsyncDistinctBreedsView, AsyncRatingView
+from .views import RegisterView, LoginView, LogoutView, KittenListCreateView, KittenDetailView,  DistinctColorsView, DistinctBreedsView, KittenFacetsView, RatingView, RatingStatsView, RatingBatchView, UserRatingsView, KittenBulkImportView, KittenExportView, RatingExportView, TopKittensView, DatabaseStatsView
 
 urlpatterns = [
     # User registration, login and logout
     path('register/', RegisterView.as_view(), name='register'),
-    path('login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('login/', LoginView.as_view(), name='token_obtain_pair'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 
@@ -13,11 +14,33 @@ urlpatterns = [
     # Kittens management
     path('kittens/', KittenListCreateView.as_view(), name='kitten-list'),
     path('kittens/<int:pk>/', KittenDetailView.as_view(), name='kitten-detail'),
+    path('kittens/bulk/', KittenBulkImportView.as_view(), name='kitten-bulk'),
+    path('kittens/top/', TopKittensView.as_view(), name='kitten-top'),
+
+    # Streaming NDJSON/CSV exports (?format=ndjson|csv)
+    path('kittens/export/', KittenExportView.as_view(), name='kitten-export'),
+    path('kittens/<int:kitten_id>/ratings/export/', RatingExportView.as_view(), name='rating-export'),
 
     # Distinct colors and breeds for filtering
     path('kittens/colors/', DistinctColorsView.as_view(), name='kitten-colors'),
     path('kittens/breeds/', DistinctBreedsView.as_view(), name='kitten-breeds'),
+    # Kitten counts per breed, color and age bucket, with the list filters
+    path('kittens/facets/', KittenFacetsView.as_view(), name='kitten-facets'),
 
     # Ratings management for a specific kitten
     path('kittens/<int:kitten_id>/ratings/', RatingView.as_view(), name='rating-view'),
+    path('kittens/<int:kitten_id>/ratings/stats/', RatingStatsView.as_view(), name='rating-stats'),
+    path('ratings/batch/', RatingBatchView.as_view(), name='rating-batch'),
+    # The caller's own ratings
+    path('ratings/', UserRatingsView.as_view(), name='user-ratings'),
+
+    # Database connection pool and reuse counters (staff only)
+    path('stats/db/', DatabaseStatsView.as_view(), name='db-stats'),
+
+    # Async read endpoints, for deployments serving the ASGI application
+    path('async/kittens/', AsyncKittenListView.as_view(), name='async-kitten-list'),
+    path('async/kittens/<int:pk>/', AsyncKittenDetailView.as_view(), name='async-kitten-detail'),
+    path('async/kittens/colors/', AsyncDistinctColorsView.as_view(), name='async-kitten-colors'),
+    path('async/kittens/breeds/', AsyncDistinctBreedsView.as_view(), name='async-kitten-breeds'),
+    path('async/kittens/<int:kitten_id>/ratings/', AsyncRatingView.as_view(), name='async-rating-view'),
 ]
\ No newline at end of file
@@ -1,15 +1,39 @@
+import hmac
 from rest_framework import generics, permissions, serializers, viewsets, status
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.exceptions import UnsupportedMediaType
+from rest_framework_simplejwt.views import TokenObtainPairView
 from .models import Kitten, Rating
 from .serializers import KittenSerializer, RatingSerializer, RegisterSerializer
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 from .permissions import IsOwnerOrReadOnly
+from .pagination import KeysetPagination, RatingPagination
+from .filters import KittenFilter
+from .facets import facet_counts
+from .rating_stats import rating_stats
+from .encoders import kitten_encoder, rating_encoder
+from .fieldsets import KITTEN_FIELDS, LIST_DEFAULT_EXCLUDE, kitten_fields, only_kitten_fields
 from django.contrib.auth.models import User
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from .authentication import CachedJWTAuthentication, CachedRefreshToken, revoke_token
 from django.db.models.functions import Lower
 from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.views.decorators.http import require_safe
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from .cache import cached_facet, kitten_list_key, single_flight
+from .bulk import CONTENT_TYPES, import_kittens, parse_rows, rate_kittens
+from .export import KITTEN_EXPORT_COLUMNS, RATING_EXPORT_COLUMNS, aexport_chunks, export_chunks
+from .renderers import CSVRenderer, NDJSONRenderer
+from .query_budget import QueryBudgetMixin
+from .routers import reads_pinned
+from .db import database_stats
+from . import metrics
+from .throttling import IPThrottle, UserThrottle, UsernameThrottle
+from .conditional import add_validators, cached_payload, kitten_validators, not_modified, page_variant, ratings_validators
 
 
 # User registration view
@@ -17,57 +41,64 @@ class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = (permissions.AllowAny,)
     serializer_class = RegisterSerializer
+    throttle_classes = [IPThrottle]
+    throttle_scope = 'register'
+
+# Login view: every attempt runs the password hasher, so attempts are throttled
+class LoginView(TokenObtainPairView):
+    throttle_classes = [IPThrottle, UsernameThrottle]
+    throttle_scope = 'login'
 
 # Logout view
 class LogoutView(generics.GenericAPIView):
     # permission_classes = [permissions.IsAuthenticated]
-    authentication_classes = [JWTAuthentication]  # Enforce JWT 
+    authentication_classes = [CachedJWTAuthentication]  # Enforce JWT 
 
     def post(self, request):
         try:
             refresh_token = request.data['refresh_token']
-            token = RefreshToken(refresh_token)
+            token = CachedRefreshToken(refresh_token)
             token.blacklist()
+            if request.auth is not None:
+                # Also revoke the access token used for this call instead of letting it live until it expires
+                revoke_token(request.auth)
             return Response({"message": "Successfully logged out"}, status=200)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
 
-class KittenListCreateView(generics.ListCreateAPIView):
+class KittenListCreateView(QueryBudgetMixin, generics.ListCreateAPIView):
 
-    queryset = Kitten.objects.all().order_by('-inserted_time')
+    queryset = Kitten.objects.select_related('owner').order_by('-inserted_time')
     serializer_class = KittenSerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     ordering_fields = ['inserted_time']
+    filterset_class = KittenFilter
+    pagination_class = KeysetPagination  # Cursor over (inserted_time, id), see kitten_inserted_id_idx
     # permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
-    authentication_classes = [JWTAuthentication]  # Enforce JWT 
+    authentication_classes = [CachedJWTAuthentication]  # Enforce JWT 
+    query_budget = 6  # POST adds the facet count upsert and, under tests, savepoints
 
     def get_queryset(self):
-        queryset = Kitten.objects.all().order_by('-inserted_time')
-        
-        # Handle case-insensitive filtering for breed and color
-        breed = self.request.query_params.get('breed')
-        color = self.request.query_params.get('color')
-        
-        if breed:
-            queryset = queryset.filter(breed__iexact=breed)  # Case-insensitive exact match
-        if color:
-            queryset = queryset.filter(color__iexact=color)  # Case-insensitive exact match
-
-
-        # Handle age filtering
-        min_age = self.request.query_params.get('min_age')
-        max_age = self.request.query_params.get('max_age')
-        if min_age and max_age and min_age == max_age:
-            queryset = queryset.filter(age_months=min_age)
-        elif min_age and max_age:
-            queryset = queryset.filter(age_months__gte=min_age, age_months__lte=max_age)
-        elif min_age:
-            queryset = queryset.filter(age_months__gte=min_age)
-        elif max_age:
-            queryset = queryset.filter(age_months__lte=max_age)
-
-        return queryset
+        # breed/color/min_age/max_age filtering is done by KittenFilter
+        # owner is joined because KittenSerializer renders owner.username
+        return Kitten.objects.select_related('owner').order_by('-inserted_time')
+
+    def list(self, request, *args, **kwargs):
+        # ?fields=/?exclude= select the columns; description is left out unless asked for
+        encoder = kitten_encoder.only(kitten_fields(request, default_exclude=LIST_DEFAULT_EXCLUDE))
+        if reads_pinned():
+            # The caller just wrote, and a shared page may have been built from a lagging replica
+            return Response(self.page_data(encoder))
+        # Identical concurrent requests for a cold page run its queries once (see single_flight)
+        return Response(single_flight(kitten_list_key(request), lambda: self.page_data(encoder), settings.KITTEN_LIST_CACHE_TIMEOUT))
+
+    def page_data(self, encoder):
+        # Rows from values_list(), encoded exactly like KittenSerializer would (see kitten_app.encoders).
+        # The rows also carry the cursor's keys, selected or not.
+        queryset = encoder.rows(self.filter_queryset(self.get_queryset()), keys=('inserted_time', 'id'))
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(encoder.encode(page)).data
 
     def perform_create(self, serializer):        
         try:
@@ -76,43 +107,189 @@ class KittenListCreateView(generics.ListCreateAPIView):
             print(f"Error: {e}", flush=True)
 
     
-class DistinctColorsView(generics.ListAPIView):
+class TopKittensView(QueryBudgetMixin, generics.ListAPIView):
+    """Highest ranked kittens by weighted (Bayesian) rating, optionally scoped by breed/color."""
+    serializer_class = KittenSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]  # Enforce JWT 
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = KittenFilter
+    query_budget = 3  # Cold auth caches add the user and revoked-token lookups
+    default_limit = 10
+    max_limit = 100
+
+    def get_queryset(self):
+        # Reads the first rows of kitten_top_idx (or its breed/color variants); no sort of the table
+        return Kitten.objects.select_related('owner').order_by('-weighted_rating', 'id')
+
+    def list(self, request, *args, **kwargs):
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            return Response({"error": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        kittens = kitten_encoder.rows(self.filter_queryset(self.get_queryset()))[:max(limit, 1)]
+        return Response(kitten_encoder.encode(kittens))
+
+def color_facet():
+    # Case-insensitive distinct colors, read in order from kitten_top_color_idx
+    return Kitten.objects.annotate(color_lower=Lower('color')).order_by('color_lower').values_list('color_lower', flat=True).distinct()
+
+def breed_facet():
+    # Case-insensitive distinct breeds, read in order from kitten_top_breed_idx
+    return Kitten.objects.annotate(breed_lower=Lower('breed')).order_by('breed_lower').values_list('breed_lower', flat=True).distinct()
+
+def facet_response(request, body, etag):
+    """Serve a cached facet list, answering 304 when the client's ETag is current."""
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    # Clients may keep the list but must revalidate it, so it is never served stale
+    patch_cache_control(response, no_cache=True)
+    return response
+
+class DistinctColorsView(QueryBudgetMixin, generics.ListAPIView):
+    query_budget = 2
+
     def get(self, request):
-        # Case-insensitive distinct colors
-        colors = Kitten.objects.annotate(color_lower=Lower('color')).values_list('color_lower', flat=True).distinct()
-        return Response(sorted(colors))
+        return facet_response(request, *cached_facet('colors', color_facet))
+
+class DistinctBreedsView(QueryBudgetMixin, generics.ListAPIView):
+    query_budget = 2
+
+    def get(self, request):
+        return facet_response(request, *cached_facet('breeds', breed_facet))
+
+class KittenFacetsView(QueryBudgetMixin, generics.GenericAPIView):
+    """Kittens per breed, color and age bucket, each narrowed by the other list filters."""
+    query_budget = 2
 
-class DistinctBreedsView(generics.ListAPIView):
     def get(self, request):
-        # Case-insensitive distinct breeds
-        breeds = Kitten.objects.annotate(breed_lower=Lower('breed')).values_list('breed_lower', flat=True).distinct()
-        return Response(sorted(breeds))
+        filterset = KittenFilter(request.query_params, queryset=Kitten.objects.all(), request=request)
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(facet_counts(filterset))
+
+class KittenBulkImportView(generics.GenericAPIView):
+    """Create many kittens from a JSON Lines or CSV request body."""
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]  # Enforce JWT 
+
+    def post(self, request):
+        fmt = CONTENT_TYPES.get(request.content_type.split(';')[0].strip().lower())
+        if fmt is None:
+            raise UnsupportedMediaType(request.content_type)
+
+        try:
+            batch_size = int(request.query_params.get('batch_size', settings.KITTEN_IMPORT_BATCH_SIZE))
+        except ValueError:
+            return Response({"error": "batch_size must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= batch_size <= settings.KITTEN_IMPORT_MAX_BATCH_SIZE:
+            return Response({"error": f"batch_size must be between 1 and {settings.KITTEN_IMPORT_MAX_BATCH_SIZE}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Read the raw body line by line instead of letting a parser load it whole
+        lines = request.stream if request.stream is not None else []
+        created, errors = import_kittens(parse_rows(lines, fmt), request.user, batch_size)
+        return Response(
+            {"created": created, "errors": errors},
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST,
+        )
+
+EXPORT_CONTENT_TYPES = {
+    NDJSONRenderer.format: NDJSONRenderer.media_type,
+    CSVRenderer.format: CSVRenderer.media_type + '; charset=utf-8',
+}
+
+def export_response(request, queryset, columns, name):
+    fmt = request.accepted_renderer.format
+    # Under ASGI a synchronous iterator would be read whole before the first byte is sent
+    chunks = aexport_chunks if isinstance(request._request, ASGIRequest) else export_chunks
+    response = StreamingHttpResponse(chunks(queryset, columns, fmt), content_type=EXPORT_CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{name}.{fmt}"'
+    return response
+
+class KittenExportView(generics.GenericAPIView):
+    """Stream every kitten matching the list filters as NDJSON (default) or CSV."""
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]  # Enforce JWT 
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = KittenFilter
+
+    def get_queryset(self):
+        return Kitten.objects.order_by('id')
+
+    def get(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        return export_response(request, queryset, KITTEN_EXPORT_COLUMNS, 'kittens')
 
 # Kitten Detail, Update, Delete View
-class KittenDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Kitten.objects.all()
+class KittenDetailView(QueryBudgetMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Kitten.objects.select_related('owner')
     serializer_class = KittenSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
-    authentication_classes = [JWTAuthentication]  # Enforce JWT 
+    authentication_classes = [CachedJWTAuthentication]  # Enforce JWT 
+    query_budget = 10  # DELETE collects and removes the kitten's ratings and rating stats; writes move the facet counts
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = kitten_validators(kwargs['pk'])
+        if validators is None:
+            return super().retrieve(request, *args, **kwargs)  # 404
+        fields = kitten_fields(request)
+        # Unchanged since the client's copy: no kitten query, no serializer
+        response = not_modified(request, validators)
+        if response is None:
+            variant = '' if fields == KITTEN_FIELDS else ':' + ','.join(fields)
+            response = Response(cached_payload(validators, lambda: self.kitten_data(fields), variant))
+        return add_validators(response, validators)
+
+    def kitten_data(self, fields):
+        self.queryset = only_kitten_fields(self.queryset, fields)  # Loads just the selected columns
+        return self.get_serializer(self.get_object(), fields=fields).data
+
+
+class RatingPageMixin:
+    """Keyset pages of ratings, newest first; ?ordering=created_at for oldest first."""
+    pagination_class = RatingPagination
+    filter_backends = [filters.OrderingFilter]  # Only read by the paginator
+    ordering_fields = ['created_at']
 
+    def page_data(self, ratings):
+        # One range scan of a (kitten or user, created_at, id) index per page, encoded like RatingSerializer
+        page = self.paginate_queryset(rating_encoder.rows(ratings, keys=('created_at', 'id')))
+        return self.get_paginated_response(rating_encoder.encode(page)).data
 
-class RatingView(generics.GenericAPIView):
+
+class RatingView(RatingPageMixin, QueryBudgetMixin, generics.GenericAPIView):
     serializer_class = RatingSerializer
 #     # permission_classes = [permissions.IsAuthenticated]
-    authentication_classes = [JWTAuthentication]  # Enforce JWT 
+    authentication_classes = [CachedJWTAuthentication]  # Enforce JWT 
+    query_budget = 9  # Writes include the aggregate UPDATE, the rating stats upsert and, under tests, savepoints
+    throttle_classes = [UserThrottle, IPThrottle]
+    throttle_scope = 'rating'
+
+    def get_throttles(self):
+        # Only writes are throttled; reads are answered from the validators and payload cache
+        return [] if self.request.method in permissions.SAFE_METHODS else super().get_throttles()
 
     def get(self, request, kitten_id):
-        """Get all ratings for a specific kitten."""
-        ratings = Rating.objects.filter(kitten__id=kitten_id)
-        serializer = self.get_serializer(ratings, many=True)
-        return Response(serializer.data)
+        """Get a page of the ratings for a specific kitten."""
+        validators = ratings_validators(kitten_id)
+        if validators is None:
+            raise Http404('No Kitten matches the given query.')
+        response = not_modified(request, validators)
+        if response is None:
+            ratings = Rating.objects.filter(kitten_id=kitten_id)
+            response = Response(cached_payload(validators, lambda: self.page_data(ratings), page_variant(request)))
+        return add_validators(response, validators)
 
     def post(self, request, kitten_id):
         """Create a rating for a specific kitten."""
         kitten = get_object_or_404(Kitten, id=kitten_id)
 
         # Check if the user is the owner of the kitten
-        if request.user == kitten.owner:
+        if request.user.id == kitten.owner_id:
             return Response({"error": "You cannot rate your own kitten."}, status=status.HTTP_400_BAD_REQUEST)
 
         # Check if the user has already rated this kitten
@@ -123,7 +300,6 @@ class RatingView(generics.GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save(user=request.user, kitten=kitten)
-        kitten.update_average_rating()
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -138,7 +314,6 @@ class RatingView(generics.GenericAPIView):
         serializer = self.get_serializer(rating, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
-        kitten.update_average_rating()
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -151,6 +326,85 @@ class RatingView(generics.GenericAPIView):
 
         # Delete the rating
         rating.delete()
-        kitten.update_average_rating()
 
         return Response({"message": "Rating deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
+
+class RatingStatsView(QueryBudgetMixin, generics.GenericAPIView):
+    """Score histogram, count, mean and ratings per day and week of one kitten, without reading its ratings."""
+    authentication_classes = [CachedJWTAuthentication]  # Enforce JWT 
+    query_budget = 5  # Histogram, daily counts and, for unrated kittens, the kitten; cold auth caches add two
+    max_days = 366
+    max_weeks = 53
+
+    def get(self, request, kitten_id):
+        try:
+            days = int(request.query_params.get('days', 30))
+            weeks = int(request.query_params.get('weeks', 12))
+        except ValueError:
+            return Response({"error": "days and weeks must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        if not (1 <= days <= self.max_days and 1 <= weeks <= self.max_weeks):
+            return Response({"error": f"days must be between 1 and {self.max_days}, weeks between 1 and {self.max_weeks}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        stats = rating_stats(kitten_id, days, weeks)
+        if stats is None:
+            raise Http404('No Kitten matches the given query.')
+        return Response(stats)
+
+class UserRatingsView(RatingPageMixin, QueryBudgetMixin, generics.GenericAPIView):
+    """The ratings the caller has given, a page at a time."""
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]  # Enforce JWT 
+    query_budget = 3  # Cold auth caches add the user and revoked-token lookups
+
+    def get(self, request):
+        return Response(self.page_data(Rating.objects.filter(user=request.user)))
+
+class RatingBatchView(QueryBudgetMixin, generics.GenericAPIView):
+    """Create or update the caller's ratings of many kittens at once (judges scoring a ring)."""
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]  # Enforce JWT 
+    query_budget = 8  # Set-based whatever the batch size; see rate_kittens()
+    throttle_classes = [UserThrottle, IPThrottle]
+    throttle_scope = 'rating'  # A batch takes one token, like a single rating
+
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({"error": "Expected a list of {kitten_id, score} objects."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.RATING_BATCH_MAX_ITEMS:
+            return Response({"error": f"A batch holds at most {settings.RATING_BATCH_MAX_ITEMS} ratings."}, status=status.HTTP_400_BAD_REQUEST)
+
+        created, updated, errors = rate_kittens(request.user, items)
+        accepted = len(items) - len(errors)
+        return Response(
+            {"created": created, "updated": updated, "errors": errors},
+            status=status.HTTP_200_OK if accepted or not items else status.HTTP_400_BAD_REQUEST,
+        )
+
+class RatingExportView(generics.GenericAPIView):
+    """Stream the ratings of one kitten as NDJSON (default) or CSV."""
+    authentication_classes = [CachedJWTAuthentication]  # Enforce JWT 
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+
+    def get(self, request, kitten_id):
+        queryset = Rating.objects.filter(kitten__id=kitten_id).order_by('id')
+        return export_response(request, queryset, RATING_EXPORT_COLUMNS, f'kitten-{kitten_id}-ratings')
+
+class DatabaseStatsView(generics.GenericAPIView):
+    """Connection reuse counters of the process serving the request (pool size, waits, checkout latency)."""
+    permission_classes = [permissions.IsAdminUser]
+    authentication_classes = [CachedJWTAuthentication]  # Enforce JWT 
+
+    def get(self, request):
+        return Response(database_stats())
+
+
+@require_safe
+def metrics_view(request):
+    """Prometheus scrape target: the request and rating counters of every worker process."""
+    if not settings.METRICS:
+        raise Http404
+    if settings.METRICS_TOKEN and not hmac.compare_digest(
+            request.headers.get('Authorization', '').encode(), f'Bearer {settings.METRICS_TOKEN}'.encode()):
+        return HttpResponse(status=401)
+    return HttpResponse(metrics.render(metrics.store.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
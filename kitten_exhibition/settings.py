@@ -12,7 +12,9 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 from datetime import timedelta
+import copy
 import os
+import tempfile
 from dotenv import load_dotenv
 load_dotenv()  # This loads the .env file automatically
 
@@ -50,8 +52,31 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_BLACKLIST_ENABLED': True,  # Enable blacklisting
+    'TOKEN_REFRESH_SERIALIZER': 'kitten_app.authentication.CachedTokenRefreshSerializer',
 }
 
+# kitten_app.authentication.CachedJWTAuthentication
+AUTH_USER_CACHE_TTL = float(os.getenv('AUTH_USER_CACHE_TTL', '30'))  # Seconds a user stays cached per process
+AUTH_USER_CACHE_SIZE = 10000
+AUTH_REVOCATION_CHECK_INTERVAL = float(os.getenv('AUTH_REVOCATION_CHECK_INTERVAL', '1'))  # Max delay before another process sees a logout
+# Seconds each revocation sync re-reads before the previous one: logouts still committing, clock skew between hosts
+AUTH_REVOCATION_SYNC_OVERLAP = float(os.getenv('AUTH_REVOCATION_SYNC_OVERLAP', '30'))
+
+# Raise when a view runs more SQL statements than its query_budget (see kitten_app/query_budget.py)
+QUERY_BUDGET_ENFORCED = DEBUG
+
+# Per-request Server-Timing header and log line (kitten_app.middleware.RequestTimingMiddleware).
+# Off, the middleware is not loaded at all.
+REQUEST_TIMING = os.getenv('REQUEST_TIMING', '1' if DEBUG else '0') == '1'
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '100'))  # Statements logged to kitten_app.slow_sql (needs REQUEST_TIMING or METRICS)
+REQUEST_PROFILE_RATE = float(os.getenv('REQUEST_PROFILE_RATE', '0'))  # Fraction of requests run under cProfile
+REQUEST_PROFILE_DIR = os.getenv('REQUEST_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'kitten-profiles'))  # Where their .prof files go
+
+# Prometheus metrics at /metrics (kitten_app.metrics), summed over the worker processes sharing METRICS_DIR
+METRICS = os.getenv('METRICS', '1') == '1'
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'kitten-metrics'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')  # When set, scrapes must send Authorization: Bearer <token>
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -75,11 +100,14 @@ REST_FRAMEWORK = {
 
 
 MIDDLEWARE = [
+    'kitten_app.middleware.RequestTimingMiddleware',  # First, so its total covers the other middleware
+    'kitten_app.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'kitten_app.middleware.ReplicaPinningMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -152,6 +180,99 @@ DATABASES = {
     }
 }
 
+# Connection reuse (checked at startup by kitten_app.checks):
+# - 'pool': psycopg 3 connection pool, the right choice under ASGI where every request runs on a fresh thread
+# - 'persistent': one connection per thread kept for DB_CONN_MAX_AGE seconds, health-checked before reuse
+# - 'none': connect and disconnect around every request
+DB_CONN_MODE = os.getenv('DB_CONN_MODE', 'persistent')
+DB_CONN_MODES = ('pool', 'persistent', 'none')
+
+if DB_CONN_MODE == 'pool':
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),  # Seconds a checkout may wait for a free connection
+        },
+    }
+elif DB_CONN_MODE == 'persistent':
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+DATABASES['default']['CONN_HEALTH_CHECKS'] = DB_CONN_MODE != 'none'
+
+# Read replicas: DB_REPLICA_HOSTS=host1,host2 adds the aliases replica1, replica2, ... that take the reads
+# (kitten_app.routers.PrimaryReplicaRouter). They share the primary's name, credentials, port and
+# connection mode unless DB_REPLICA_NAME/USER/PASSWORD/PORT say otherwise.
+DATABASE_REPLICAS = []
+for number, host in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    DATABASES[f'replica{number}'] = {
+        **copy.deepcopy(DATABASES['default']),
+        'NAME': os.getenv('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'USER': os.getenv('DB_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.getenv('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        'HOST': host.strip(),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['kitten_app.routers.PrimaryReplicaRouter']
+
+# Seconds a user's reads stay on the primary after a write (should exceed the replication lag).
+# The pin lives in the cache, so several workers need a shared CACHE_BACKEND.
+DB_REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', '5'))
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        # Per-process memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+        # backend (e.g. django.core.cache.backends.redis.RedisCache) when running several workers
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'kitten-exhibition'),
+    }
+}
+
+FACET_CACHE_TIMEOUT = int(os.getenv('FACET_CACHE_TIMEOUT', '3600'))  # Seconds a breed/color list stays cached
+PAYLOAD_CACHE_TIMEOUT = int(os.getenv('PAYLOAD_CACHE_TIMEOUT', '300'))  # Seconds a serialized kitten or ratings list stays cached
+# Seconds a kitten list page stays cached. Short: the cache is there to coalesce bursts of identical
+# requests, and a worker with a per-process cache never sees the other workers' invalidations.
+KITTEN_LIST_CACHE_TIMEOUT = int(os.getenv('KITTEN_LIST_CACHE_TIMEOUT', '2'))
+SINGLE_FLIGHT_WAIT = float(os.getenv('SINGLE_FLIGHT_WAIT', '2'))  # Max seconds a request waits for another one building the same entry
+
+# Token-bucket throttles (kitten_app/throttling.py), by '<view throttle_scope>.<ip|user|username>'.
+# '10/min' allows a burst of 10, refilled at 10 per minute.
+THROTTLING = os.getenv('THROTTLING', '1') == '1'
+THROTTLE_RATES = {
+    'login.ip': os.getenv('THROTTLE_LOGIN_IP', '30/min'),
+    'login.username': os.getenv('THROTTLE_LOGIN_USERNAME', '10/min'),
+    'register.ip': os.getenv('THROTTLE_REGISTER_IP', '20/hour'),
+    'rating.user': os.getenv('THROTTLE_RATING_USER', '120/min'),
+    'rating.ip': os.getenv('THROTTLE_RATING_IP', '600/min'),
+}
+THROTTLE_BUCKET_TTL = 3600  # Seconds an idle bucket is kept
+
+KITTEN_IMPORT_BATCH_SIZE = int(os.getenv('KITTEN_IMPORT_BATCH_SIZE', '1000'))  # Rows per COPY (or bulk_create)
+KITTEN_IMPORT_MAX_BATCH_SIZE = 10000
+RATING_BATCH_MAX_ITEMS = 1000  # Ratings accepted by one POST /ratings/batch/
+
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))  # Rows fetched per server-side cursor round trip
+EXPORT_BUFFER_SIZE = 64 * 1024  # Bytes buffered before a streamed chunk is sent
+
+# ?q= searches rank at most this many matching kittens; broader queries rank an arbitrary subset
+SEARCH_MAX_CANDIDATES = int(os.getenv('SEARCH_MAX_CANDIDATES', '5000'))
+
+# Bayesian prior for Kitten.weighted_rating: every kitten starts with RATING_PRIOR_WEIGHT
+# votes of RATING_PRIOR_MEAN (run `manage.py recompute_ratings --all` after changing these)
+RATING_PRIOR_MEAN = float(os.getenv('RATING_PRIOR_MEAN', '3.0'))
+RATING_PRIOR_WEIGHT = int(os.getenv('RATING_PRIOR_WEIGHT', '10'))
+
+# 'immediate' applies each rating to its kitten's aggregates in the same transaction. 'deferred' only
+# queues the change, so rating writes never wait on a hot kitten's row; `manage.py aggregate_ratings`
+# must then run to apply the queue in coalesced batches.
+RATING_AGGREGATION = os.getenv('RATING_AGGREGATION', 'immediate')
+RATING_AGGREGATION_BATCH_SIZE = int(os.getenv('RATING_AGGREGATION_BATCH_SIZE', '1000'))  # Queued deltas per transaction
+RATING_AGGREGATION_INTERVAL = float(os.getenv('RATING_AGGREGATION_INTERVAL', '0.5'))  # Seconds an idle worker sleeps
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -193,6 +314,23 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        # Request timings, the slow-query log and the aggregation workers
+        'kitten_app': {
+            'handlers': ['console'],
+            'level': os.getenv('KITTEN_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
 # LOGGING = {
 #     'version': 1,
 #     'disable_existing_loggers': False,
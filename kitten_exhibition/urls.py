@@ -3,6 +3,7 @@ from django.urls import path, include
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
+from kitten_app.views import metrics_view
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -18,6 +19,7 @@ schema_view = get_schema_view(
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('kitten_app.urls')),  # Include URLs from kitten_app
+    path('metrics', metrics_view, name='metrics'),  # Prometheus scrape target
     
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),